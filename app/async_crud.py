@@ -0,0 +1,270 @@
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from . import models, schemas, loaders
+from .crud import build_order_items, add_order_event, next_event_seq_statement, sales_sign, sales_delta_statements
+from .order_board import order_board, OPEN_STATUSES
+
+# Versões assíncronas das funções CRUD usadas pelas rotas 'async def'.
+# Executam no event loop sem bloqueá-lo (driver aiomysql) e nunca dependem de
+# carregamento lazy, que não é permitido com AsyncSession.
+
+# --- Funções CRUD para Usuários (User) ---
+
+async def get_user_by_email(db: AsyncSession, email: str) -> models.User | None:
+    """Busca um usuário registrado pelo seu email."""
+    result = await db.execute(select(models.User).where(models.User.email == email))
+    return result.scalars().first()
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate, hashed_password: str) -> models.User:
+    """Cria um novo usuário registrado. O primeiro usuário criado é definido como ADMIN."""
+    count = await db.scalar(select(func.count()).select_from(models.User))
+    # Define o papel do usuário: o primeiro é ADMIN, os demais são CUSTOMER.
+    user_role = models.UserRole.ADMIN if count == 0 else models.UserRole.CUSTOMER
+
+    db_user = models.User(
+        email=user.email,
+        hashed_password=hashed_password,
+        role=user_role
+    )
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    # Um usuário recém-criado ainda não tem lojas
+    set_committed_value(db_user, "stores", [])
+    return db_user
+
+async def update_user_password(db: AsyncSession, db_user: models.User, hashed_password: str) -> models.User:
+    """Substitui o hash da senha de um usuário (ex.: ao atualizar os parâmetros do bcrypt)."""
+    db_user.hashed_password = hashed_password
+    await db.commit()
+    return db_user
+
+# --- Funções CRUD para Lojas (Store) ---
+
+async def get_store(db: AsyncSession, store_id: int, profile=loaders.STORE_PROFILE) -> models.Store | None:
+    """Busca uma loja pelo seu ID."""
+    result = await db.execute(
+        select(models.Store).options(*profile).where(models.Store.id == store_id)
+    )
+    return result.scalars().first()
+
+# --- Funções CRUD para Clientes Convidados (GuestUser) ---
+
+async def create_or_update_guest_user(db: AsyncSession, guest_details: schemas.GuestUserCreate) -> models.GuestUser:
+    """
+    Cria um novo cliente convidado ou atualiza os dados de um existente.
+    As alterações ficam pendentes na transação atual.
+    """
+    result = await db.execute(
+        select(models.GuestUser).where(models.GuestUser.phone == guest_details.phone)
+    )
+    db_guest = result.scalars().first()
+    if db_guest:
+        # Atualiza os dados se o cliente já existir
+        db_guest.name = guest_details.name
+        db_guest.address = guest_details.address
+        db_guest.cpf = guest_details.cpf
+    else:
+        # Cria um novo cliente convidado
+        db_guest = models.GuestUser(**guest_details.model_dump())
+        db.add(db_guest)
+    return db_guest
+
+# --- Funções CRUD para Produtos (Product) ---
+
+async def iter_product_search_rows(db: AsyncSession, store_id: int | None = None, batch_size: int = 2000):
+    """
+    Percorre os produtos (id, loja, nome, descrição), de todas as lojas ou de uma,
+    com um cursor no servidor, em lotes, para (re)construir o índice de busca
+    sem carregar a tabela inteira.
+    """
+    query = select(models.Product.id, models.Product.store_id, models.Product.name, models.Product.description)
+    if store_id is not None:
+        query = query.where(models.Product.store_id == store_id)
+    result = await db.stream(query.execution_options(yield_per=batch_size))
+    async for rows in result.partitions():
+        yield rows
+
+async def import_products(
+    db: AsyncSession,
+    store_id: int,
+    rows: list[tuple[int, schemas.ProductImportRow]]
+) -> tuple[int, int, list[tuple[int, str]]]:
+    """
+    Grava um lote de linhas já validadas de uma importação, em uma transação:
+    linhas sem 'id' são inseridas com um único INSERT de múltiplas linhas e
+    linhas com 'id' atualizam, em lote pela chave primária, produtos da loja.
+    Retorna (criados, atualizados, erros por número de linha).
+    """
+    errors = []
+    updates = [(number, row) for number, row in rows if row.id is not None]
+    inserts = [row.model_dump(exclude={"id"}) | {"store_id": store_id} for _, row in rows if row.id is None]
+
+    if updates:
+        result = await db.execute(
+            select(models.Product.id).where(
+                models.Product.id.in_({row.id for _, row in updates}),
+                models.Product.store_id == store_id
+            )
+        )
+        existing = set(result.scalars())
+        errors = [(number, f"Produto com id {row.id} não encontrado na loja {store_id}") for number, row in updates if row.id not in existing]
+        updates = [row.model_dump(exclude_unset=True) for _, row in updates if row.id in existing]
+        if updates:
+            await db.execute(update(models.Product), updates)
+    if inserts:
+        await db.execute(insert(models.Product), inserts)
+    await db.commit()
+    return len(inserts), len(updates), errors
+
+# --- Funções CRUD para Pedidos (Order) ---
+
+async def get_order(db: AsyncSession, order_id: int, profile=loaders.ORDER_PROFILE) -> models.Order | None:
+    """Busca um pedido e carrega os dados do cliente (seja ele registrado ou convidado) e os itens."""
+    result = await db.execute(
+        select(models.Order).options(*profile).where(models.Order.id == order_id)
+    )
+    return result.unique().scalars().first()
+
+async def get_products_for_order(db: AsyncSession, store_id: int, product_ids: list[int]) -> dict[int, models.Product]:
+    """Busca, em uma única consulta, os produtos de uma loja pelos IDs informados."""
+    result = await db.execute(
+        select(models.Product).where(
+            models.Product.id.in_(set(product_ids)),
+            models.Product.store_id == store_id
+        )
+    )
+    return {product.id: product for product in result.scalars()}
+
+async def create_guest_order(db: AsyncSession, order: schemas.OrderCreate) -> tuple[models.Order, str]:
+    """
+    Cria um pedido para um cliente convidado.
+    Os produtos são buscados em uma única consulta e o cliente, o pedido e os
+    itens são gravados na mesma transação, com número fixo de consultas
+    independente do tamanho do carrinho. O pedido retornado já traz itens,
+    produtos e cliente carregados em memória, junto com seu JSON (o mesmo
+    gravado no evento), pronto para a resposta.
+    """
+    # Valida os produtos antes de qualquer escrita
+    products = await get_products_for_order(db, store_id=order.store_id, product_ids=[item.product_id for item in order.items])
+    order_items, total_price = build_order_items(order, products)
+
+    guest_customer = await create_or_update_guest_user(db, guest_details=order.customer_details)
+
+    db_order = models.Order(
+        guest_customer=guest_customer,
+        store_id=order.store_id,
+        total_price=total_price,
+        payment_method=order.payment_method
+    )
+    db.add(db_order)
+    await db.flush()
+
+    # Insere todos os itens em um único INSERT de múltiplas linhas
+    if order_items:
+        await db.execute(insert(models.OrderItem), [dict(item, order_id=db_order.id) for item in order_items])
+    await db.refresh(db_order, attribute_names=["created_at"])
+    result = await db.execute(
+        select(models.OrderItem).where(models.OrderItem.order_id == db_order.id)
+    )
+    db_items = result.scalars().all()
+    for db_item in db_items:
+        set_committed_value(db_item, "product", products[db_item.product_id])
+    set_committed_value(db_order, "items", db_items)
+    set_committed_value(db_order, "customer_user", None)
+    # O evento de notificação e os agregados de vendas são gravados na mesma transação do pedido
+    for statement in sales_delta_statements(db_order, 1):
+        await db.execute(statement)
+    db_event = add_order_event(db, db_order, models.OrderEventType.ORDER_CREATED, seq=await next_event_seq(db, db_order.store_id))
+    await db.commit()
+    order_board.apply(db_order.store_id, db_order.id, db_order.status, db_event.payload, db_event.seq)
+    return db_order, db_event.payload
+
+async def update_order_status(db: AsyncSession, db_order: models.Order, new_status: models.OrderStatus) -> tuple[models.Order, str]:
+    """
+    Atualiza o status de um pedido e registra o evento no outbox na mesma transação.
+    O pedido deve estar carregado com o perfil completo (loaders.ORDER_PROFILE).
+    Um cancelamento subtrai o pedido dos agregados de vendas. Retorna o pedido e seu JSON.
+    """
+    # O status atual é relido com bloqueio da linha (SELECT ... FOR UPDATE): mudanças
+    # concorrentes do mesmo pedido esperam o commit desta, e o delta dos agregados
+    # parte do status gravado, não do lido antes (dois cancelamentos subtraem uma vez só)
+    current_status = await db.scalar(
+        select(models.Order.status).where(models.Order.id == db_order.id).with_for_update()
+    )
+    sign = sales_sign(current_status, new_status)
+    db_order.status = new_status
+    for statement in sales_delta_statements(db_order, sign):
+        await db.execute(statement)
+    db_event = add_order_event(db, db_order, models.OrderEventType.ORDER_STATUS_CHANGED, seq=await next_event_seq(db, db_order.store_id))
+    await db.commit()
+    order_board.apply(db_order.store_id, db_order.id, db_order.status, db_event.payload, db_event.seq)
+    return db_order, db_event.payload
+
+def open_orders_statement():
+    """Consulta dos pedidos em aberto de todas as lojas (índice ix_orders_status_store)."""
+    return (
+        select(models.Order)
+        .options(*loaders.ORDER_PROFILE)
+        .where(models.Order.status.in_(OPEN_STATUSES))
+        .order_by(models.Order.store_id, models.Order.id)
+    )
+
+async def get_open_orders(db: AsyncSession) -> list[models.Order]:
+    """Busca todos os pedidos ainda em aberto (para reconstruir o quadro de pedidos)."""
+    result = await db.execute(open_orders_statement())
+    return result.scalars().all()
+
+# --- Funções CRUD para Eventos de Pedidos (OrderEvent) ---
+
+async def next_event_seq(db: AsyncSession, store_id: int) -> int:
+    """
+    Reserva a próxima sequência de eventos da loja na transação atual. Eventos
+    concorrentes da mesma loja esperam o commit desta, então a ordem das
+    sequências é a ordem de confirmação.
+    """
+    await db.execute(next_event_seq_statement(store_id))
+    return await db.scalar(
+        select(models.StoreEventSequence.seq).where(models.StoreEventSequence.store_id == store_id)
+    )
+
+async def get_event_sequences(db: AsyncSession) -> dict[int, int]:
+    """Retorna a sequência atual de eventos de cada loja."""
+    result = await db.execute(select(models.StoreEventSequence.store_id, models.StoreEventSequence.seq))
+    return dict(result.all())
+
+async def get_store_events_since(db: AsyncSession, store_id: int, since: int, limit: int = 1000) -> list[models.OrderEvent]:
+    """Busca, em ordem, os eventos de uma loja com sequência maior que 'since'."""
+    result = await db.execute(
+        select(models.OrderEvent)
+        .where(models.OrderEvent.store_id == store_id, models.OrderEvent.seq > since)
+        .order_by(models.OrderEvent.seq)
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+async def get_order_event_seq(db: AsyncSession, order_id: int) -> int:
+    """Sequência do último evento do pedido (0 se não houver), a mesma de crud.get_order_version."""
+    result = await db.execute(select(func.max(models.OrderEvent.seq)).where(models.OrderEvent.order_id == order_id))
+    return result.scalar() or 0
+
+async def get_store_event_bounds(db: AsyncSession, store_id: int) -> tuple[int | None, int]:
+    """Retorna a menor sequência de eventos da loja ainda armazenada e a sequência atual da loja."""
+    oldest = select(func.min(models.OrderEvent.seq)).where(models.OrderEvent.store_id == store_id).scalar_subquery()
+    current = select(models.StoreEventSequence.seq).where(models.StoreEventSequence.store_id == store_id).scalar_subquery()
+    result = await db.execute(select(oldest, current))
+    min_seq, current_seq = result.one()
+    return min_seq, current_seq or 0
+
+async def delete_dispatched_events_before(db: AsyncSession, cutoff) -> int:
+    """Remove os eventos já despachados criados antes de 'cutoff'."""
+    result = await db.execute(
+        delete(models.OrderEvent).where(
+            models.OrderEvent.dispatched == True,
+            models.OrderEvent.created_at < cutoff
+        )
+    )
+    await db.commit()
+    return result.rowcount
@@ -0,0 +1,229 @@
+import os
+import re
+import threading
+import time
+import zlib
+from typing import NamedTuple, Optional
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import metrics
+from .static_files import accepted_encodings, is_compressible
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# --- Configuração ---
+# Respostas menores que isso são enviadas sem compressão (o ganho não paga o custo)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Blocos maiores que isso são comprimidos no threadpool, fora do event loop
+OFFLOAD_SIZE = 64 * 1024
+
+class CompressionPolicy(NamedTuple):
+    gzip_level: int
+    brotli_quality: int
+
+DEFAULT_POLICY = CompressionPolicy(gzip_level=6, brotli_quality=4)
+
+# Política por rota: a primeira expressão que casar com o caminho vale; None desativa a compressão
+ROUTE_POLICIES: list[tuple[re.Pattern, Optional[CompressionPolicy]]] = [
+    # SSE: mensagens pequenas em conexões longas, cada uma com seu compressor em memória
+    (re.compile(r"^/orders/track/\d+/events$"), None),
+    # Arquivos estáticos já são servidos pré-comprimidos (MediaStaticFiles)
+    (re.compile(r"^/static/"), None),
+    # Exportações longas em streaming: nível baixo, menos CPU por MB
+    (re.compile(r"^/orders/store/\d+/export$"), CompressionPolicy(gzip_level=4, brotli_quality=3)),
+    # Listas JSON grandes e repetitivas (pedidos, usuários com lojas e produtos, cardápios)
+    (re.compile(r"^/(orders/store/\d+|users|stores|products)(/|$)"), CompressionPolicy(gzip_level=6, brotli_quality=5)),
+]
+
+def policy_for(path: str) -> Optional[CompressionPolicy]:
+    for pattern, policy in ROUTE_POLICIES:
+        if pattern.match(path):
+            return policy
+    return DEFAULT_POLICY
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Escolhe a codificação: brotli (se instalado) antes de gzip."""
+    accepted = accepted_encodings(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+# --- Compressores ---
+
+class _Compressor:
+    """Compressor incremental; flush() entrega o que já foi comprimido (para streaming)."""
+
+    def __init__(self, encoding: str, policy: CompressionPolicy):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=policy.brotli_quality, mode=brotli.MODE_TEXT)
+            self._zlib = None
+        else:
+            # wbits=31: formato gzip (cabeçalho e CRC)
+            self._zlib = zlib.compressobj(policy.gzip_level, zlib.DEFLATED, 31)
+            self._brotli = None
+        self.cpu_seconds = 0.0
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        started = time.thread_time()
+        if self._zlib is not None:
+            output = self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+        else:
+            output = self._brotli.process(data) + (self._brotli.finish() if final else self._brotli.flush())
+        self.cpu_seconds += time.thread_time() - started
+        return output
+
+    async def run(self, data: bytes, final: bool) -> bytes:
+        if len(data) >= OFFLOAD_SIZE:
+            return await anyio.to_thread.run_sync(self.compress, data, final)
+        return self.compress(data, final)
+
+# --- Métricas ---
+
+class CompressionStats:
+    """Bytes antes/depois e tempo de CPU por codificação, para avaliar a política."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.encodings = {}
+        self.skipped = {"too_small": 0, "not_accepted": 0}
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int, cpu_seconds: float):
+        with self._lock:
+            entry = self.encodings.setdefault(encoding, {"responses": 0, "bytes_in": 0, "bytes_out": 0, "cpu_seconds": 0.0})
+            entry["responses"] += 1
+            entry["bytes_in"] += bytes_in
+            entry["bytes_out"] += bytes_out
+            entry["cpu_seconds"] += cpu_seconds
+
+    def skip(self, reason: str):
+        with self._lock:
+            self.skipped[reason] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            encodings = {
+                encoding: {
+                    **entry,
+                    "ratio": entry["bytes_out"] / entry["bytes_in"] if entry["bytes_in"] else 0.0,
+                    # Custo de CPU por MB economizado: quanto menor, melhor a troca
+                    "cpu_ms_per_mb_saved": entry["cpu_seconds"] * 1000 / ((entry["bytes_in"] - entry["bytes_out"]) / 1024 / 1024)
+                    if entry["bytes_in"] > entry["bytes_out"] else 0.0,
+                }
+                for encoding, entry in self.encodings.items()
+            }
+            return {"brotli_available": brotli is not None, "encodings": encodings, "skipped": dict(self.skipped)}
+
+# --- Middleware ---
+
+class CompressionMiddleware:
+    """
+    Comprime as respostas de texto/JSON com brotli ou gzip, conforme o Accept-Encoding
+    e a política da rota. Respostas em streaming são comprimidas bloco a bloco, com
+    flush a cada bloco para o cliente não esperar o fim da resposta.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        policy = policy_for(scope["path"])
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        responder = _CompressedResponder(send, encoding, policy, self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+class _CompressedResponder:
+    def __init__(self, send: Send, encoding: Optional[str], policy: CompressionPolicy, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.policy = policy
+        self.minimum_size = minimum_size
+        self._start: Optional[Message] = None
+        self._passthrough = False
+        self._pending = b""
+        self._compressor: Optional[_Compressor] = None
+        self._bytes_in = 0
+        self._bytes_out = 0
+
+    def _eligible(self, message: Message) -> bool:
+        headers = Headers(raw=message["headers"])
+        media_type = headers.get("content-type", "").split(";", 1)[0].strip()
+        return (
+            message["status"] not in (204, 206, 304)
+            and "content-encoding" not in headers
+            and "content-range" not in headers
+            and is_compressible(media_type)
+        )
+
+    async def send(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            if self._eligible(message):
+                # Mesmo sem comprimir, a resposta depende do Accept-Encoding
+                MutableHeaders(raw=message["headers"]).add_vary_header("Accept-Encoding")
+                if self.encoding is None:
+                    stats.skip("not_accepted")
+                    self._passthrough = True
+            else:
+                self._passthrough = True
+            if self._passthrough:
+                await self._send(message)
+            else:
+                self._start = message
+            return
+        if message_type != "http.response.body" or self._passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self._compressor is None:
+            self._pending += body
+            if more_body and len(self._pending) < self.minimum_size:
+                return
+            if not more_body and len(self._pending) < self.minimum_size:
+                # Resposta pequena: segue sem compressão
+                stats.skip("too_small")
+                await self._send(self._start)
+                await self._send({"type": "http.response.body", "body": self._pending})
+                return
+            body, self._pending = self._pending, b""
+            self._compressor = _Compressor(self.encoding, self.policy)
+            headers = MutableHeaders(raw=self._start["headers"])
+            headers["content-encoding"] = self.encoding
+            # A representação comprimida é outra: um ETag forte passa a ser fraco
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["etag"] = f"W/{etag}"
+            compressed = await self._compressor.run(body, final=not more_body)
+            if more_body:
+                del headers["content-length"]
+            else:
+                headers["content-length"] = str(len(compressed))
+            await self._send(self._start)
+        else:
+            compressed = await self._compressor.run(body, final=not more_body)
+
+        self._bytes_in += len(body)
+        self._bytes_out += len(compressed)
+        if not more_body:
+            stats.record(self.encoding, self._bytes_in, self._bytes_out, self._compressor.cpu_seconds)
+        await self._send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+# Instância global das métricas de compressão
+stats = CompressionStats()
+metrics.register("compression", stats.stats)
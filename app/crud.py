@@ -1,10 +1,26 @@
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.orm.attributes import set_committed_value
+from datetime import date, datetime
 from typing import Optional
-from . import models, schemas
-from passlib.context import CryptContext
+from . import models, schemas, loaders, serialization
+from .security import pwd_context
+from .menu_cache import menu_cache, publish_change as publish_menu_change
+from .search import search_index, publish_products
 
-# Configuração para hashing de senhas
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# --- Paginação ---
+
+def paginate(query: Query, skip: int, limit: int, keyset_filter=None) -> list:
+    """
+    Aplica a paginação: por cursor (keyset) quando há filtro de cursor, que usa
+    o índice e custa o mesmo em qualquer página, ou por 'skip'/'limit'.
+    """
+    if keyset_filter is not None:
+        query = query.filter(keyset_filter)
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
 
 # --- Funções CRUD para Usuários (User) ---
 
@@ -12,21 +28,27 @@ def get_user_by_email(db: Session, email: str) -> models.User | None:
     """Busca um usuário registrado pelo seu email."""
     return db.query(models.User).filter(models.User.email == email).first()
 
-def get_user_by_id(db: Session, user_id: int) -> models.User | None:
+def get_user_by_id(db: Session, user_id: int, profile=loaders.USER_DETAIL_PROFILE) -> models.User | None:
     """Busca um usuário registrado pelo seu ID."""
-    return db.query(models.User).filter(models.User.id == user_id).first()
+    return db.query(models.User).options(*profile).filter(models.User.id == user_id).first()
 
-def get_users(db: Session, skip: int = 0, limit: int = 100) -> list[models.User]:
-    """Retorna uma lista de usuários registrados."""
-    return db.query(models.User).offset(skip).limit(limit).all()
+def get_users(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None, profile=loaders.USER_DETAIL_PROFILE) -> list[models.User]:
+    """Retorna uma lista de usuários registrados, ordenada por ID."""
+    query = db.query(models.User).options(*profile).order_by(models.User.id)
+    return paginate(query, skip, limit, models.User.id > after_id if after_id is not None else None)
 
-def create_user(db: Session, user: schemas.UserCreate) -> models.User:
-    """Cria um novo usuário registrado. O primeiro usuário criado é definido como ADMIN."""
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str | None = None) -> models.User:
+    """
+    Cria um novo usuário registrado. O primeiro usuário criado é definido como ADMIN.
+    Se 'hashed_password' não for informado, o hash é calculado aqui mesmo (uso em scripts);
+    as rotas calculam o hash no serviço de senhas (security.password_service).
+    """
     count = db.query(models.User).count()
     # Define o papel do usuário: o primeiro é ADMIN, os demais são CUSTOMER.
     user_role = models.UserRole.ADMIN if count == 0 else models.UserRole.CUSTOMER
     
-    hashed_password = pwd_context.hash(user.password)
+    if hashed_password is None:
+        hashed_password = pwd_context.hash(user.password)
     db_user = models.User(
         email=user.email, 
         hashed_password=hashed_password,
@@ -35,13 +57,14 @@ def create_user(db: Session, user: schemas.UserCreate) -> models.User:
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    # Um usuário recém-criado ainda não tem lojas
+    set_committed_value(db_user, "stores", [])
     return db_user
 
 def update_user_role(db: Session, db_user: models.User, role: models.UserRole) -> models.User:
     """Atualiza o papel (role) de um usuário existente."""
     db_user.role = role
     db.commit()
-    db.refresh(db_user)
     return db_user
 
 # --- Funções CRUD para Clientes Convidados (GuestUser) ---
@@ -50,8 +73,11 @@ def get_guest_user_by_phone(db: Session, phone: str) -> models.GuestUser | None:
     """Busca um cliente convidado pelo número de telefone."""
     return db.query(models.GuestUser).filter(models.GuestUser.phone == phone).first()
 
-def create_or_update_guest_user(db: Session, guest_details: schemas.GuestUserCreate) -> models.GuestUser:
-    """Cria um novo cliente convidado ou atualiza os dados de um existente."""
+def create_or_update_guest_user(db: Session, guest_details: schemas.GuestUserCreate, commit: bool = True) -> models.GuestUser:
+    """
+    Cria um novo cliente convidado ou atualiza os dados de um existente.
+    Com 'commit=False' as alterações ficam pendentes na transação atual.
+    """
     db_guest = get_guest_user_by_phone(db, phone=guest_details.phone)
     if db_guest:
         # Atualiza os dados se o cliente já existir
@@ -63,25 +89,28 @@ def create_or_update_guest_user(db: Session, guest_details: schemas.GuestUserCre
         db_guest = models.GuestUser(**guest_details.model_dump())
         db.add(db_guest)
     
-    db.commit()
-    db.refresh(db_guest)
+    if commit:
+        db.commit()
+        db.refresh(db_guest)
     return db_guest
 
 # --- Funções CRUD para Lojas (Store) ---
 
-def get_store(db: Session, store_id: int) -> models.Store | None:
+def get_store(db: Session, store_id: int, profile=loaders.STORE_PROFILE) -> models.Store | None:
     """Busca uma loja pelo seu ID."""
-    return db.query(models.Store).filter(models.Store.id == store_id).first()
+    return db.query(models.Store).options(*profile).filter(models.Store.id == store_id).first()
 
-def get_stores(db: Session, skip: int = 0, limit: int = 100) -> list[models.Store]:
-    """Retorna uma lista de TODAS as lojas (para Admins)."""
+def get_stores(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None, profile=loaders.STORE_PROFILE) -> list[models.Store]:
+    """Retorna uma lista de TODAS as lojas (para Admins), ordenada por ID."""
     # Esta função NÃO DEVE ter nenhum filtro por 'owner_id'.
-    return db.query(models.Store).offset(skip).limit(limit).all()
+    query = db.query(models.Store).options(*profile).order_by(models.Store.id)
+    return paginate(query, skip, limit, models.Store.id > after_id if after_id is not None else None)
 
-def get_stores_by_owner(db: Session, owner_id: int, skip: int = 0, limit: int = 100) -> list[models.Store]:
-    """Retorna uma lista de lojas de um proprietário específico (para Owners)."""
+def get_stores_by_owner(db: Session, owner_id: int, skip: int = 0, limit: int = 100, after_id: Optional[int] = None, profile=loaders.STORE_PROFILE) -> list[models.Store]:
+    """Retorna uma lista de lojas de um proprietário específico (para Owners), ordenada por ID."""
     # Esta função DEVE ter o filtro por 'owner_id'.
-    return db.query(models.Store).filter(models.Store.owner_id == owner_id).offset(skip).limit(limit).all()
+    query = db.query(models.Store).options(*profile).filter(models.Store.owner_id == owner_id).order_by(models.Store.id)
+    return paginate(query, skip, limit, models.Store.id > after_id if after_id is not None else None)
 # --- FIM DA NOVA FUNÇÃO ---
 
 def create_store(db: Session, store: schemas.StoreCreate, owner_id: int, logo_url: Optional[str] = None) -> models.Store:
@@ -95,17 +124,22 @@ def create_store(db: Session, store: schemas.StoreCreate, owner_id: int, logo_ur
     db.add(db_store)
     db.commit()
     db.refresh(db_store)
+    # Uma loja recém-criada ainda não tem produtos
+    set_committed_value(db_store, "products", [])
     return db_store
 
-def update_store(db: Session, db_store: models.Store, store_in: schemas.StoreUpdate) -> models.Store:
-    """Atualiza os dados de uma loja existente."""
+def update_store(db: Session, db_store: models.Store, store_in: schemas.StoreUpdate, logo_url: Optional[str] = None) -> models.Store:
+    """Atualiza os dados de uma loja existente e o snapshot do seu cardápio."""
     update_data = store_in.model_dump(exclude_unset=True)
     
     for key, value in update_data.items():
         setattr(db_store, key, value)
+    if logo_url is not None:
+        db_store.logo_url = logo_url
     
     db.commit()
-    db.refresh(db_store)
+    menu_cache.update_store(db_store)
+    publish_menu_change(db_store.id)
     return db_store
 
 # --- Funções CRUD para Produtos (Product) ---
@@ -114,9 +148,15 @@ def get_product(db: Session, product_id: int) -> models.Product | None:
     """Busca um produto pelo seu ID."""
     return db.query(models.Product).filter(models.Product.id == product_id).first()
 
-def get_products_by_store(db: Session, store_id: int, skip: int = 0, limit: int = 100) -> list[models.Product]:
-    """Retorna uma lista de produtos de uma loja específica."""
-    return db.query(models.Product).filter(models.Product.store_id == store_id).offset(skip).limit(limit).all()
+def get_products_by_store(db: Session, store_id: int, skip: int = 0, limit: int = 100, after_id: Optional[int] = None) -> list[models.Product]:
+    """Retorna uma lista de produtos de uma loja específica, ordenada por ID."""
+    query = db.query(models.Product).filter(models.Product.store_id == store_id).order_by(models.Product.id)
+    return paginate(query, skip, limit, models.Product.id > after_id if after_id is not None else None)
+
+def get_products_by_ids(db: Session, product_ids: list[int]) -> list[models.Product]:
+    """Busca produtos pelos IDs, na mesma ordem da lista (ex.: resultado de uma busca)."""
+    products = {product.id: product for product in db.query(models.Product).filter(models.Product.id.in_(product_ids))}
+    return [products[product_id] for product_id in product_ids if product_id in products]
 
 def create_store_product(db: Session, product: schemas.ProductCreate, store_id: int, image_url: Optional[str] = None) -> models.Product:
     """Cria um novo produto associado a uma loja."""
@@ -128,80 +168,282 @@ def create_store_product(db: Session, product: schemas.ProductCreate, store_id:
     db.add(db_product)
     db.commit()
     db.refresh(db_product)
+    menu_cache.upsert_product(db_product)
+    publish_menu_change(db_product.store_id)
+    _index_product(db_product)
     return db_product
 
 def update_product(db: Session, db_product: models.Product, product_in: schemas.ProductUpdate) -> models.Product:
-    """Atualiza os dados de um produto existente."""
+    """Atualiza os dados de um produto existente e o snapshot do cardápio da loja."""
     update_data = product_in.model_dump(exclude_unset=True)
     
     for key, value in update_data.items():
         setattr(db_product, key, value)
     
     db.commit()
-    db.refresh(db_product)
+    menu_cache.upsert_product(db_product)
+    publish_menu_change(db_product.store_id)
+    _index_product(db_product)
     return db_product
 
+def _index_product(db_product: models.Product):
+    """Atualiza o produto no índice de busca deste processo e dos demais workers."""
+    row = (db_product.id, db_product.store_id, db_product.name, db_product.description)
+    search_index.upsert(*row)
+    publish_products([row])
+
+# --- Arquivos de Mídia ---
+
+def get_media_urls(db: Session) -> set[str]:
+    """URLs de imagens e logos referenciadas no banco; usado na coleta de arquivos sem referência."""
+    urls = db.execute(
+        select(models.Product.image_url).where(models.Product.image_url.is_not(None))
+        .union(select(models.Store.logo_url).where(models.Store.logo_url.is_not(None)))
+    ).scalars()
+    return set(urls)
+
+# --- Agregados de Vendas (StoreDailySales / ProductDailySales) ---
+
+def sales_sign(old_status: models.OrderStatus, new_status: models.OrderStatus) -> int:
+    """Retorna 1, -1 ou 0 conforme a mudança de status soma, subtrai ou não altera as vendas."""
+    return int(new_status != models.OrderStatus.CANCELED) - int(old_status != models.OrderStatus.CANCELED)
+
+def sales_delta_statements(db_order: models.Order, sign: int) -> list:
+    """
+    Monta os upserts (INSERT ... ON DUPLICATE KEY UPDATE) que somam (sign=1) ou
+    subtraem (sign=-1) o pedido dos contadores do dia da loja e de cada produto.
+    Usados pelo CRUD assíncrono de pedidos; o pedido deve estar com os itens carregados.
+    """
+    if sign == 0:
+        return []
+    day = db_order.created_at.date()
+    products: dict[int, dict] = {}
+    for item in db_order.items:
+        row = products.setdefault(item.product_id, {"quantity": 0, "revenue": 0.0})
+        row["quantity"] += item.quantity
+        row["revenue"] += item.quantity * item.price_at_purchase
+
+    store_statement = mysql_insert(models.StoreDailySales).values(
+        store_id=db_order.store_id,
+        day=day,
+        order_count=sign,
+        revenue=sign * db_order.total_price,
+        items_quantity=sign * sum(row["quantity"] for row in products.values())
+    )
+    store_statement = store_statement.on_duplicate_key_update(
+        order_count=models.StoreDailySales.order_count + store_statement.inserted.order_count,
+        revenue=models.StoreDailySales.revenue + store_statement.inserted.revenue,
+        items_quantity=models.StoreDailySales.items_quantity + store_statement.inserted.items_quantity,
+    )
+    statements = [store_statement]
+
+    if products:
+        product_statement = mysql_insert(models.ProductDailySales).values([
+            {
+                "store_id": db_order.store_id,
+                "day": day,
+                "product_id": product_id,
+                "quantity": sign * row["quantity"],
+                "revenue": sign * row["revenue"],
+            }
+            for product_id, row in products.items()
+        ])
+        product_statement = product_statement.on_duplicate_key_update(
+            quantity=models.ProductDailySales.quantity + product_statement.inserted.quantity,
+            revenue=models.ProductDailySales.revenue + product_statement.inserted.revenue,
+        )
+        statements.append(product_statement)
+    return statements
+
+def get_store_daily_sales(db: Session, store_id: int, start: date, end: date) -> list[models.StoreDailySales]:
+    """Busca os contadores diários da loja no período [start, end], pela chave primária."""
+    return db.query(models.StoreDailySales).filter(
+        models.StoreDailySales.store_id == store_id,
+        models.StoreDailySales.day.between(start, end)
+    ).order_by(models.StoreDailySales.day).all()
+
+def get_store_product_sales(db: Session, store_id: int, start: date, end: date) -> list:
+    """Soma, por produto, os contadores diários da loja no período [start, end], da maior receita para a menor."""
+    revenue = func.sum(models.ProductDailySales.revenue)
+    return db.query(
+        models.ProductDailySales.product_id,
+        models.Product.name,
+        func.sum(models.ProductDailySales.quantity).label("quantity"),
+        revenue.label("revenue")
+    ).outerjoin(
+        models.Product, models.Product.id == models.ProductDailySales.product_id
+    ).filter(
+        models.ProductDailySales.store_id == store_id,
+        models.ProductDailySales.day.between(start, end)
+    ).group_by(models.ProductDailySales.product_id, models.Product.name).order_by(revenue.desc()).all()
+
+def rebuild_sales_summary(db: Session):
+    """
+    Recalcula todos os agregados de vendas a partir dos pedidos. Usado apenas para
+    preencher as tabelas em bancos que já tinham pedidos (rebuild_sales_summary.py).
+    """
+    day = func.date(models.Order.created_at)
+    counted = models.Order.status != models.OrderStatus.CANCELED
+    items = select(
+        models.OrderItem.order_id,
+        func.sum(models.OrderItem.quantity).label("quantity")
+    ).group_by(models.OrderItem.order_id).subquery()
+
+    db.query(models.ProductDailySales).delete()
+    db.query(models.StoreDailySales).delete()
+    db.execute(insert(models.StoreDailySales).from_select(
+        ["store_id", "day", "order_count", "revenue", "items_quantity"],
+        select(
+            models.Order.store_id, day, func.count(models.Order.id),
+            func.sum(models.Order.total_price), func.coalesce(func.sum(items.c.quantity), 0)
+        ).outerjoin(items, items.c.order_id == models.Order.id).where(counted).group_by(models.Order.store_id, day)
+    ))
+    db.execute(insert(models.ProductDailySales).from_select(
+        ["store_id", "day", "product_id", "quantity", "revenue"],
+        select(
+            models.Order.store_id, day, models.OrderItem.product_id,
+            func.sum(models.OrderItem.quantity),
+            func.sum(models.OrderItem.quantity * models.OrderItem.price_at_purchase)
+        ).join(models.Order.items).where(counted).group_by(models.Order.store_id, day, models.OrderItem.product_id)
+    ))
+    db.commit()
+
 # --- Funções CRUD para Pedidos (Order) ---
 
-def get_order(db: Session, order_id: int) -> models.Order | None:
-    """Busca um pedido e carrega os dados do cliente (seja ele registrado ou convidado)."""
-    return db.query(models.Order).options(
-        joinedload(models.Order.customer_user),
-        joinedload(models.Order.guest_customer)
+def get_order(db: Session, order_id: int, profile=loaders.ORDER_PROFILE) -> models.Order | None:
+    """Busca um pedido e carrega os dados do cliente (seja ele registrado ou convidado) e os itens."""
+    return db.query(models.Order).options(*profile).filter(models.Order.id == order_id).first()
+
+# A cada alteração de um pedido um evento é gravado no outbox na mesma transação,
+# com a sequência da loja (models.StoreEventSequence). Essa sequência é confirmada
+# na ordem dos commits, então serve como número de versão (validador HTTP): muda
+# a cada commit e nunca fica para trás de um commit já visível. O id autoincremental
+# dos eventos não serve, pois um id menor pode ser confirmado depois de um maior.
+
+def get_order_version(db: Session, order_id: int) -> tuple[Optional[str], int] | None:
+    """
+    Retorna o telefone do cliente convidado e a versão do pedido, sem carregar
+    relacionamentos, ou None se o pedido não existir.
+    """
+    last_event = select(func.max(models.OrderEvent.seq)).where(models.OrderEvent.order_id == order_id).scalar_subquery()
+    row = db.query(models.GuestUser.phone, last_event).select_from(models.Order).outerjoin(
+        models.Order.guest_customer
     ).filter(models.Order.id == order_id).first()
+    if row is None:
+        return None
+    return row[0], row[1] or 0
+
+def get_store_orders_version(db: Session, store_id: int) -> int:
+    """Retorna a versão dos pedidos de uma loja (muda a cada pedido criado ou alterado)."""
+    return db.query(models.StoreEventSequence.seq).filter(models.StoreEventSequence.store_id == store_id).scalar() or 0
 
 def get_user_orders(db: Session, user_id: int) -> list[models.Order]:
-    """Busca os pedidos de um usuário registrado."""
+    """Busca os pedidos de um usuário registrado, do mais recente para o mais antigo."""
     return db.query(models.Order).options(
-        joinedload(models.Order.customer_user)
-    ).filter(models.Order.customer_user_id == user_id).all()
+        *loaders.ORDER_PROFILE
+    ).filter(models.Order.customer_user_id == user_id).order_by(models.Order.created_at.desc()).all()
 
-def get_store_orders(db: Session, store_id: int, skip: int = 0, limit: int = 100) -> list[models.Order]:
-    """Busca os pedidos de uma loja, carregando os dados de todos os tipos de cliente."""
-    return db.query(models.Order).options(
-        joinedload(models.Order.customer_user),
-        joinedload(models.Order.guest_customer)
-    ).filter(models.Order.store_id == store_id).offset(skip).limit(limit).all()
-
-def create_guest_order(db: Session, order: schemas.OrderCreate) -> models.Order:
-    """Cria um pedido para um cliente convidado."""
-    # Cria ou atualiza o cliente convidado com base no telefone
-    guest_customer = create_or_update_guest_user(db, guest_details=order.customer_details)
-    
+def get_store_orders(
+    db: Session,
+    store_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[tuple[datetime, int]] = None,
+    profile=loaders.ORDER_PROFILE
+) -> list[models.Order]:
+    """
+    Busca os pedidos de uma loja, do mais recente para o mais antigo, carregando
+    (no perfil padrão) os dados de todos os tipos de cliente e os itens. 'after'
+    é a chave (created_at, id) do último pedido da página anterior.
+    """
+    query = db.query(models.Order).options(
+        *profile
+    ).filter(models.Order.store_id == store_id).order_by(models.Order.created_at.desc(), models.Order.id.desc())
+    keyset_filter = tuple_(models.Order.created_at, models.Order.id) < tuple_(*after) if after is not None else None
+    return paginate(query, skip, limit, keyset_filter)
+
+def iter_store_orders(
+    db: Session,
+    store_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    batch_size: int = 500
+):
+    """
+    Percorre os pedidos de uma loja em ordem cronológica, em lotes de 'batch_size'
+    buscados por cursor (created_at, id), gerando uma lista de pedidos por lote.
+    Cada lote é removido da sessão antes do próximo: a memória não cresce com o
+    período exportado e nenhuma conexão fica presa entre os lotes.
+    """
+    query = db.query(models.Order).options(
+        *loaders.ORDER_PROFILE
+    ).filter(models.Order.store_id == store_id).order_by(models.Order.created_at, models.Order.id)
+    if start is not None:
+        query = query.filter(models.Order.created_at >= start)
+    if end is not None:
+        query = query.filter(models.Order.created_at < end)
+
+    after = None
+    while True:
+        batch_query = query if after is None else query.filter(tuple_(models.Order.created_at, models.Order.id) > tuple_(*after))
+        orders = batch_query.limit(batch_size).all()
+        if not orders:
+            return
+        # Encerra a transação de leitura: a conexão volta ao pool enquanto o lote é enviado
+        db.commit()
+        yield orders
+        if len(orders) < batch_size:
+            return
+        after = (orders[-1].created_at, orders[-1].id)
+        db.expunge_all()
+
+def get_products_for_order(db: Session, store_id: int, product_ids: list[int]) -> dict[int, models.Product]:
+    """Busca, em uma única consulta, os produtos de uma loja pelos IDs informados."""
+    products = db.query(models.Product).filter(
+        models.Product.id.in_(set(product_ids)),
+        models.Product.store_id == store_id
+    ).all()
+    return {product.id: product for product in products}
+
+def build_order_items(order: schemas.OrderCreate, products: dict[int, models.Product]) -> tuple[list[dict], float]:
+    """Valida os itens do carrinho contra os produtos da loja e calcula o preço total."""
     total_price = 0
-    db_order_items = []
-    
-    # Itera sobre os itens do pedido para calcular o preço total e validar os produtos
+    order_items = []
+
     for item in order.items:
-        product = get_product(db, product_id=item.product_id)
-        if not product or product.store_id != order.store_id:
+        product = products.get(item.product_id)
+        if not product:
             raise ValueError(f"Produto com id {item.product_id} não encontrado na loja {order.store_id}")
-        
-        item_total = product.price * item.quantity
-        total_price += item_total
-        db_order_items.append(models.OrderItem(
-            product_id=item.product_id,
-            quantity=item.quantity,
-            price_at_purchase=product.price
-        ))
-
-    # Cria o pedido e o associa ao ID do cliente convidado
-    db_order = models.Order(
-        guest_customer_id=guest_customer.id,
-        store_id=order.store_id,
-        total_price=total_price,
-        payment_method=order.payment_method,
-        items=db_order_items
-    )
-    
-    db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
-    return db_order
 
-def update_order_status(db: Session, db_order: models.Order, new_status: models.OrderStatus) -> models.Order:
-    """Atualiza o status de um pedido."""
-    db_order.status = new_status
-    db.commit()
-    db.refresh(db_order)
-    return db_order
\ No newline at end of file
+        total_price += product.price * item.quantity
+        order_items.append({
+            "product_id": item.product_id,
+            "quantity": item.quantity,
+            "price_at_purchase": product.price,
+        })
+
+    return order_items, total_price
+
+def next_event_seq_statement(store_id: int):
+    """
+    Monta o upsert que incrementa a sequência de eventos da loja. A linha fica
+    bloqueada até o fim da transação: deve ser o último passo antes do commit.
+    """
+    statement = mysql_insert(models.StoreEventSequence).values(store_id=store_id, seq=1)
+    return statement.on_duplicate_key_update(seq=models.StoreEventSequence.seq + 1)
+
+def add_order_event(db: Session, db_order: models.Order, event_type: models.OrderEventType, seq: int) -> models.OrderEvent:
+    """
+    Registra um evento do pedido no outbox, na transação atual (sem commit), com
+    a sequência obtida de next_event_seq_statement na mesma transação.
+    O pedido deve estar com itens e cliente carregados.
+    """
+    db_event = models.OrderEvent(
+        store_id=db_order.store_id,
+        order_id=db_order.id,
+        event_type=event_type,
+        payload=serialization.order_json(db_order),
+        seq=seq
+    )
+    db.add(db_event)
+    return db_event
\ No newline at end of file
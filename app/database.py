@@ -1,5 +1,6 @@
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import load_dotenv
@@ -22,12 +23,24 @@ if not all([DB_USER, DB_PASSWORD, DB_HOST, DB_NAME]):
 # Esta é a linha que foi alterada para resolver o erro.
 SQLALCHEMY_DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
 
+# String de conexão assíncrona (driver aiomysql), usada pelas rotas 'async def'
+ASYNC_SQLALCHEMY_DATABASE_URL = f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+
 # A flag 'pool_pre_ping' verifica as conexões antes de usá-las
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, pool_pre_ping=True
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# 'expire_on_commit=False' mantém os objetos carregados utilizáveis após o commit,
+# evitando novas consultas só para serializar a resposta.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# Engine e sessão assíncronas: não bloqueiam o event loop enquanto o MySQL responde
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL, pool_pre_ping=True
+)
+
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
@@ -38,3 +51,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# --- Dependência para obter a sessão assíncrona do banco ---
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
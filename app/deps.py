@@ -1,37 +1,38 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
 
-from . import schemas, models, crud
+from . import schemas, models, crud, async_crud
 from .database import get_db
+from .security import password_service
+from .principal_cache import principal_cache
 
 # --- Configurações de Segurança ---
 SECRET_KEY = "SUA_CHAVE_SECRETA_MUITO_SEGURA" 
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Contexto para hash de senhas
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # Esquema OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
 # --- Funções de Autenticação ---
 
-def verify_password(plain_password, hashed_password):
-    """Verifica se a senha fornecida corresponde ao hash armazenado."""
-    return pwd_context.verify(plain_password, hashed_password)
-
-def authenticate_user(db: Session, email: str, password: str) -> models.User | None:
-    """Busca um usuário pelo email e verifica sua senha."""
-    user = crud.get_user_by_email(db, email=email)
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> models.User | None:
+    """
+    Busca um usuário pelo email e verifica sua senha no serviço de senhas.
+    Se o hash usar parâmetros antigos do bcrypt, ele é refeito com os atuais.
+    """
+    user = await async_crud.get_user_by_email(db, email=email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await password_service.verify_and_update(password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash:
+        await async_crud.update_user_password(db, db_user=user, hashed_password=new_hash)
     return user
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
@@ -48,7 +49,11 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
 # --- Dependências de Autenticação e Autorização ---
 
 def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
-    """Decodifica o token e retorna o usuário correspondente."""
+    """
+    Decodifica o token e retorna o usuário correspondente.
+    O usuário vem do cache de principais sempre que possível; o objeto retornado
+    não está associado à sessão e traz apenas id, email, role e is_active.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -62,9 +67,13 @@ def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_
         token_data = schemas.TokenData(email=email)
     except JWTError:
         raise credentials_exception
-    user = crud.get_user_by_email(db, email=token_data.email)
+    user = principal_cache.get(token_data.email)
     if user is None:
-        raise credentials_exception
+        generation = principal_cache.generation()
+        db_user = crud.get_user_by_email(db, email=token_data.email)
+        if db_user is None:
+            raise credentials_exception
+        user = principal_cache.set(db_user, generation)
     return user
 
 def get_current_active_user(current_user: models.User = Depends(get_current_user)):
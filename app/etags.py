@@ -0,0 +1,34 @@
+import hashlib
+from fastapi import Request, Response
+
+# --- Validadores HTTP (ETag / If-None-Match) ---
+
+def make_etag(body: bytes) -> str:
+    """Gera um ETag forte a partir do conteúdo da resposta."""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+def version_etag(*parts) -> str:
+    """
+    Gera um ETag fraco a partir de um número de versão e dos parâmetros da
+    consulta, sem precisar serializar a resposta.
+    """
+    key = "|".join(str(part) for part in parts)
+    return f'W/"{hashlib.blake2b(key.encode(), digest_size=16).hexdigest()}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Indica se o ETag informado está no cabeçalho If-None-Match da requisição."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    # A comparação "fraca" ignora o prefixo W/
+    return "*" in candidates or etag.removeprefix("W/") in (value.removeprefix("W/") for value in candidates)
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+def json_response(request: Request, body: bytes, etag: str) -> Response:
+    """Responde com o JSON já serializado ou com 304 se o cliente já tem esta versão."""
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
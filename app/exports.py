@@ -0,0 +1,72 @@
+import csv
+import io
+from datetime import datetime
+from enum import Enum
+from typing import Iterator, Optional
+
+from . import crud, models, serialization
+from .database import SessionLocal
+
+# Quantidade de pedidos buscados (e enviados) por vez durante a exportação
+EXPORT_BATCH_SIZE = 500
+
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+MEDIA_TYPES = {
+    ExportFormat.CSV: "text/csv; charset=utf-8",
+    ExportFormat.NDJSON: "application/x-ndjson",
+}
+
+# Uma linha por item do pedido; os dados do pedido se repetem em cada item
+CSV_HEADER = [
+    "order_id", "created_at", "status", "payment_method", "total_price",
+    "customer_name", "customer_phone", "customer_email",
+    "product_id", "product_name", "quantity", "price_at_purchase",
+]
+
+def _csv_rows(order: models.Order) -> Iterator[list]:
+    guest = order.guest_customer
+    user = order.customer_user
+    customer = [
+        guest.name if guest else "",
+        guest.phone if guest else "",
+        user.email if user else "",
+    ]
+    head = [order.id, order.created_at.isoformat(), order.status.value, order.payment_method, order.total_price]
+    if not order.items:
+        yield head + customer + ["", "", "", ""]
+    for item in order.items:
+        yield head + customer + [item.product_id, item.product.name, item.quantity, item.price_at_purchase]
+
+def _format_batch(orders: list[models.Order], export_format: ExportFormat) -> str:
+    if export_format == ExportFormat.NDJSON:
+        return "".join(serialization.order_json(order) + "\n" for order in orders)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for order in orders:
+        writer.writerows(_csv_rows(order))
+    return buffer.getvalue()
+
+def stream_store_orders(
+    store_id: int,
+    export_format: ExportFormat,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> Iterator[str]:
+    """
+    Gera a exportação dos pedidos da loja em pedaços, um por lote de pedidos.
+    Usa sessão própria, pois roda depois que a requisição já retornou a resposta.
+    """
+    if export_format == ExportFormat.CSV:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(CSV_HEADER)
+        yield buffer.getvalue()
+
+    db = SessionLocal()
+    try:
+        for orders in crud.iter_store_orders(db, store_id=store_id, start=start, end=end, batch_size=EXPORT_BATCH_SIZE):
+            yield _format_batch(orders, export_format)
+    finally:
+        db.close()
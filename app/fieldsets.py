@@ -0,0 +1,165 @@
+import typing
+from copy import copy
+from functools import lru_cache
+from typing import List, NamedTuple, Optional
+
+from fastapi import HTTPException, Response, status
+from pydantic import BaseModel, ConfigDict, computed_field
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, load_only, raiseload, selectinload
+
+from . import serialization
+
+# --- Projeções de listas (?fields= / ?expand=) ---
+# 'fields' escolhe os campos do item (ex.: fields=id,name); 'expand' escolhe os
+# relacionamentos aninhados (ex.: expand=stores ou expand=stores.products).
+# Sem nenhum dos dois, a lista mantém a resposta completa. A mesma projeção gera
+# o schema de resposta e as opções da consulta: colunas não pedidas não são lidas
+# (load_only) e relacionamentos não expandidos não são consultados.
+
+# Campos calculados acompanham o campo de onde são derivados
+COMPUTED_SOURCES = {"image_variants": "image_url", "logo_variants": "logo_url"}
+
+# Relacionamentos expandidos: tupla ordenada de (nome, sub-árvore), para servir de chave de cache
+Tree = tuple
+
+class Projection(NamedTuple):
+    schema: type[BaseModel]
+    options: tuple
+
+def _related_schema(schema: type[BaseModel], name: str) -> Optional[type[BaseModel]]:
+    """Schema aninhado de um campo (ex.: List[Product] -> Product); None para campos simples."""
+    pending = [schema.model_fields[name].annotation]
+    while pending:
+        annotation = pending.pop()
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            return annotation
+        pending.extend(typing.get_args(annotation))
+    return None
+
+def _relations(schema: type[BaseModel]) -> list[str]:
+    return [name for name in schema.model_fields if _related_schema(schema, name) is not None]
+
+def _full_tree(schema: type[BaseModel]) -> Tree:
+    return tuple(sorted((name, _full_tree(_related_schema(schema, name))) for name in _relations(schema)))
+
+def _split(value: str) -> list[str]:
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+def _parse_expand(schema: type[BaseModel], expand: str) -> dict:
+    tree = {}
+    for path in _split(expand):
+        node, current = tree, schema
+        for name in path.split("."):
+            related = _related_schema(current, name) if name in current.model_fields else None
+            if related is None:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown expand path: {path}")
+            node, current = node.setdefault(name, {}), related
+    return tree
+
+def _freeze(tree: dict) -> Tree:
+    return tuple(sorted((name, _freeze(subtree)) for name, subtree in tree.items()))
+
+def parse(
+    schema: type[BaseModel],
+    model: type,
+    fields: Optional[str],
+    expand: Optional[str],
+    required: tuple[str, ...] = ()
+) -> Optional[Projection]:
+    """
+    Interpreta 'fields' e 'expand' para o schema de uma lista. Retorna None quando
+    nenhum dos dois foi informado (resposta completa). 'required' são colunas que
+    a rota precisa mesmo fora da resposta (ex.: a chave do cursor de paginação).
+    """
+    if fields is None and expand is None:
+        return None
+    relations = _relations(schema)
+    selected = None
+    if fields is not None:
+        selected = set()
+        for name in _split(fields):
+            name = COMPUTED_SOURCES.get(name, name) if name not in schema.model_fields else name
+            if name not in schema.model_fields:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown field: {name}")
+            selected.add(name)
+
+    if expand is None:
+        # Sem 'expand', os relacionamentos pedidos em 'fields' vêm completos
+        tree = {name: _thaw(_full_tree(_related_schema(schema, name))) for name in relations if selected is None or name in selected}
+    else:
+        tree = _parse_expand(schema, expand)
+        # Relacionamentos pedidos em 'fields' e não expandidos vêm rasos
+        for name in selected or ():
+            if name in relations:
+                tree.setdefault(name, {})
+
+    scalars = tuple(name for name in schema.model_fields if name not in relations and (selected is None or name in selected))
+    return _build(schema, model, scalars, _freeze(tree), tuple(required))
+
+def _thaw(tree: Tree) -> dict:
+    return {name: _thaw(subtree) for name, subtree in tree}
+
+@lru_cache(maxsize=256)
+def _build(schema: type[BaseModel], model: type, scalars: tuple, tree: Tree, required: tuple) -> Projection:
+    return Projection(_projection_schema(schema, scalars, tree), _loader_options(schema, model, scalars, tree, required))
+
+def _projection_schema(schema: type[BaseModel], scalars: tuple, tree: Tree) -> type[BaseModel]:
+    """Cria um schema com apenas os campos e relacionamentos da projeção."""
+    annotations = {}
+    namespace = {"__module__": schema.__module__, "model_config": ConfigDict(from_attributes=True)}
+    expanded = dict(tree)
+    # Mesma ordem de campos do schema original
+    for name, field in schema.model_fields.items():
+        if name in scalars:
+            annotations[name] = field.annotation
+            namespace[name] = copy(field)
+        elif name in expanded:
+            related = _related_schema(schema, name)
+            nested = _projection_schema(related, _scalars_of(related), expanded[name])
+            if typing.get_origin(field.annotation) in (list, List):
+                annotations[name], namespace[name] = list[nested], []
+            else:
+                annotations[name], namespace[name] = Optional[nested], None
+    for name, decorator in schema.__pydantic_decorators__.computed_fields.items():
+        if COMPUTED_SOURCES.get(name) in scalars:
+            namespace[name] = computed_field(property(decorator.func), return_type=decorator.info.return_type)
+    namespace["__annotations__"] = annotations
+    return type(f"{schema.__name__}Projection", (BaseModel,), namespace)
+
+def _scalars_of(schema: type[BaseModel]) -> tuple:
+    relations = _relations(schema)
+    return tuple(name for name in schema.model_fields if name not in relations)
+
+def _loader_options(schema: type[BaseModel], model: type, scalars: tuple, tree: Tree, required: tuple = ()) -> tuple:
+    """Opções de carregamento: só as colunas da projeção e só os relacionamentos expandidos."""
+    mapper = inspect(model)
+    expanded = dict(tree)
+    columns = {name for name in scalars + required if name in mapper.columns}
+    options = []
+    for name, relationship in mapper.relationships.items():
+        attribute = getattr(model, name)
+        if name not in expanded:
+            # Nunca acessado pela resposta: falha em vez de consultar, se isso mudar
+            options.append(raiseload(attribute))
+            continue
+        # Chaves estrangeiras locais (ex.: order_items.product_id) são necessárias para o carregamento
+        columns.update(column.key for column in relationship.local_columns if column.key in mapper.columns)
+        related = _related_schema(schema, name)
+        loader = selectinload(attribute) if relationship.uselist else joinedload(attribute)
+        options.append(loader.options(*_loader_options(related, relationship.mapper.class_, _scalars_of(related), expanded[name])))
+    # A chave primária é sempre carregada pelo SQLAlchemy
+    columns.update(mapper.get_property_by_column(column).key for column in mapper.primary_key)
+    options.insert(0, load_only(*(getattr(model, name) for name in sorted(columns))))
+    return tuple(options)
+
+def render(projection: Projection, items: list, response: Response) -> Response:
+    """
+    Serializa a lista com o schema da projeção. Os cabeçalhos definidos pela rota
+    (X-Next-Cursor, ETag) são copiados para a resposta retornada.
+    """
+    result = serialization.json_body(serialization.dump_json(list[projection.schema], items))
+    for name, value in response.headers.items():
+        if name not in ("content-length", "content-type"):
+            result.headers[name] = value
+    return result
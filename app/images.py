@@ -0,0 +1,247 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Iterable, Optional
+
+from fastapi import HTTPException, UploadFile, status
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import metrics
+from .security import POOL_CONTEXT
+
+# --- Configuração das variantes de imagem ---
+# Lado maior (em pixels) de cada variante; imagens menores não são ampliadas
+VARIANTS = {"thumb": 160, "card": 480, "full": 1280}
+WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
+# Tamanho máximo do arquivo enviado e da imagem decodificada (proteção contra "bombas" de descompressão)
+MAX_UPLOAD_BYTES = int(os.getenv("IMAGE_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+MAX_PIXELS = 40_000_000
+# Processos dedicados ao processamento de imagens
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(os.cpu_count() or 1)))
+# Tamanho dos pedaços copiados do upload para o arquivo temporário enquanto o conteúdo é hasheado
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Erros de decodificação: o arquivo enviado não é uma imagem válida (400); os demais são falhas do servidor
+INVALID_IMAGE_ERRORS = (UnidentifiedImageError, Image.DecompressionBombError)
+
+# --- Diretórios de mídia ---
+PRODUCT_IMAGES_DIRECTORY = "static/images/products"
+STORE_LOGOS_DIRECTORY = "static/store_logos"
+MEDIA_DIRECTORIES = (PRODUCT_IMAGES_DIRECTORY, STORE_LOGOS_DIRECTORY)
+# Arquivos mais novos que isso nunca são coletados: o registro que os referencia
+# pode ainda não ter sido gravado no banco
+GC_MIN_AGE_SECONDS = 3600
+
+def variant_path(base: str, variant: str) -> str:
+    return f"{base}_{variant}.webp"
+
+def variant_urls(image_url: Optional[str]) -> Optional[dict[str, str]]:
+    """
+    URLs das variantes a partir da URL gravada no banco (a variante 'full').
+    Imagens enviadas antes do pipeline não têm variantes.
+    """
+    suffix = "_full.webp"
+    if not image_url or not image_url.endswith(suffix):
+        return None
+    base = image_url[:-len(suffix)]
+    return {variant: variant_path(base, variant) for variant in VARIANTS}
+
+def _content_hasher():
+    """
+    Hash do conteúdo enviado. Inclui a configuração das variantes: se ela mudar,
+    o mesmo arquivo gera um novo endereço em vez de reaproveitar variantes antigas.
+    """
+    hasher = hashlib.blake2b(digest_size=20)
+    hasher.update(repr((sorted(VARIANTS.items()), WEBP_QUALITY)).encode())
+    return hasher
+
+# Função executada nos processos do pool (precisa ser de nível de módulo)
+def _render_variants(source: str, base: str):
+    """
+    Decodifica a imagem (o arquivo temporário do upload) uma vez e grava as
+    variantes em WebP, sem metadados (EXIF, GPS...).
+    Cada variante é gravada em um arquivo temporário e renomeada no fim; a 'full' é
+    a última, então sua existência garante que as demais estão completas.
+    """
+    Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+    token = uuid.uuid4().hex
+    temporary = {variant: f"{variant_path(base, variant)}.{token}.tmp" for variant in VARIANTS}
+    try:
+        with Image.open(source) as image:
+            # Aplica a rotação da câmera antes de descartar os metadados
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+            # Da maior para a menor: cada redução parte da anterior
+            for variant, size in sorted(VARIANTS.items(), key=lambda item: -item[1]):
+                image.thumbnail((size, size), Image.Resampling.LANCZOS)
+                image.save(temporary[variant], "WEBP", quality=WEBP_QUALITY, method=4)
+        for variant in sorted(VARIANTS, key=lambda variant: variant == "full"):
+            os.replace(temporary[variant], variant_path(base, variant))
+    finally:
+        for path in temporary.values():
+            Path(path).unlink(missing_ok=True)
+
+class ImageService:
+    """
+    Gera as variantes das imagens enviadas em um pool de processos: a decodificação
+    e o redimensionamento não disputam o GIL com as requisições. As rotas síncronas
+    aguardam o resultado em sua thread do threadpool.
+
+    Os arquivos são endereçados pelo hash do conteúdo: reenviar a mesma imagem
+    reaproveita as variantes já gravadas, sem processá-la de novo.
+    """
+
+    def __init__(self, workers: int = IMAGE_WORKERS):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.deduplicated = 0
+        self.total_seconds = 0.0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=POOL_CONTEXT)
+            return self._executor
+
+    def _discard_pool(self, executor: ProcessPoolExecutor):
+        """Descarta um pool quebrado (processo encerrado à força); o próximo upload cria outro."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def save(self, upload_file: UploadFile, directory: str) -> str:
+        """
+        Processa a imagem enviada, grava as variantes em 'directory' e retorna a URL
+        da variante 'full' (as demais são derivadas com variant_urls).
+        """
+        # Copia em pedaços para um arquivo temporário, calculando o hash durante a
+        # leitura: o upload não fica inteiro em memória e o processo do pool lê do disco
+        hasher = _content_hasher()
+        spool = tempfile.NamedTemporaryFile(prefix="upload-", suffix=".tmp", delete=False)
+        try:
+            try:
+                with spool:
+                    while chunk := upload_file.file.read(UPLOAD_CHUNK_SIZE):
+                        hasher.update(chunk)
+                        spool.write(chunk)
+                        if spool.tell() > MAX_UPLOAD_BYTES:
+                            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Image too large")
+            finally:
+                upload_file.file.close()
+            return self._store(spool.name, directory, hasher.hexdigest())
+        finally:
+            Path(spool.name).unlink(missing_ok=True)
+
+    def _store(self, source: str, directory: str, digest: str) -> str:
+        """Gera as variantes do arquivo 'source' (se ainda não existirem) e retorna a URL da 'full'."""
+        base = f"{directory}/{digest}"
+        url = f"/{variant_path(base, 'full')}"
+        try:
+            # Já processada: renova a data dos arquivos para que a coleta não os remova
+            # antes de o novo registro que os referencia ser gravado
+            for variant in VARIANTS:
+                os.utime(variant_path(base, variant))
+        except FileNotFoundError:
+            pass
+        else:
+            with self._lock:
+                self.deduplicated += 1
+            return url
+
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self.running += 1
+        started = time.perf_counter()
+        executor = self._pool()
+        try:
+            executor.submit(_render_variants, source, base).result()
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            if isinstance(e, INVALID_IMAGE_ERRORS):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid image") from e
+            if isinstance(e, BrokenProcessPool):
+                self._discard_pool(executor)
+                raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Image processing unavailable") from e
+            # Disco cheio, permissão negada...: não é culpa do arquivo enviado, segue como erro 500
+            raise
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.total_seconds += time.perf_counter() - started
+        return url
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "deduplicated": self.deduplicated,
+                "avg_seconds": self.total_seconds / self.completed if self.completed else 0.0,
+            }
+
+# --- Coleta de arquivos sem referência ---
+
+def _owner_url(path: Path) -> str:
+    """URL gravada no banco que mantém o arquivo: a da variante 'full' ou, em uploads antigos, a do próprio arquivo."""
+    name = path.name
+    if name.endswith(".tmp"):
+        name = name.split(".", 1)[0] + ".webp"
+    for variant in VARIANTS:
+        suffix = f"_{variant}.webp"
+        if name.endswith(suffix):
+            name = name[:-len(suffix)] + "_full.webp"
+            break
+    return f"/{path.parent.as_posix()}/{name}"
+
+def collect_garbage(
+    referenced_urls: set[str],
+    directories: Iterable[str] = MEDIA_DIRECTORIES,
+    min_age: float = GC_MIN_AGE_SECONDS,
+    dry_run: bool = False
+) -> tuple[int, int]:
+    """
+    Remove os arquivos de mídia que nenhum produto ou loja referencia (image_url/logo_url).
+    Retorna a quantidade de arquivos e de bytes liberados.
+    """
+    cutoff = time.time() - min_age
+    removed, freed = 0, 0
+    for directory in directories:
+        root = Path(directory)
+        if not root.is_dir():
+            continue
+        for path in root.iterdir():
+            if not path.is_file() or _owner_url(path) in referenced_urls:
+                continue
+            stat = path.stat()
+            if stat.st_mtime > cutoff:
+                continue
+            if not dry_run:
+                path.unlink(missing_ok=True)
+            removed += 1
+            freed += stat.st_size
+    return removed, freed
+
+# Instância global do serviço de imagens
+image_service = ImageService()
+metrics.register("image_processing", image_service.stats)
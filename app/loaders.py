@@ -0,0 +1,46 @@
+import os
+from sqlalchemy import event
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from . import models
+
+# --- Perfis de carregamento (eager loading) por schema de resposta ---
+# Cada perfil carrega exatamente os relacionamentos que o schema de resposta
+# correspondente serializa, evitando consultas "lazy" (N+1) durante a serialização.
+
+# schemas.Order: cliente (registrado ou convidado) e itens com seus produtos
+ORDER_PROFILE = (
+    joinedload(models.Order.customer_user),
+    joinedload(models.Order.guest_customer),
+    selectinload(models.Order.items).joinedload(models.OrderItem.product),
+)
+
+# schemas.Store: produtos da loja
+STORE_PROFILE = (
+    selectinload(models.Store.products),
+)
+
+# schemas.UserDetail: lojas do usuário e os produtos de cada loja
+USER_DETAIL_PROFILE = (
+    selectinload(models.User.stores).selectinload(models.Store.products),
+)
+
+# Para consultas que só precisam das colunas (ex.: verificação de permissão)
+NO_RELATIONSHIPS = ()
+
+# --- Modo estrito (para testes) ---
+# Com DB_STRICT_LOADING=1, qualquer carregamento "lazy" de relacionamento gera um erro,
+# revelando respostas que não estão cobertas por um perfil de carregamento.
+STRICT_LOADING = os.getenv("DB_STRICT_LOADING") == "1"
+
+def _raise_on_lazy_load(orm_execute_state):
+    if orm_execute_state.is_select and orm_execute_state.lazy_loaded_from is not None:
+        raise InvalidRequestError(
+            f"Carregamento lazy não permitido no modo estrito: {orm_execute_state.statement}"
+        )
+
+def enable_strict_loading():
+    """Ativa, para todas as sessões, a verificação de carregamentos lazy."""
+    if not event.contains(Session, "do_orm_execute", _raise_on_lazy_load):
+        event.listen(Session, "do_orm_execute", _raise_on_lazy_load)
@@ -1,21 +1,107 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import anyio.to_thread
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles # Importa StaticFiles
-from . import models
-from .database import engine
-from .routers import auth, stores, products, orders, users
+from . import models, loaders, async_crud, serialization
+from .database import engine, AsyncSessionLocal
+from .routers import auth, stores, products, orders, users, metrics
+from .websocket import manager
+from .outbox import dispatcher
+from .security import password_service
+from .images import image_service
+from .static_files import MediaStaticFiles
+from .compression import CompressionMiddleware
+from .order_board import order_board
+from .search import search_index
 
 # Cria as tabelas no banco de dados (se não existirem)
 models.Base.metadata.create_all(bind=engine)
 
+# Em testes, falha qualquer resposta que dispare carregamentos lazy (DB_STRICT_LOADING=1)
+if loaders.STRICT_LOADING:
+    loaders.enable_strict_loading()
+
+logger = logging.getLogger(__name__)
+
+# Reconstrução do índice de busca em andamento
+search_rebuild: Optional[asyncio.Task] = None
+
+async def rebuild_search_index():
+    """
+    Reconstrói em lotes o índice de busca de produtos. Roda em segundo plano:
+    a API atende enquanto isso, com resultados de busca ainda parciais.
+    """
+    search_index.begin_rebuild()
+    try:
+        async with AsyncSessionLocal() as db:
+            async for rows in async_crud.iter_product_search_rows(db):
+                # Cada lote é indexado fora do event loop: a API segue respondendo
+                await anyio.to_thread.run_sync(search_index.add_many, rows)
+    except Exception:
+        logger.exception("Falha ao reconstruir o índice de busca de produtos")
+    finally:
+        search_index.end_rebuild()
+
+async def start_search_rebuild():
+    """
+    Inicia (ou reinicia) em segundo plano a reconstrução do índice de busca. Após
+    uma reconexão do broker, produtos alterados em outros workers podem ter se perdido.
+    """
+    global search_rebuild
+    if search_rebuild is not None and not search_rebuild.done():
+        search_rebuild.cancel()
+        # O lote em andamento termina no threadpool: a reconstrução anterior encerra antes da nova
+        await asyncio.wait([search_rebuild])
+    search_rebuild = asyncio.create_task(rebuild_search_index())
+
+async def rebuild_order_board():
+    """
+    Reconstrói o quadro de pedidos em aberto. As sequências das lojas e os pedidos
+    são lidos na mesma transação (mesmo snapshot), e os eventos que chegarem pelo
+    broker durante a leitura são reaplicados se forem posteriores ao snapshot.
+    """
+    order_board.begin_rebuild()
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            floors = await async_crud.get_event_sequences(db)
+            open_orders = await async_crud.get_open_orders(db)
+            orders = [(order.store_id, order.id, order.status, serialization.order_json(order)) for order in open_orders]
+    order_board.rebuild(orders, floors)
+
+# Após uma reconexão do broker, eventos podem ter se perdido: o quadro é lido de novo do banco
+manager.add_resync_listener(rebuild_order_board)
+manager.add_resync_listener(start_search_rebuild)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Conecta o gerenciador de WebSocket ao broker (em memória ou entre workers)
+    await manager.start()
+    # Despacha em segundo plano os eventos de pedidos gravados no outbox
+    await dispatcher.start()
+    # Reconstrói o quadro de pedidos em aberto
+    await rebuild_order_board()
+    await start_search_rebuild()
+    yield
+    search_rebuild.cancel()
+    await dispatcher.stop()
+    await manager.stop()
+    password_service.shutdown()
+    image_service.shutdown()
+
 app = FastAPI(
     title="Delivery SaaS API",
     description="API para uma aplicação de Delivery multi-loja.",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
-# Monta um diretório para servir arquivos estáticos (logos das lojas)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Monta um diretório para servir arquivos estáticos (logos das lojas e imagens de produtos),
+# com cache imutável para os arquivos endereçados pelo conteúdo
+app.mount("/static", MediaStaticFiles(directory="static"), name="static")
 
 
 # ===================================================================
@@ -32,12 +118,16 @@ app.add_middleware(
 )
 # ===================================================================
 
+# Compressão gzip/brotli negociada, com política por rota (ver app/compression.py)
+app.add_middleware(CompressionMiddleware)
+
 # Inclui as rotas dos diferentes módulos
 app.include_router(auth.router)
 app.include_router(stores.router)
 app.include_router(products.router)
 app.include_router(orders.router)
 app.include_router(users.router)
+app.include_router(metrics.router)
 
 
 @app.get("/", tags=["Root"])
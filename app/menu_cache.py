@@ -0,0 +1,173 @@
+import os
+from bisect import bisect_right
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from . import models, schemas, metrics, serialization
+from .etags import make_etag
+from .websocket import manager
+
+# Tempo máximo de vida de um snapshot. Alterações feitas em outro worker chegam
+# pelo broker; o prazo cobre as que não passam pela API (scripts, SQL manual).
+MENU_CACHE_TTL = float(os.getenv("MENU_CACHE_TTL", "60"))
+# Quantidade máxima de lojas mantidas em memória
+MENU_CACHE_SIZE = int(os.getenv("MENU_CACHE_SIZE", "1000"))
+# Tópico das notificações de cardápios alterados, enviadas aos outros workers
+MENU_TOPIC = "menu"
+
+def _store_fields(db_store: models.Store) -> dict:
+    """Campos de schemas.Store, exceto os produtos, sem carregar o relacionamento."""
+    data = {name: getattr(db_store, name) for name in schemas.Store.model_fields if name != "products"}
+    return schemas.Store(**data).model_dump(mode="json", exclude={"products"})
+
+def _product_fields(db_product: models.Product) -> dict:
+    return schemas.Product.model_validate(db_product).model_dump(mode="json")
+
+class MenuSnapshot:
+    """
+    Cardápio público de uma loja já serializado em JSON, com seus ETags. Não é
+    alterado depois de criado: uma alteração gera outro snapshot, que substitui
+    este no cache. Quem leu o snapshot recebe corpo e ETag do mesmo estado.
+    """
+
+    def __init__(self, store: dict, products: dict[int, dict], expires_at: Optional[float] = None):
+        self.store = store
+        self.products = products
+        self.expires_at = expires_at if expires_at is not None else time.monotonic() + MENU_CACHE_TTL
+        self._render()
+
+    def replace(self, store: Optional[dict] = None, product: Optional[dict] = None) -> "MenuSnapshot":
+        """Novo snapshot com os dados da loja e/ou um produto alterados (sem acessar o banco)."""
+        products = self.products if product is None else {**self.products, product["id"]: product}
+        return MenuSnapshot(store if store is not None else self.store, products, self.expires_at)
+
+    def _render(self):
+        self.product_ids = sorted(self.products)
+        self.product_list = [self.products[product_id] for product_id in self.product_ids]
+        self.products_body = serialization.dump_data(self.product_list)
+        self.products_etag = make_etag(self.products_body)
+        self.store_body = serialization.dump_data({**self.store, "products": self.product_list})
+        self.store_etag = make_etag(self.store_body)
+
+    def products_page(self, skip: int, limit: int, after_id: Optional[int] = None) -> tuple[bytes, str, list]:
+        """
+        Retorna uma página da lista de produtos (após 'after_id', se informado,
+        ou a partir de 'skip'), com seu ETag e os itens da página.
+        """
+        start = bisect_right(self.product_ids, after_id) if after_id is not None else max(skip, 0)
+        if start == 0 and limit >= len(self.product_list):
+            return self.products_body, self.products_etag, self.product_list
+        page = self.product_list[start:start + limit]
+        body = serialization.dump_data(page)
+        return body, make_etag(body), page
+
+class MenuCache:
+    """
+    Snapshots dos cardápios públicos por loja. São montados na primeira leitura
+    e atualizados incrementalmente quando lojas e produtos são alterados.
+
+    Cada alteração avança a geração da loja. Quem vai montar um snapshot lê a
+    geração antes de consultar o banco; se ela mudou até o fim da montagem, os
+    dados lidos podem ser anteriores à alteração e o snapshot não é guardado.
+    """
+
+    def __init__(self, maxsize: int = MENU_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self._snapshots: "OrderedDict[int, MenuSnapshot]" = OrderedDict()
+        # Geração por loja; 'clear' avança a época, que vale para todas as lojas
+        self._generations: dict[int, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def get(self, store_id: int) -> Optional[MenuSnapshot]:
+        with self._lock:
+            snapshot = self._snapshots.get(store_id)
+            if snapshot is None or snapshot.expires_at < time.monotonic():
+                self.misses += 1
+                return None
+            self._snapshots.move_to_end(store_id)
+            self.hits += 1
+            return snapshot
+
+    def generation(self, store_id: int) -> tuple[int, int]:
+        """Geração atual do cardápio da loja; deve ser lida antes de consultar o banco para 'build'."""
+        with self._lock:
+            return self._epoch, self._generations.get(store_id, 0)
+
+    def _changed(self, store_id: int):
+        # Chamado com o lock adquirido
+        self._generations[store_id] = self._generations.get(store_id, 0) + 1
+
+    def build(self, db_store: models.Store, generation: tuple[int, int]) -> MenuSnapshot:
+        """
+        Monta o snapshot a partir de uma loja carregada com seus produtos. Ele só é
+        guardado se a loja não foi alterada desde 'generation' (lida antes da consulta).
+        """
+        snapshot = MenuSnapshot(
+            store=_store_fields(db_store),
+            products={product.id: _product_fields(product) for product in db_store.products}
+        )
+        with self._lock:
+            if generation != (self._epoch, self._generations.get(db_store.id, 0)):
+                # Alterado durante a montagem: serve esta resposta, mas não fica em cache
+                self.discarded += 1
+                return snapshot
+            self._snapshots[db_store.id] = snapshot
+            self._snapshots.move_to_end(db_store.id)
+            while len(self._snapshots) > self.maxsize:
+                self._snapshots.popitem(last=False)
+        return snapshot
+
+    def update_store(self, db_store: models.Store):
+        """Atualiza os dados da loja no snapshot existente."""
+        with self._lock:
+            self._changed(db_store.id)
+            snapshot = self._snapshots.get(db_store.id)
+            if snapshot is not None:
+                self._snapshots[db_store.id] = snapshot.replace(store=_store_fields(db_store))
+
+    def upsert_product(self, db_product: models.Product):
+        """Inclui ou atualiza um produto no snapshot da sua loja."""
+        with self._lock:
+            self._changed(db_product.store_id)
+            snapshot = self._snapshots.get(db_product.store_id)
+            if snapshot is not None:
+                self._snapshots[db_product.store_id] = snapshot.replace(product=_product_fields(db_product))
+
+    def invalidate(self, store_id: int):
+        with self._lock:
+            self._changed(store_id)
+            self._snapshots.pop(store_id, None)
+
+    def clear(self):
+        """Descarta todos os snapshots, inclusive os que estão sendo montados."""
+        with self._lock:
+            self._epoch += 1
+            self._generations.clear()
+            self._snapshots.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"stores": len(self._snapshots), "hits": self.hits, "misses": self.misses, "discarded": self.discarded}
+
+def publish_change(store_id: int):
+    """Avisa os outros workers que o cardápio da loja mudou; eles descartam seus snapshots."""
+    manager.notify(MENU_TOPIC, str(store_id))
+
+async def _apply_published_change(message: str):
+    menu_cache.invalidate(int(message))
+
+async def _resync():
+    # Avisos de alteração podem ter se perdido durante a queda do broker
+    menu_cache.clear()
+
+# Instância global do cache de cardápios
+menu_cache = MenuCache()
+metrics.register("menu_cache", menu_cache.stats)
+manager.add_notification_listener(MENU_TOPIC, _apply_published_change)
+manager.add_resync_listener(_resync)
@@ -0,0 +1,14 @@
+from typing import Callable, Dict
+
+# --- Registro de métricas ---
+# Cada subsistema registra uma função que devolve seus contadores atuais;
+# o conjunto é exposto em GET /metrics (somente ADMIN).
+_sources: Dict[str, Callable[[], dict]] = {}
+
+def register(name: str, source: Callable[[], dict]):
+    """Registra uma fonte de métricas com o nome informado."""
+    _sources[name] = source
+
+def snapshot() -> dict:
+    """Retorna os valores atuais de todas as fontes registradas."""
+    return {name: source() for name, source in _sources.items()}
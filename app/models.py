@@ -1,6 +1,6 @@
 import enum
 from sqlalchemy import (Boolean, Column, Integer, String, Float, ForeignKey, 
-                        DateTime, Enum)
+                        Date, DateTime, Enum, Text, Index)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -36,7 +36,7 @@ class Store(Base):
     __tablename__ = "stores"
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), index=True)
-    description = Column(String(255), index=True)
+    description = Column(String(255))
     logo_url = Column(String(255), nullable=True)
     owner_id = Column(Integer, ForeignKey("users.id"))
     
@@ -47,7 +47,7 @@ class Product(Base):
     __tablename__ = "products"
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), index=True)
-    description = Column(String(255), index=True)
+    description = Column(String(255))
     price = Column(Float, nullable=False)
     image_url = Column(String(255), nullable=True)
     store_id = Column(Integer, ForeignKey("stores.id"))
@@ -64,7 +64,7 @@ class OrderStatus(str, enum.Enum):
 
 class Order(Base):
     __tablename__ = "orders"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     
     # --- COLUNAS ATUALIZADAS ---
     # Agora um pedido pode pertencer a um usuário registrado OU a um convidado
@@ -89,10 +89,23 @@ class Order(Base):
     guest_customer = relationship("GuestUser", back_populates="orders")
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+    # Índices desenhados a partir das consultas reais:
+    # - pedidos da loja do mais recente ao mais antigo (listagem e cursor); também
+    #   atende a chave estrangeira store_id, sem um índice próprio só para ela
+    # - pedidos em aberto de todas as lojas (reconstrução do quadro de pedidos): o
+    #   filtro 'status IN (...)' não tem loja, então o índice começa pelo status.
+    #   O quadro por loja é servido da memória e não consulta pedidos por status.
+    # - pedidos de um usuário registrado
+    __table_args__ = (
+        Index("ix_orders_store_created_id", "store_id", "created_at", "id"),
+        Index("ix_orders_status_store", "status", "store_id"),
+        Index("ix_orders_customer_user_created", "customer_user_id", "created_at"),
+    )
+
 class OrderItem(Base):
     __tablename__ = "order_items"
-    id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
     product_id = Column(Integer, ForeignKey("products.id"))
     quantity = Column(Integer, nullable=False)
     price_at_purchase = Column(Float, nullable=False)
@@ -100,3 +113,55 @@ class OrderItem(Base):
     order = relationship("Order", back_populates="items")
     product = relationship("Product")
 
+class OrderEventType(str, enum.Enum):
+    ORDER_CREATED = "ORDER_CREATED"
+    ORDER_STATUS_CHANGED = "ORDER_STATUS_CHANGED"
+
+# --- Outbox de eventos de pedidos ---
+# Gravado na mesma transação do pedido; um despachante em segundo plano lê os
+# eventos pendentes e os envia aos painéis das lojas via WebSocket.
+class OrderEvent(Base):
+    __tablename__ = "order_events"
+    id = Column(Integer, primary_key=True)
+    store_id = Column(Integer, ForeignKey("stores.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    event_type = Column(Enum(OrderEventType), nullable=False)
+    payload = Column(Text, nullable=False) # JSON do pedido já serializado
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    dispatched = Column(Boolean, nullable=False, default=False)
+    # Sequência do evento na loja (StoreEventSequence): cursor de reenvio dos painéis
+    seq = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_order_events_dispatched_id", "dispatched", "id"),
+        Index("ix_order_events_store_seq", "store_id", "seq", unique=True),
+    )
+
+# --- Sequência de eventos por loja ---
+# Incrementada na mesma transação de cada evento do outbox. A linha da loja fica
+# bloqueada até o commit, então as sequências de uma loja são contínuas (1, 2, 3...)
+# e confirmadas em ordem, ao contrário do id autoincremental dos eventos.
+class StoreEventSequence(Base):
+    __tablename__ = "store_event_sequences"
+    store_id = Column(Integer, ForeignKey("stores.id"), primary_key=True)
+    seq = Column(Integer, nullable=False, default=0)
+
+# --- Agregados de vendas ---
+# Mantidos incrementalmente na criação e na mudança de status dos pedidos, para
+# que os relatórios nunca precisem agrupar a tabela de pedidos. Pedidos
+# cancelados não são contados. O dia é a data de 'created_at' do pedido.
+class StoreDailySales(Base):
+    __tablename__ = "store_daily_sales"
+    store_id = Column(Integer, ForeignKey("stores.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+    items_quantity = Column(Integer, nullable=False, default=0)
+
+class ProductDailySales(Base):
+    __tablename__ = "product_daily_sales"
+    store_id = Column(Integer, ForeignKey("stores.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
@@ -0,0 +1,101 @@
+import json
+import threading
+from typing import Dict, Optional, Tuple
+
+from . import metrics
+from .models import OrderStatus
+from .websocket import manager
+
+# Status que ainda aparecem no quadro de pedidos da loja
+OPEN_STATUSES = [status for status in OrderStatus if status not in (OrderStatus.DELIVERED, OrderStatus.CANCELED)]
+
+class OrderBoard:
+    """
+    Índice em memória dos pedidos em aberto de cada loja, agrupados por status.
+    Cada pedido é guardado como o JSON já serializado (schemas.Order), de modo
+    que o quadro é montado em O(pedidos abertos) sem consultar o banco.
+    Atualizações antigas (sequência de evento menor ou igual à já aplicada) são ignoradas.
+    """
+
+    def __init__(self):
+        # loja -> status -> pedido -> JSON do pedido
+        self._boards: Dict[int, Dict[OrderStatus, Dict[int, str]]] = {}
+        # pedido -> (loja, status atual, sequência do último evento aplicado)
+        self._orders: Dict[int, Tuple[int, OrderStatus, int]] = {}
+        # As funções CRUD síncronas rodam em threads do threadpool
+        self._lock = threading.Lock()
+        # Eventos aplicados durante uma reconstrução, reaplicados sobre o snapshot
+        self._rebuilding: Optional[list] = None
+
+    def apply(self, store_id: int, order_id: int, status: OrderStatus, payload: str, seq: int = 0):
+        """Inclui, move ou remove um pedido do quadro conforme o seu novo status."""
+        status = OrderStatus(status)
+        with self._lock:
+            if self._rebuilding is not None and seq:
+                self._rebuilding.append((store_id, order_id, status, payload, seq))
+            current = self._orders.get(order_id)
+            if current is not None:
+                if seq and seq <= current[2]:
+                    return
+                self._boards[current[0]][current[1]].pop(order_id, None)
+            if status in OPEN_STATUSES:
+                self._boards.setdefault(store_id, {s: {} for s in OPEN_STATUSES})[status][order_id] = payload
+                self._orders[order_id] = (store_id, status, max(seq, current[2] if current else 0))
+            else:
+                self._orders.pop(order_id, None)
+
+    def apply_message(self, store_id: int, message: str, seq: Optional[int]):
+        """Aplica um evento recebido pelo broker (pedidos alterados em outros workers)."""
+        if seq is None:
+            return
+        data = json.loads(message)
+        if "id" not in data or "status" not in data:
+            return
+        data.pop("seq", None)
+        data.pop("event_type", None)
+        self.apply(store_id, data["id"], data["status"], json.dumps(data), seq)
+
+    def begin_rebuild(self):
+        """
+        Chamado antes de ler o snapshot do banco: os eventos recebidos até rebuild()
+        são guardados e reaplicados sobre o snapshot, se forem posteriores a ele.
+        """
+        with self._lock:
+            self._rebuilding = []
+
+    def rebuild(self, orders: list[tuple[int, int, OrderStatus, str]], floors: Dict[int, int]):
+        """
+        Recria o índice a partir dos pedidos em aberto (loja, pedido, status, JSON).
+        'floors' é a sequência de eventos de cada loja lida no mesmo snapshot dos
+        pedidos: como as sequências de uma loja são confirmadas em ordem, todo
+        evento até ela está refletido nos pedidos e todo evento posterior, não.
+        """
+        with self._lock:
+            received, self._rebuilding = self._rebuilding or [], None
+            self._boards.clear()
+            self._orders.clear()
+        for store_id, order_id, status, payload in orders:
+            self.apply(store_id, order_id, status, payload, floors.get(store_id, 0))
+        for store_id, order_id, status, payload, seq in received:
+            if seq > floors.get(store_id, 0):
+                self.apply(store_id, order_id, status, payload, seq)
+
+    def render(self, store_id: int) -> bytes:
+        """Serializa o quadro da loja: {"STATUS": [pedidos...], ...}."""
+        with self._lock:
+            board = self._boards.get(store_id, {})
+            parts = [
+                f'"{status.value}":[{",".join(board.get(status, {}).values())}]'
+                for status in OPEN_STATUSES
+            ]
+        return ("{" + ",".join(parts) + "}").encode()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"stores": len(self._boards), "open_orders": len(self._orders)}
+
+# Instância global do quadro de pedidos
+order_board = OrderBoard()
+metrics.register("order_board", order_board.stats)
+# Eventos de outros workers chegam pelo broker do gerenciador de WebSocket
+manager.add_listener(order_board.apply_message)
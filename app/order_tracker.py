@@ -0,0 +1,128 @@
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Dict, Optional, Set
+
+from . import metrics
+from .models import OrderStatus
+from .websocket import manager
+
+# Intervalo (em segundos) entre comentários de keep-alive enviados a conexões ociosas
+KEEPALIVE_INTERVAL = float(os.getenv("TRACK_KEEPALIVE_INTERVAL", "15"))
+
+# Status finais: depois deles o pedido não muda mais e o fluxo é encerrado
+FINAL_STATUSES = {OrderStatus.DELIVERED.value, OrderStatus.CANCELED.value}
+
+class _Subscription:
+    """
+    Acompanhamento de um pedido por um cliente. Guarda apenas a última mensagem
+    recebida: um cliente lento pula estados intermediários em vez de acumular memória.
+    """
+    __slots__ = ("message", "seq", "changed", "stale")
+
+    def __init__(self):
+        self.message: Optional[str] = None
+        self.seq: Optional[int] = None
+        self.changed = asyncio.Event()
+        # Eventos podem ter se perdido (reconexão do broker): o fluxo é encerrado
+        self.stale = False
+
+class OrderTracker:
+    """
+    Entrega aos clientes que acompanham um pedido (Server-Sent Events) as mensagens
+    de eventos recebidas pelo gerenciador de WebSocket. Cada conexão ociosa custa
+    apenas uma corrotina suspensa e um asyncio.Event, sem consultas ao banco.
+    """
+
+    def __init__(self):
+        # pedido -> assinaturas ativas
+        self._subscriptions: Dict[int, Set[_Subscription]] = {}
+        self.delivered = 0
+
+    def subscribe(self, order_id: int) -> _Subscription:
+        subscription = _Subscription()
+        self._subscriptions.setdefault(order_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, order_id: int, subscription: _Subscription):
+        subscriptions = self._subscriptions.get(order_id)
+        if not subscriptions:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscriptions[order_id]
+
+    def start_at(self, subscription: _Subscription, seq: int):
+        """
+        Define a sequência do snapshot lido do banco: eventos até ela (inclusive os
+        que chegarem atrasados de outro worker) já estão no snapshot e são ignorados.
+        """
+        if subscription.seq is None or subscription.seq <= seq:
+            subscription.message = None
+            subscription.seq = seq
+            subscription.changed.clear()
+
+    def on_message(self, store_id: int, message: str, seq: Optional[int]):
+        """Listener do gerenciador de WebSocket: repassa o evento a quem acompanha o pedido."""
+        if seq is None or not self._subscriptions:
+            return
+        order_id = json.loads(message).get("id")
+        for subscription in self._subscriptions.get(order_id, ()):
+            if subscription.seq is None or seq > subscription.seq:
+                subscription.message = message
+                subscription.seq = seq
+                subscription.changed.set()
+                self.delivered += 1
+
+    async def resync(self):
+        """
+        Listener de reconexão do broker: encerra os fluxos abertos. O navegador
+        reconecta sozinho e recebe um novo snapshot lido do banco.
+        """
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                subscription.stale = True
+                subscription.changed.set()
+
+    async def stream(self, order_id: int, subscription: _Subscription, snapshot: str, status: str, seq: int) -> AsyncIterator[str]:
+        """
+        Gera o fluxo SSE: primeiro o estado atual ('snapshot') e depois somente as
+        mudanças de status. A assinatura deve ser feita antes de ler o snapshot,
+        para que nenhuma transição ocorrida entre os dois passos se perca, e
+        iniciada com start_at na sequência do snapshot ('seq'). O fluxo termina (e a
+        assinatura é removida) ao enviar um status final.
+        """
+        try:
+            # 'id' faz a reconexão automática do navegador enviar Last-Event-ID
+            yield f"id: {seq}\nevent: status\ndata: {snapshot}\n\n"
+            while status not in FINAL_STATUSES:
+                try:
+                    await asyncio.wait_for(subscription.changed.wait(), timeout=KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if subscription.stale:
+                    break
+                subscription.changed.clear()
+                message, seq = subscription.message, subscription.seq
+                new_status = json.loads(message).get("status")
+                if new_status == status:
+                    continue
+                status = new_status
+                yield f"id: {seq}\nevent: status\ndata: {message}\n\n"
+        finally:
+            self.unsubscribe(order_id, subscription)
+
+    def stats(self) -> dict:
+        return {
+            "tracked_orders": len(self._subscriptions),
+            "connections": sum(len(subscriptions) for subscriptions in self._subscriptions.values()),
+            "delivered": self.delivered,
+        }
+
+# Instância global do acompanhamento de pedidos
+order_tracker = OrderTracker()
+metrics.register("order_tracking", order_tracker.stats)
+# Os eventos chegam pelo mesmo caminho que alimenta os painéis das lojas
+manager.add_listener(order_tracker.on_message)
+manager.add_resync_listener(order_tracker.resync)
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import select
+
+from . import models, async_crud
+from .database import AsyncSessionLocal
+from .websocket import manager, Events
+
+logger = logging.getLogger(__name__)
+
+# Quantidade máxima de eventos lidos por lote
+BATCH_SIZE = 100
+# Intervalo (em segundos) entre verificações quando não há notificação local
+POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1.0"))
+# Por quanto tempo os eventos despachados ficam disponíveis para reenvio
+RETENTION_HOURS = float(os.getenv("OUTBOX_RETENTION_HOURS", "24"))
+# Intervalo (em segundos) entre as limpezas de eventos antigos
+PURGE_INTERVAL = 600
+# Máximo de eventos reenviados a um cliente reconectado; acima disso ele deve recarregar tudo
+REPLAY_LIMIT = 1000
+
+def event_message(event: models.OrderEvent) -> str:
+    """
+    Monta a mensagem enviada aos painéis: o JSON do pedido acrescido da
+    sequência ('seq') e do tipo do evento, sem desserializar o payload.
+    """
+    return f'{{"seq":{event.seq},"event_type":"{event.event_type.value}",{event.payload[1:]}'
+
+def resync_message(seq: int | None) -> str:
+    """Avisa o cliente de que os eventos perdidos não estão mais disponíveis."""
+    return json.dumps({"event_type": "RESYNC_REQUIRED", "seq": seq})
+
+async def fetch_missed_events(store_id: int, since: int) -> Events:
+    """Busca no outbox os eventos de uma loja posteriores a 'since' para reenvio."""
+    async with AsyncSessionLocal() as db:
+        min_seq, current_seq = await async_crud.get_store_event_bounds(db, store_id)
+        if since >= current_seq:
+            return []
+        # Eventos posteriores a 'since' podem já ter sido removidos pela retenção
+        if min_seq is None or since < min_seq - 1:
+            return [(since, resync_message(current_seq))]
+        events = await async_crud.get_store_events_since(db, store_id, since, limit=REPLAY_LIMIT + 1)
+    if len(events) > REPLAY_LIMIT:
+        return [(since, resync_message(current_seq))]
+    return [(event.seq, event_message(event)) for event in events]
+
+class OutboxDispatcher:
+    """
+    Lê em lotes os eventos pendentes do outbox (models.OrderEvent) e os publica
+    para os painéis das lojas. Um evento só é marcado como despachado depois de
+    publicado; em caso de falha ele é tentado novamente no próximo ciclo.
+    Os lotes são despachados um de cada vez, mesmo com vários workers: o lote fica
+    bloqueado (FOR UPDATE, sem SKIP LOCKED) até o commit, e o despachante seguinte
+    espera. Como as sequências de uma loja são confirmadas em ordem, cada loja
+    recebe seus eventos publicados em ordem crescente de sequência.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, connection_manager=manager):
+        self.session_factory = session_factory
+        self.manager = connection_manager
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._last_purge = time.monotonic()
+
+    async def start(self):
+        # Com o broker já assinado, todo evento posterior às sequências atuais
+        # passará pelo buffer de reenvio deste processo
+        async with self.session_factory() as db:
+            floors = await async_crud.get_event_sequences(db)
+        self.manager.replay_buffer.reset(floors)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def notify(self):
+        """Acorda o despachante logo após o commit de um novo evento."""
+        self._wakeup.set()
+
+    async def dispatch_pending(self) -> int:
+        """Publica um lote de eventos pendentes e retorna quantos foram despachados."""
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(models.OrderEvent)
+                .where(models.OrderEvent.dispatched == False)
+                .order_by(models.OrderEvent.id)
+                .limit(BATCH_SIZE)
+                .with_for_update()
+            )
+            events = result.scalars().all()
+            for event in events:
+                await self.manager.publish(event.store_id, event_message(event), seq=event.seq)
+                event.dispatched = True
+            await db.commit()
+            return len(events)
+
+    async def purge_expired(self) -> int:
+        """Remove os eventos despachados mais antigos que a retenção configurada."""
+        cutoff = datetime.utcnow() - timedelta(hours=RETENTION_HOURS)
+        async with self.session_factory() as db:
+            return await async_crud.delete_dispatched_events_before(db, cutoff)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                dispatched = await self.dispatch_pending()
+                if time.monotonic() - self._last_purge > PURGE_INTERVAL:
+                    self._last_purge = time.monotonic()
+                    await self.purge_expired()
+            except Exception:
+                logger.exception("Falha ao despachar eventos do outbox")
+                dispatched = 0
+            if dispatched < BATCH_SIZE:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+# Instância global do despachante
+dispatcher = OutboxDispatcher()
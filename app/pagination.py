@@ -0,0 +1,58 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException, Response, status
+from typing import Optional
+
+# --- Paginação por cursor (keyset) ---
+# O cursor é opaco para o cliente: a chave de ordenação do último item da página
+# codificada em base64. A próxima página é informada no cabeçalho X-Next-Cursor.
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode(cursor: str) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list):
+            raise ValueError
+        return values
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+def decode_id_cursor(cursor: Optional[str]) -> Optional[int]:
+    """Decodifica um cursor de listas ordenadas por id."""
+    if cursor is None:
+        return None
+    values = _decode(cursor)
+    if len(values) != 1 or not isinstance(values[0], int):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return values[0]
+
+def decode_order_cursor(cursor: Optional[str]) -> Optional[tuple[datetime, int]]:
+    """Decodifica um cursor de pedidos, ordenados por (created_at, id)."""
+    if cursor is None:
+        return None
+    values = _decode(cursor)
+    try:
+        created_at, order_id = values
+        if not isinstance(order_id, int):
+            raise ValueError
+        return datetime.fromisoformat(created_at), order_id
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+def set_next_cursor(response: Response, items: list, limit: int, key):
+    """Informa o cursor da próxima página quando a página atual veio completa."""
+    if items and len(items) >= limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*key(items[-1]))
+
+def id_key(item) -> tuple:
+    return (item.id,)
+
+def order_key(order) -> tuple:
+    return (order.created_at, order.id)
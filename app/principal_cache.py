@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from typing import Awaitable, Callable, Optional
+
+from . import models, metrics
+from .websocket import manager
+
+# Tempo de vida (segundos) e tamanho máximo do cache de usuários autenticados
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+# Tópico das notificações de usuários alterados, enviadas aos outros workers
+PRINCIPAL_TOPIC = "principal"
+
+class PrincipalCache:
+    """
+    Cache LRU com TTL dos usuários autenticados, indexado pelo email ('sub' do JWT).
+    Guarda apenas uma cópia desanexada da sessão com id, email, role e is_active,
+    evitando uma consulta ao banco em cada requisição autenticada.
+
+    Cada invalidação avança a geração do cache. Quem vai consultar o banco lê a
+    geração antes; se ela mudou até o 'set', o usuário lido pode ser anterior à
+    alteração (ex.: role rebaixado em outro worker) e não é guardado.
+    """
+
+    def __init__(self, maxsize: int = PRINCIPAL_CACHE_SIZE, ttl: float = PRINCIPAL_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple[float, models.User]]" = OrderedDict()
+        self._generation = 0
+        # As dependências síncronas rodam em threads do threadpool
+        self._lock = threading.Lock()
+
+    def get(self, email: str) -> Optional[models.User]:
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[email]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(email)
+            self.hits += 1
+            return entry[1]
+
+    def generation(self) -> int:
+        """Geração atual; deve ser lida antes de consultar o usuário no banco para 'set'."""
+        with self._lock:
+            return self._generation
+
+    def set(self, user: models.User, generation: Optional[int] = None) -> models.User:
+        """
+        Armazena uma cópia do usuário e a retorna. Com 'generation', a cópia só é
+        guardada se nenhuma invalidação ocorreu desde então.
+        """
+        principal = models.User(id=user.id, email=user.email, role=user.role, is_active=user.is_active)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return principal
+            self._entries[user.email] = (time.monotonic() + self.ttl, principal)
+            self._entries.move_to_end(user.email)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return principal
+
+    def invalidate(self, email: str):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(email, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+def invalidation_listener(cache: PrincipalCache) -> Callable[[str], Awaitable[None]]:
+    """Listener das notificações de usuários alterados em outros workers."""
+    async def invalidate(message: str):
+        for email in json.loads(message):
+            cache.invalidate(email)
+    return invalidate
+
+# Instância global do cache
+principal_cache = PrincipalCache()
+metrics.register("principal_cache", principal_cache.stats)
+manager.add_notification_listener(PRINCIPAL_TOPIC, invalidation_listener(principal_cache))
+
+async def _resync():
+    # Invalidações podem ter se perdido durante a queda do broker
+    principal_cache.clear()
+
+manager.add_resync_listener(_resync)
+
+# Qualquer alteração em um usuário (role, is_active, ...) invalida sua entrada.
+# A invalidação no flush não basta: até o commit, outra requisição ainda lê a
+# versão antiga no banco e pode recolocá-la no cache. Por isso os emails
+# alterados são guardados na sessão e invalidados de novo após o commit, aqui
+# e, pelo broker, nos demais workers.
+@event.listens_for(models.User, "after_update")
+def _invalidate_updated_user(mapper, connection, target):
+    principal_cache.invalidate(target.email)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("updated_principals", set()).add(target.email)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    emails = session.info.pop("updated_principals", None)
+    if not emails:
+        return
+    for email in emails:
+        principal_cache.invalidate(email)
+    manager.notify(PRINCIPAL_TOPIC, json.dumps(sorted(emails)))
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_updated_users(session, previous_transaction):
+    session.info.pop("updated_principals", None)
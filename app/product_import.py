@@ -0,0 +1,121 @@
+import codecs
+import csv
+import json
+from enum import Enum
+from typing import AsyncIterator, Union
+
+from pydantic import ValidationError
+
+from . import schemas
+
+# Linhas validadas e gravadas por transação
+IMPORT_BATCH_SIZE = 500
+# Máximo de erros detalhados na resposta (os demais só entram na contagem)
+MAX_REPORTED_ERRORS = 1000
+
+class ImportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+# Uma linha do arquivo: (número da linha, campos) ou (número da linha, mensagem de erro)
+Record = tuple[int, Union[dict, str]]
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decodifica o corpo da requisição em UTF-8 à medida que chega, linha a linha."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+async def _iter_csv(lines: AsyncIterator[str]) -> AsyncIterator[Record]:
+    # Um registro CSV pode ocupar várias linhas (campo entre aspas com quebra de linha):
+    # ele só está completo quando o número de aspas é par
+    header = None
+    number = 0
+    record, quotes = [], 0
+    async for line in lines:
+        record.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        values = next(csv.reader(["".join(record)]), [])
+        record, quotes = [], 0
+        if header is None:
+            header = [value.strip().lower() for value in values]
+            continue
+        number += 1
+        if not any(value.strip() for value in values):
+            continue
+        if len(values) != len(header):
+            yield number, f"Esperadas {len(header)} colunas, encontradas {len(values)}"
+            continue
+        # Células vazias equivalem a campos não informados
+        yield number, {key: value for key, value in zip(header, values) if value.strip()}
+
+async def _iter_ndjson(lines: AsyncIterator[str]) -> AsyncIterator[Record]:
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            yield number, "JSON inválido"
+            continue
+        if not isinstance(data, dict):
+            yield number, "Cada linha deve ser um objeto JSON"
+            continue
+        yield number, data
+
+def validate_record(data: dict) -> schemas.ProductImportRow:
+    """Valida uma linha; produtos novos exigem nome e preço."""
+    row = schemas.ProductImportRow.model_validate(data)
+    required = ("name", "price") if row.id is None else ()
+    missing = [field for field in required if getattr(row, field) is None]
+    # Em atualizações, nome e preço podem ser omitidos, mas não anulados
+    missing += [field for field in ("name", "price") if row.id is not None and field in row.model_fields_set and getattr(row, field) is None]
+    if missing:
+        raise ValueError(f"Campos obrigatórios: {', '.join(missing)}")
+    return row
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors())
+    return str(error)
+
+async def iter_batches(
+    chunks: AsyncIterator[bytes],
+    import_format: ImportFormat,
+    result: schemas.ProductImportResult
+) -> AsyncIterator[list[tuple[int, schemas.ProductImportRow]]]:
+    """
+    Lê e valida o arquivo em streaming, gerando lotes de até IMPORT_BATCH_SIZE
+    linhas válidas. Linhas inválidas são registradas em 'result'.
+    """
+    records = _iter_csv(_iter_lines(chunks)) if import_format == ImportFormat.CSV else _iter_ndjson(_iter_lines(chunks))
+    batch = []
+    async for number, data in records:
+        try:
+            if isinstance(data, str):
+                raise ValueError(data)
+            batch.append((number, validate_record(data)))
+        except ValueError as e:
+            add_error(result, number, _error_message(e))
+            continue
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def add_error(result: schemas.ProductImportResult, number: int, message: str):
+    result.failed += 1
+    if len(result.errors) < MAX_REPORTED_ERRORS:
+        result.errors.append(schemas.ProductImportError(row=number, error=message))
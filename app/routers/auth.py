@@ -1,24 +1,28 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 
-from .. import crud, models, schemas, deps
-from ..database import get_db
+from .. import crud, async_crud, models, schemas, deps
+from ..database import get_db, get_async_db
+from ..security import password_service
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
 @router.post("/register", response_model=schemas.UserDetail)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(db, email=user.email)
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await async_crud.get_user_by_email(db, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_user(db=db, user=user)
+    # O bcrypt roda no pool de processos do serviço de senhas
+    hashed_password = await password_service.hash(user.password)
+    return await async_crud.create_user(db=db, user=user, hashed_password=hashed_password)
 
 @router.post("/token", response_model=schemas.Token)
-def login_for_access_token(db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()):
+async def login_for_access_token(db: AsyncSession = Depends(get_async_db), form_data: OAuth2PasswordRequestForm = Depends()):
     # Usa a função centralizada em deps.py para autenticar
-    user = deps.authenticate_user(db, form_data.username, form_data.password)
+    user = await deps.authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -34,10 +38,14 @@ def login_for_access_token(db: Session = Depends(get_db), form_data: OAuth2Passw
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/users/me", response_model=schemas.UserDetail) # <-- CORREÇÃO PRINCIPAL
-def read_users_me(current_user: models.User = Depends(deps.get_current_active_user)):
+def read_users_me(
+    current_user: models.User = Depends(deps.get_current_active_user),
+    db: Session = Depends(get_db)
+):
     """
     Retorna os dados do usuário atualmente autenticado.
     O token JWT é usado para identificar o usuário.
     """
-    return current_user
+    # Recarrega o usuário com o perfil de UserDetail (lojas e produtos)
+    return crud.get_user_by_id(db, user_id=current_user.id)
 
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends
+
+from .. import deps, metrics
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+    dependencies=[Depends(deps.require_admin)]
+)
+
+@router.get("/")
+def read_metrics():
+    """
+    Retorna os contadores internos da aplicação (caches, filas, etc.).
+    Acesso restrito a administradores.
+    """
+    return metrics.snapshot()
@@ -1,11 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import Dict, List, Optional
 
-from .. import crud, models, schemas
-from ..database import get_db
+from .. import crud, async_crud, models, schemas, loaders, pagination, etags, exports, serialization, fieldsets
+from ..database import get_db, get_async_db, AsyncSessionLocal
 from ..deps import get_current_active_user
 from ..websocket import manager # Importa o gerenciador de WebSocket
+from ..outbox import dispatcher, fetch_missed_events
+from ..order_board import order_board
+from ..order_tracker import order_tracker, FINAL_STATUSES
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
@@ -14,10 +20,13 @@ router = APIRouter(prefix="/orders", tags=["orders"])
 async def websocket_endpoint(
     websocket: WebSocket,
     store_id: int,
+    since: Optional[int] = None,
     db: Session = Depends(get_db)
 ):
     """
     Mantém uma conexão WebSocket para uma loja específica.
+    Cada mensagem traz a sequência do evento ('seq'); ao reconectar com
+    '?since=<seq>' o painel recebe apenas os eventos perdidos.
     A autenticação (via token nos query params) é recomendada para produção.
     """
     # Exemplo de como proteger o endpoint:
@@ -28,12 +37,15 @@ async def websocket_endpoint(
     #     await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
     #     return
 
-    await manager.connect(websocket, store_id)
     try:
+        await manager.connect(websocket, store_id, since=since, fetch_missed=fetch_missed_events)
         while True:
             # Mantém a conexão ativa para receber notificações do servidor
             await websocket.receive_text()
     except WebSocketDisconnect:
+        pass
+    finally:
+        # Também em falhas no reenvio ou no socket: a conexão nunca fica registrada
         manager.disconnect(websocket, store_id)
         
 # --- ROTAS PÚBLICAS (NÃO EXIGEM LOGIN) ---
@@ -41,25 +53,21 @@ async def websocket_endpoint(
 @router.post("/", response_model=schemas.Order)
 async def create_guest_order(
     order: schemas.OrderCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Cria um novo pedido para um cliente convidado (não autenticado).
     Os dados do cliente são fornecidos no corpo da requisição.
     """
     try:
-        new_order = crud.create_guest_order(db=db, order=order)
-        
-        # Carrega os dados completos para enviar via WebSocket
-        full_order_data = crud.get_order(db, order_id=new_order.id)
-        order_schema = schemas.Order.from_orm(full_order_data)
+        # O evento de notificação é gravado no outbox na mesma transação do pedido
+        new_order, payload = await async_crud.create_guest_order(db=db, order=order)
         
-        # Notifica a loja em tempo real sobre o novo pedido
-        await manager.broadcast_to_store(
-            store_id=new_order.store_id,
-            data=order_schema.model_dump(mode='json')
-        )
-        return new_order
+        # Acorda o despachante para notificar a loja em tempo real
+        dispatcher.notify()
+
+        # Responde com o mesmo JSON enviado à loja: nenhuma consulta nem serialização extra
+        return serialization.json_body(payload)
         
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -68,19 +76,32 @@ async def create_guest_order(
 def track_order(
     order_id: int,
     phone: str, # Cliente informa o telefone como parâmetro de busca para validar
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     """
     Permite que um cliente (convidado ou não) acompanhe o status de seu pedido
     usando o ID do pedido e o número de telefone associado.
+    Responde com ETag; se o pedido não mudou desde a última consulta
+    (If-None-Match), retorna 304 sem carregar nem serializar o pedido.
+    A versão muda a cada criação ou mudança de status do pedido. Limitação: não
+    muda quando o cliente convidado atualiza nome/endereço em um novo pedido
+    nem quando um produto é renomeado; esses dados podem ficar desatualizados
+    no cache do cliente até a próxima mudança do pedido.
     """
-    order = crud.get_order(db, order_id=order_id)
-    if not order:
+    version = crud.get_order_version(db, order_id=order_id)
+    if version is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
+    guest_phone, order_version = version
     
     # Valida se o telefone corresponde ao pedido (para clientes convidados)
-    if order.guest_customer and order.guest_customer.phone == phone:
-        return order
+    if guest_phone is not None and guest_phone == phone:
+        etag = etags.version_etag("order", order_id, order_version)
+        if etags.etag_matches(request, etag):
+            return etags.not_modified(etag)
+        response.headers["ETag"] = etag
+        return crud.get_order(db, order_id=order_id)
         
     # (Opcional) Adicionar lógica para clientes logados se necessário
     # if order.customer_user and order.customer_user.phone == phone:
@@ -89,6 +110,45 @@ def track_order(
     # Se a validação falhar para todos os casos
     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view this order")
 
+@router.get("/track/{order_id}/events")
+async def track_order_events(order_id: int, phone: str, request: Request):
+    """
+    Versão Server-Sent Events de 'track_order': envia o pedido atual e, mantendo
+    a conexão aberta, apenas as mudanças de status seguintes. Substitui o
+    polling da página de acompanhamento; o banco é consultado só na conexão.
+    O fluxo termina após um status final (entregue ou cancelado); a reconexão
+    automática do EventSource recebe então 204, que encerra as tentativas.
+    """
+    # Assina antes de ler o pedido para não perder uma transição entre as duas etapas
+    subscription = order_tracker.subscribe(order_id)
+    try:
+        # Sessão própria: a conexão com o banco é devolvida antes do streaming
+        async with AsyncSessionLocal() as db:
+            # Pedido e sequência do seu último evento lidos na mesma transação
+            seq = await async_crud.get_order_event_seq(db, order_id=order_id)
+            order = await async_crud.get_order(db, order_id=order_id)
+        if not order:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
+        if not (order.guest_customer and order.guest_customer.phone == phone):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view this order")
+    except Exception:
+        order_tracker.unsubscribe(order_id, subscription)
+        raise
+
+    if order.status.value in FINAL_STATUSES and "last-event-id" in request.headers:
+        order_tracker.unsubscribe(order_id, subscription)
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    # Eventos atrasados, anteriores ao snapshot, não fazem o status voltar
+    order_tracker.start_at(subscription, seq)
+    snapshot = serialization.order_json(order)
+    return StreamingResponse(
+        order_tracker.stream(order_id, subscription, snapshot, order.status.value, seq),
+        media_type="text/event-stream",
+        # Desativa cache e o buffer de proxies reversos (nginx) para entregar cada evento na hora
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # --- ROTAS QUE EXIGEM AUTENTICAÇÃO (LOJISTA/ADMIN/CLIENTE LOGADO) ---
 
 @router.get("/me", response_model=List[schemas.Order])
@@ -102,13 +162,31 @@ def read_my_orders(
 @router.get("/store/{store_id}", response_model=List[schemas.Order])
 def read_store_orders(
     store_id: int,
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    """Retorna todos os pedidos de uma loja. Acessível por ADMIN ou pelo OWNER da loja."""
-    db_store = crud.get_store(db, store_id=store_id)
+    """
+    Retorna os pedidos de uma loja, do mais recente para o mais antigo.
+    Acessível por ADMIN ou pelo OWNER da loja. Aceita 'skip'/'limit' ou o cursor
+    devolvido no cabeçalho X-Next-Cursor, que mantém o custo constante em qualquer página.
+    Com 'fields' (ex.: fields=id,status,total_price) e/ou 'expand' (ex.: expand=items,guest_customer),
+    retorna apenas os campos e relacionamentos pedidos.
+    Responde com ETag e retorna 304 se nenhum pedido da loja mudou desde a última consulta.
+    A versão é a sequência de eventos da loja, que muda a cada pedido criado ou
+    alterado. Limitação: alterações nos dados de clientes convidados e nos nomes
+    dos produtos não mudam a versão e só aparecem após a próxima mudança nos pedidos.
+    """
+    after = pagination.decode_order_cursor(cursor)
+    # 'created_at' compõe o cursor da próxima página, mesmo fora dos campos pedidos
+    projection = fieldsets.parse(schemas.Order, models.Order, fields, expand, required=("created_at",))
+    db_store = crud.get_store(db, store_id=store_id, profile=loaders.NO_RELATIONSHIPS)
     if not db_store:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Store not found")
 
@@ -118,37 +196,98 @@ def read_store_orders(
     if not is_admin and not is_store_owner:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view these orders")
     
-    return crud.get_store_orders(db, store_id=store_id, skip=skip, limit=limit)
+    # Versão e pedidos são lidos na mesma transação (mesmo snapshot)
+    etag = etags.version_etag("store-orders", store_id, crud.get_store_orders_version(db, store_id=store_id), skip, limit, cursor, fields, expand)
+    if etags.etag_matches(request, etag):
+        return etags.not_modified(etag)
+
+    profile = projection.options if projection else loaders.ORDER_PROFILE
+    orders = crud.get_store_orders(db, store_id=store_id, skip=skip, limit=limit, after=after, profile=profile)
+    pagination.set_next_cursor(response, orders, limit, pagination.order_key)
+    response.headers["ETag"] = etag
+    if projection:
+        return fieldsets.render(projection, orders, response)
+    return orders
+
+@router.get("/store/{store_id}/export")
+def export_store_orders(
+    store_id: int,
+    format: exports.ExportFormat = exports.ExportFormat.CSV,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    Exporta o histórico de pedidos da loja em CSV (uma linha por item) ou NDJSON
+    (um pedido por linha), do mais antigo para o mais recente, opcionalmente
+    limitado ao período [start, end). A resposta é gerada em streaming, em lotes,
+    com uso de memória constante. Acessível por ADMIN ou pelo OWNER da loja.
+    """
+    db_store = crud.get_store(db, store_id=store_id, profile=loaders.NO_RELATIONSHIPS)
+    if not db_store:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Store not found")
+
+    is_admin = current_user.role == models.UserRole.ADMIN
+    is_store_owner = db_store.owner_id == current_user.id
+
+    if not is_admin and not is_store_owner:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view these orders")
+
+    return StreamingResponse(
+        exports.stream_store_orders(store_id, format, start=start, end=end),
+        media_type=exports.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="store-{store_id}-orders.{format.value}"'}
+    )
+
+@router.get("/store/{store_id}/board", response_model=Dict[models.OrderStatus, List[schemas.Order]])
+def read_store_board(
+    store_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    Retorna o quadro de pedidos em aberto da loja, agrupados por status.
+    Servido do índice em memória (order_board): o banco é consultado apenas
+    para verificar a permissão. Acessível por ADMIN ou pelo OWNER da loja.
+    """
+    db_store = crud.get_store(db, store_id=store_id, profile=loaders.NO_RELATIONSHIPS)
+    if not db_store:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Store not found")
+
+    is_admin = current_user.role == models.UserRole.ADMIN
+    is_store_owner = db_store.owner_id == current_user.id
+
+    if not is_admin and not is_store_owner:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view these orders")
+
+    body = order_board.render(store_id)
+    return etags.json_response(request, body, etags.make_etag(body))
 
 @router.put("/{order_id}/status", response_model=schemas.Order)
 async def update_order_status_route(
     order_id: int,
     status_update: schemas.OrderStatusUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
     """Atualiza o status de um pedido. Acessível por ADMIN ou pelo OWNER da loja do pedido."""
-    db_order = crud.get_order(db, order_id=order_id)
+    # O pedido é carregado completo uma única vez: serve para a resposta e para o WebSocket
+    db_order = await async_crud.get_order(db, order_id=order_id)
     if not db_order:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
 
-    db_store = crud.get_store(db, store_id=db_order.store_id)
+    db_store = await async_crud.get_store(db, store_id=db_order.store_id, profile=loaders.NO_RELATIONSHIPS)
     is_admin = current_user.role == models.UserRole.ADMIN
     is_store_owner = db_store and db_store.owner_id == current_user.id
 
     if not is_admin and not is_store_owner:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to update this order")
         
-    updated_order = crud.update_order_status(db, db_order=db_order, new_status=status_update.status)
-    
-    # Carrega os dados completos para enviar via WebSocket
-    full_order_data = crud.get_order(db, order_id=updated_order.id)
-    order_schema = schemas.Order.from_orm(full_order_data)
-
-    # Notifica a loja em tempo real sobre a mudança de status
-    await manager.broadcast_to_store(
-        store_id=updated_order.store_id,
-        data=order_schema.model_dump(mode='json')
-    )
+    updated_order, payload = await async_crud.update_order_status(db, db_order=db_order, new_status=status_update.status)
+
+    # Acorda o despachante para notificar a loja sobre a mudança de status
+    dispatcher.notify()
     
-    return updated_order
\ No newline at end of file
+    return serialization.json_body(payload)
\ No newline at end of file
@@ -1,29 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form
+import anyio.to_thread
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form, Query, Request
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
-import shutil
-import uuid
-import os
 
-from .. import crud, models, schemas
-from ..database import get_db
+from .. import crud, async_crud, models, schemas, loaders, etags, pagination, images, product_import
+from ..database import get_db, get_async_db
+from ..menu_cache import menu_cache, publish_change as publish_menu_change
+from ..search import search_index, publish_products
+from ..images import image_service
 from ..deps import get_current_active_user
 
 router = APIRouter(prefix="/products", tags=["products"])
 
-# --- Helper Function to Save Image ---
-def save_upload_file(upload_file: UploadFile, destination: str) -> str:
-    """Salva o arquivo enviado e retorna o caminho do arquivo."""
-    try:
-        # Garante que o diretório de destino exista
-        os.makedirs(os.path.dirname(destination), exist_ok=True)
-        with open(destination, "wb") as buffer:
-            shutil.copyfileobj(upload_file.file, buffer)
-    finally:
-        upload_file.file.close()
-    return destination
+# --- Configuração de Upload ---
+UPLOAD_DIRECTORY = images.PRODUCT_IMAGES_DIRECTORY
 
 # --- Product Routes ---
+@router.get("/search", response_model=List[schemas.Product])
+def search_products(
+    q: str,
+    store_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """
+    Busca produtos de todas as lojas (ou de uma loja, com 'store_id') pelo nome e
+    pela descrição, ignorando acentos e plurais; o último termo vale como prefixo.
+    Os resultados vêm do índice em memória, ordenados por relevância; o banco é
+    consultado apenas para buscar os produtos encontrados pela chave primária.
+    """
+    product_ids = search_index.search(q, store_id=store_id, limit=limit)
+    if not product_ids:
+        return []
+    return crud.get_products_by_ids(db, product_ids=product_ids)
+
 @router.post("/stores/{store_id}", response_model=schemas.Product)
 def create_product_for_store(
     store_id: int,
@@ -34,7 +46,7 @@ def create_product_for_store(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    db_store = crud.get_store(db, store_id=store_id)
+    db_store = crud.get_store(db, store_id=store_id, profile=loaders.NO_RELATIONSHIPS)
     if not db_store:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Store not found")
 
@@ -48,15 +60,61 @@ def create_product_for_store(
 
     image_url = None
     if image:
-        file_extension = image.filename.split(".")[-1]
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
-        file_path = f"static/images/products/{unique_filename}"
-        save_upload_file(image, file_path)
-        image_url = f"/{file_path}"
+        image_url = image_service.save(image, UPLOAD_DIRECTORY)
 
     product_data = schemas.ProductCreate(name=name, description=description, price=price)
     return crud.create_store_product(db=db, product=product_data, store_id=store_id, image_url=image_url)
 
+@router.post("/stores/{store_id}/import", response_model=schemas.ProductImportResult)
+async def import_products_for_store(
+    store_id: int,
+    request: Request,
+    format: product_import.ImportFormat = product_import.ImportFormat.CSV,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    Importa ou atualiza produtos em lote a partir do corpo da requisição, em CSV
+    (cabeçalho com id, name, description, price) ou NDJSON (um objeto por linha).
+    Linhas sem 'id' criam produtos; com 'id', atualizam os campos informados.
+    O arquivo é lido em streaming e gravado em transações de até 500 linhas;
+    a resposta traz as contagens e os erros por número de linha.
+    """
+    db_store = await async_crud.get_store(db, store_id=store_id, profile=loaders.NO_RELATIONSHIPS)
+    if not db_store:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Store not found")
+
+    is_admin = current_user.role == models.UserRole.ADMIN
+    is_store_owner = db_store.owner_id == current_user.id
+    if not is_admin and not is_store_owner:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, 
+            detail="Not authorized to add products to this store"
+        )
+
+    result = schemas.ProductImportResult()
+    async for batch in product_import.iter_batches(request.stream(), format, result):
+        try:
+            created, updated, errors = await async_crud.import_products(db, store_id=store_id, rows=batch)
+        except SQLAlchemyError:
+            await db.rollback()
+            for number, _ in batch:
+                product_import.add_error(result, number, "Falha ao gravar o lote desta linha")
+            continue
+        result.created += created
+        result.updated += updated
+        for number, message in errors:
+            product_import.add_error(result, number, message)
+
+    # O cardápio é remontado na próxima leitura e a loja é reindexada na busca
+    if result.created or result.updated:
+        menu_cache.invalidate(store_id)
+        publish_menu_change(store_id)
+        async for rows in async_crud.iter_product_search_rows(db, store_id=store_id):
+            await anyio.to_thread.run_sync(search_index.add_many, rows)
+            publish_products(rows)
+    return result
+
 @router.put("/{product_id}", response_model=schemas.Product)
 def update_product(
     product_id: int,
@@ -71,7 +129,7 @@ def update_product(
     if not db_product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
 
-    db_store = crud.get_store(db, store_id=db_product.store_id)
+    db_store = crud.get_store(db, store_id=db_product.store_id, profile=loaders.NO_RELATIONSHIPS)
     is_admin = current_user.role == models.UserRole.ADMIN
     is_store_owner = db_store.owner_id == current_user.id
     if not is_admin and not is_store_owner:
@@ -81,22 +139,38 @@ def update_product(
         )
 
     if image:
-        file_extension = image.filename.split(".")[-1]
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
-        file_path = f"static/images/products/{unique_filename}"
-        save_upload_file(image, file_path)
-        db_product.image_url = f"/{file_path}" # Atualiza a URL da imagem diretamente
+        db_product.image_url = image_service.save(image, UPLOAD_DIRECTORY) # Atualiza a URL da imagem diretamente
 
-    product_update_data = schemas.ProductUpdate(name=name, description=description, price=price)
+    # Apenas os campos enviados são atualizados
+    update_data = {"name": name, "description": description, "price": price}
+    product_update_data = schemas.ProductUpdate(**{key: value for key, value in update_data.items() if value is not None})
     return crud.update_product(db=db, db_product=db_product, product_in=product_update_data)
 
 
 @router.get("/stores/{store_id}", response_model=List[schemas.Product])
-def read_products_from_store(store_id: int, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    db_store = crud.get_store(db, store_id=store_id)
-    if db_store is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Store not found")
-        
-    products = crud.get_products_by_store(db, store_id=store_id, skip=skip, limit=limit)
-    return products
+def read_products_from_store(
+    store_id: int,
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Retorna os produtos de uma loja, ordenados por ID e servidos do snapshot do
+    cardápio em memória. Aceita 'skip'/'limit' ou o cursor devolvido no cabeçalho
+    X-Next-Cursor. Responde 304 quando o cliente envia um If-None-Match com o ETag atual.
+    """
+    after_id = pagination.decode_id_cursor(cursor)
+    snapshot = menu_cache.get(store_id)
+    if snapshot is None:
+        generation = menu_cache.generation(store_id)
+        db_store = crud.get_store(db, store_id=store_id)
+        if db_store is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Store not found")
+        snapshot = menu_cache.build(db_store, generation)
+    body, etag, page = snapshot.products_page(skip, limit, after_id)
+    response = etags.json_response(request, body, etag)
+    pagination.set_next_cursor(response, page, limit, lambda product: (product["id"],))
+    return response
 
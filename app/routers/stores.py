@@ -1,13 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
-import shutil
-import uuid
-from pathlib import Path
+from datetime import date, timedelta
 
 # Adicionando a importação de models para usar nos type hints e na lógica de roles
-from .. import crud, models, schemas, deps
+from .. import crud, models, schemas, deps, loaders, etags, pagination, images, fieldsets
 from ..database import get_db
+from ..menu_cache import menu_cache
+from ..images import image_service
 
 router = APIRouter(
     prefix="/stores", 
@@ -15,19 +15,7 @@ router = APIRouter(
 )
 
 # --- Configuração de Upload ---
-UPLOAD_DIRECTORY = "static/store_logos"
-Path(UPLOAD_DIRECTORY).mkdir(parents=True, exist_ok=True)
-
-def save_upload_file(upload_file: UploadFile) -> str:
-    """Salva o arquivo de upload e retorna a URL de acesso."""
-    extension = Path(upload_file.filename).suffix
-    unique_filename = f"{uuid.uuid4()}{extension}"
-    file_path = Path(UPLOAD_DIRECTORY) / unique_filename
-    
-    with file_path.open("wb") as buffer:
-        shutil.copyfileobj(upload_file.file, buffer)
-        
-    return f"/{UPLOAD_DIRECTORY}/{unique_filename}"
+UPLOAD_DIRECTORY = images.STORE_LOGOS_DIRECTORY
 
 @router.post("/", response_model=schemas.Store, dependencies=[Depends(deps.require_admin)])
 def create_store_for_owner(
@@ -37,13 +25,13 @@ def create_store_for_owner(
     owner_id: int = Form(...),
     logo: Optional[UploadFile] = File(None)
 ):
-    owner = crud.get_user_by_id(db, user_id=owner_id)
+    owner = crud.get_user_by_id(db, user_id=owner_id, profile=loaders.NO_RELATIONSHIPS)
     if not owner:
         raise HTTPException(status_code=404, detail=f"Owner with id {owner_id} not found")
 
     logo_url = None
     if logo:
-        logo_url = save_upload_file(logo)
+        logo_url = image_service.save(logo, UPLOAD_DIRECTORY)
 
     store_data = schemas.StoreCreate(name=name, description=description, owner_id=owner_id)
 
@@ -55,37 +43,99 @@ def create_store_for_owner(
 # --- ALTERAÇÕES AQUI ---
 @router.get("/", response_model=List[schemas.Store])
 def read_stores(
+    response: Response,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(deps.get_current_active_user),
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    expand: Optional[str] = None
 ):
     """
     Retorna uma lista de lojas com base no papel do usuário.
     - ADMIN: Vê todas as lojas.
     - OWNER: Vê apenas as suas lojas.
+    Aceita 'skip'/'limit' ou o cursor devolvido no cabeçalho X-Next-Cursor.
+    Com 'fields' (ex.: fields=id,name) e/ou 'expand' (ex.: expand=products),
+    retorna apenas os campos e relacionamentos pedidos.
     """
+    after_id = pagination.decode_id_cursor(cursor)
+    projection = fieldsets.parse(schemas.Store, models.Store, fields, expand)
+    profile = projection.options if projection else loaders.STORE_PROFILE
     if current_user.role == models.UserRole.ADMIN:
         # Correto: Chama a função que busca TODAS as lojas, passando a paginação.
-        stores = crud.get_stores(db, skip=skip, limit=limit)
+        stores = crud.get_stores(db, skip=skip, limit=limit, after_id=after_id, profile=profile)
 
     elif current_user.role == models.UserRole.OWNER:
         # Correto: Chama a função específica para o OWNER, passando seu ID e a paginação.
-        stores = crud.get_stores_by_owner(db, owner_id=current_user.id, skip=skip, limit=limit)
+        stores = crud.get_stores_by_owner(db, owner_id=current_user.id, skip=skip, limit=limit, after_id=after_id, profile=profile)
 
     else:
         # Para outros papéis (ex: CUSTOMER), retorna uma lista vazia.
         stores = []
         
+    pagination.set_next_cursor(response, stores, limit, pagination.id_key)
+    if projection:
+        return fieldsets.render(projection, stores, response)
     return stores
 # --- FIM DAS ALTERAÇÕES ---
 
 @router.get("/{store_id}", response_model=schemas.Store)
-def read_store(store_id: int, db: Session = Depends(get_db)):
-    db_store = crud.get_store(db, store_id=store_id)
-    if db_store is None:
+def read_store(store_id: int, request: Request, db: Session = Depends(get_db)):
+    """
+    Retorna a loja com seu cardápio, servida do snapshot em memória.
+    Responde 304 quando o cliente envia um If-None-Match com o ETag atual.
+    """
+    snapshot = menu_cache.get(store_id)
+    if snapshot is None:
+        generation = menu_cache.generation(store_id)
+        db_store = crud.get_store(db, store_id=store_id)
+        if db_store is None:
+            raise HTTPException(status_code=404, detail="Store not found")
+        snapshot = menu_cache.build(db_store, generation)
+    return etags.json_response(request, snapshot.store_body, snapshot.store_etag)
+
+@router.get("/{store_id}/stats", response_model=schemas.StoreSalesSummary)
+def read_store_stats(
+    store_id: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(deps.get_current_active_user)
+):
+    """
+    Resumo de vendas da loja no período [start, end] (padrão: últimos 30 dias):
+    totais, contadores por dia e por produto. Lido dos agregados mantidos a cada
+    pedido, sem agrupar a tabela de pedidos. Acessível por ADMIN ou pelo OWNER da loja.
+    """
+    db_store = crud.get_store(db, store_id=store_id, profile=loaders.NO_RELATIONSHIPS)
+    if not db_store:
         raise HTTPException(status_code=404, detail="Store not found")
-    return db_store
+
+    is_admin = current_user.role == models.UserRole.ADMIN
+    is_owner = db_store.owner_id == current_user.id
+
+    if not (is_admin or is_owner):
+        raise HTTPException(status_code=403, detail="Not authorized to view this store's sales")
+
+    end = end or date.today()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="'start' must not be after 'end'")
+
+    days = crud.get_store_daily_sales(db, store_id=store_id, start=start, end=end)
+    products = crud.get_store_product_sales(db, store_id=store_id, start=start, end=end)
+    return schemas.StoreSalesSummary(
+        store_id=store_id,
+        start=start,
+        end=end,
+        order_count=sum(day.order_count for day in days),
+        revenue=sum(day.revenue for day in days),
+        items_quantity=sum(day.items_quantity for day in days),
+        days=[schemas.DailySales.model_validate(day) for day in days],
+        products=[schemas.ProductSales.model_validate(product) for product in products]
+    )
 
 @router.put("/{store_id}", response_model=schemas.Store)
 def update_store_details(
@@ -116,7 +166,7 @@ def update_store_details(
     if owner_id is not None and owner_id != db_store.owner_id:
         if not is_admin:
             raise HTTPException(status_code=403, detail="Not authorized to change store owner")
-        new_owner = crud.get_user_by_id(db, user_id=owner_id)
+        new_owner = crud.get_user_by_id(db, user_id=owner_id, profile=loaders.NO_RELATIONSHIPS)
         if not new_owner:
             raise HTTPException(status_code=404, detail=f"New owner with id {owner_id} not found")
         if new_owner.role == models.UserRole.CUSTOMER:
@@ -125,7 +175,7 @@ def update_store_details(
 
     logo_url = None
     if logo:
-        logo_url = save_upload_file(logo)
+        logo_url = image_service.save(logo, UPLOAD_DIRECTORY)
 
     store_in = schemas.StoreUpdate(**update_data)
     updated_store = crud.update_store(db=db, db_store=db_store, store_in=store_in, logo_url=logo_url)
@@ -1,8 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
-from .. import crud, models, schemas, deps
+from .. import crud, models, schemas, deps, loaders, pagination, fieldsets
 
 # Para otimizar e evitar repetição, a dependência que exige o papel de ADMIN
 # é aplicada a todas as rotas deste router de uma só vez.
@@ -14,15 +14,27 @@ router = APIRouter(
 
 @router.get("/", response_model=List[schemas.UserDetail])
 def read_users(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
     db: Session = Depends(deps.get_db),
 ):
     """
     Retorna uma lista de todos os usuários com detalhes completos.
-    Acesso restrito a administradores.
+    Aceita 'skip'/'limit' ou o cursor devolvido no cabeçalho X-Next-Cursor.
+    Com 'fields' (ex.: fields=id,email) e/ou 'expand' (ex.: expand=stores ou
+    expand=stores.products), retorna apenas os campos e relacionamentos pedidos,
+    sem consultá-los no banco. Acesso restrito a administradores.
     """
-    users = crud.get_users(db, skip=skip, limit=limit)
+    projection = fieldsets.parse(schemas.UserDetail, models.User, fields, expand)
+    profile = projection.options if projection else loaders.USER_DETAIL_PROFILE
+    users = crud.get_users(db, skip=skip, limit=limit, after_id=pagination.decode_id_cursor(cursor), profile=profile)
+    pagination.set_next_cursor(response, users, limit, pagination.id_key)
+    if projection:
+        return fieldsets.render(projection, users, response)
     return users
 
 @router.get("/{user_id}", response_model=schemas.UserDetail)
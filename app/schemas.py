@@ -1,7 +1,8 @@
-from pydantic import BaseModel, EmailStr
-from typing import List, Optional
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field, computed_field
+from typing import Dict, List, Optional
+from datetime import date, datetime
 from .models import OrderStatus, UserRole
+from .images import variant_urls
 
 # --- Guest User Schemas (NOVOS) ---
 class GuestUserBase(BaseModel):
@@ -38,9 +39,33 @@ class Product(ProductBase):
     store_id: int
     image_url: Optional[str] = None
 
+    # URLs das variantes redimensionadas (thumb, card, full); None para imagens antigas
+    @computed_field
+    @property
+    def image_variants(self) -> Optional[Dict[str, str]]:
+        return variant_urls(self.image_url)
+
     class Config:
         from_attributes = True
 
+# --- Product Import Schemas ---
+class ProductImportRow(BaseModel):
+    """Linha de uma importação em lote: sem 'id' cria um produto, com 'id' atualiza os campos informados."""
+    id: Optional[int] = None
+    name: Optional[str] = Field(None, min_length=1, max_length=100)
+    description: Optional[str] = Field(None, max_length=255)
+    price: Optional[float] = Field(None, ge=0)
+
+class ProductImportError(BaseModel):
+    row: int
+    error: str
+
+class ProductImportResult(BaseModel):
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[ProductImportError] = []
+
 # --- Store Schemas ---
 class StoreBase(BaseModel):
     name: str
@@ -60,6 +85,11 @@ class Store(StoreBase):
     logo_url: Optional[str] = None
     products: List[Product] = []
 
+    @computed_field
+    @property
+    def logo_variants(self) -> Optional[Dict[str, str]]:
+        return variant_urls(self.logo_url)
+
     class Config:
         from_attributes = True
 
@@ -135,5 +165,34 @@ class Order(BaseModel):
 class OrderStatusUpdate(BaseModel):
     status: OrderStatus
 
+# --- Sales Schemas ---
+class DailySales(BaseModel):
+    day: date
+    order_count: int
+    revenue: float
+    items_quantity: int
+
+    class Config:
+        from_attributes = True
+
+class ProductSales(BaseModel):
+    product_id: int
+    name: Optional[str] = None
+    quantity: int
+    revenue: float
+
+    class Config:
+        from_attributes = True
+
+class StoreSalesSummary(BaseModel):
+    store_id: int
+    start: date
+    end: date
+    order_count: int
+    revenue: float
+    items_quantity: int
+    days: List[DailySales] = []
+    products: List[ProductSales] = []
+
 Order.model_rebuild()
 
@@ -0,0 +1,270 @@
+import json
+import math
+import re
+import sys
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from heapq import nlargest, nsmallest
+from typing import Iterable, Optional
+
+import anyio.to_thread
+
+from . import metrics
+from .websocket import manager
+
+# --- Normalização de texto (português) ---
+
+# Palavras sem valor de busca, já sem acentos
+STOPWORDS = frozenset(
+    "a ao aos as com da das de do dos e em na nas no nos o os ou para pela pelo por sem um uma".split()
+)
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+def normalize(text: str) -> str:
+    """Remove acentos e cedilha e converte para minúsculas."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+# Plurais irregulares comuns: 'limões' -> 'limao', 'pães' -> 'pao', 'pastéis' -> 'pastel'
+_PLURALS = (("oes", "ao"), ("aes", "ao"), ("ais", "al"), ("eis", "el"))
+
+def _stem(token: str) -> str:
+    """Reduz plurais simples ao singular ('pizzas' -> 'pizza')."""
+    for suffix, singular in _PLURALS:
+        if len(token) > len(suffix) and token.endswith(suffix):
+            return token[:-len(suffix)] + singular
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+def tokenize(text: Optional[str]) -> list[str]:
+    """Quebra o texto em termos normalizados, sem stopwords."""
+    if not text:
+        return []
+    # Termos internados: cada palavra existe uma única vez na memória do índice
+    return [sys.intern(_stem(token)) for token in _TOKEN.findall(normalize(text)) if token not in STOPWORDS]
+
+# --- Índice invertido ---
+
+# Peso de um termo encontrado no nome e na descrição do produto
+NAME_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+# Fator aplicado quando o termo da busca é apenas prefixo do termo do produto
+PREFIX_FACTOR = 0.6
+# Tamanho mínimo para um termo ser expandido como prefixo
+MIN_PREFIX_LENGTH = 3
+
+# Tópico das notificações de produtos alterados, enviadas aos outros workers
+SEARCH_TOPIC = "search"
+
+class SearchIndex:
+    """
+    Índice invertido em memória dos produtos de todas as lojas: termo -> IDs dos
+    produtos. A busca exige todos os termos (o último pode ser prefixo, como em
+    um campo de autocompletar) e ordena por relevância: termos no nome valem mais
+    que na descrição e termos raros mais que os comuns. Acentos e plurais simples
+    são ignorados.
+    """
+
+    def __init__(self):
+        # termo -> produtos com o termo no nome ou na descrição / apenas no nome
+        self._postings: dict[str, set[int]] = {}
+        self._name_postings: dict[str, set[int]] = {}
+        # Vocabulário ordenado, para expandir prefixos com busca binária
+        self._terms: list[str] = []
+        # produto -> (loja, termos do nome, termos só da descrição)
+        self._products: dict[int, tuple[int, tuple, tuple]] = {}
+        # loja -> produtos, para buscas dentro de uma loja
+        self._stores: dict[int, set[int]] = {}
+        self._lock = threading.Lock()
+        # Durante a reconstrução, produtos alterados pelo CRUD não são sobrescritos pelas linhas lidas do banco
+        self._rebuilding = False
+        self._dirty: set[int] = set()
+        self.searches = 0
+
+    def _add(self, product_id: int, store_id: int, name: Optional[str], description: Optional[str], new_terms: list):
+        name_terms = tuple(dict.fromkeys(tokenize(name)))
+        description_terms = tuple(term for term in dict.fromkeys(tokenize(description)) if term not in name_terms)
+        self._products[product_id] = (store_id, name_terms, description_terms)
+        self._stores.setdefault(store_id, set()).add(product_id)
+        for term in name_terms:
+            self._name_postings.setdefault(term, set()).add(product_id)
+        for term in name_terms + description_terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = set()
+                new_terms.append(term)
+            postings.add(product_id)
+
+    def _remove(self, product_id: int):
+        entry = self._products.pop(product_id, None)
+        if entry is None:
+            return
+        store_id, name_terms, description_terms = entry
+        _discard(self._stores, store_id, product_id)
+        for term in name_terms:
+            _discard(self._name_postings, term, product_id)
+        for term in name_terms + description_terms:
+            if _discard(self._postings, term, product_id):
+                index = bisect_left(self._terms, term)
+                if index < len(self._terms) and self._terms[index] == term:
+                    del self._terms[index]
+
+    def upsert(self, product_id: int, store_id: int, name: Optional[str], description: Optional[str]):
+        """Inclui ou atualiza um produto (chamado pelo CRUD após o commit)."""
+        self.upsert_many([(product_id, store_id, name, description)])
+
+    def upsert_many(self, rows: Iterable[tuple[int, int, Optional[str], Optional[str]]]):
+        """
+        Inclui ou atualiza produtos (id, loja, nome, descrição) alterados após o
+        commit; durante uma reconstrução, prevalecem sobre as linhas lidas do banco.
+        """
+        new_terms = []
+        with self._lock:
+            for product_id, store_id, name, description in rows:
+                if self._rebuilding:
+                    self._dirty.add(product_id)
+                self._remove(product_id)
+                self._add(product_id, store_id, name, description, new_terms)
+            for term in new_terms:
+                # Um termo novo pode ter saído do índice com a alteração de outro produto do lote
+                index = bisect_left(self._terms, term)
+                if term in self._postings and (index == len(self._terms) or self._terms[index] != term):
+                    self._terms.insert(index, term)
+
+    def add_many(self, rows: Iterable[tuple[int, int, Optional[str], Optional[str]]]):
+        """Inclui em lote produtos (id, loja, nome, descrição); usado na reconstrução."""
+        new_terms = []
+        with self._lock:
+            for product_id, store_id, name, description in rows:
+                if product_id in self._dirty:
+                    continue
+                self._remove(product_id)
+                self._add(product_id, store_id, name, description, new_terms)
+            if new_terms:
+                self._terms = sorted(self._postings)
+
+    def begin_rebuild(self):
+        """Esvazia o índice antes de uma reconstrução com add_many."""
+        with self._lock:
+            self._postings.clear()
+            self._name_postings.clear()
+            self._terms = []
+            self._products.clear()
+            self._stores.clear()
+            self._rebuilding = True
+
+    def end_rebuild(self):
+        with self._lock:
+            self._rebuilding = False
+            self._dirty.clear()
+
+    def _expand(self, term: str, prefix: bool) -> list[str]:
+        if not prefix or len(term) < MIN_PREFIX_LENGTH:
+            return [term] if term in self._postings else []
+        start = bisect_left(self._terms, term)
+        end = bisect_left(self._terms, term + "\uffff", start)
+        return self._terms[start:end]
+
+    @staticmethod
+    def _union(index: dict, terms: list[str]) -> set:
+        if len(terms) == 1:
+            return index.get(terms[0], set())
+        return set().union(*(index.get(term, ()) for term in terms))
+
+    def _name_length(self, product_id: int) -> int:
+        return len(self._products[product_id][1])
+
+    def search(self, query: str, store_id: Optional[int] = None, limit: int = 20) -> list[int]:
+        """Retorna os IDs dos produtos mais relevantes para a busca."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            self.searches += 1
+            total = len(self._products) or 1
+            scope = self._stores.get(store_id, set()) if store_id is not None else None
+            matches = []
+            for position, term in enumerate(terms):
+                # Só o último termo é expandido como prefixo
+                expanded = self._expand(term, prefix=position == len(terms) - 1)
+                if not expanded:
+                    return []
+                matches.append((term, expanded, math.log(1 + total / len(self._union(self._postings, expanded)))))
+
+            # Produtos com todos os termos exatos no nome vêm primeiro; depois, os que têm
+            # todos no nome considerando o último como prefixo. Entre eles vence o nome
+            # mais curto. Se essas faixas bastarem, os demais candidatos nem são pontuados.
+            exact = _intersect([self._name_postings.get(term) for term in terms], scope)
+            ranked = nsmallest(limit, exact, key=self._name_length)
+            if len(ranked) < limit and matches[-1][1] != [terms[-1]]:
+                in_name = _intersect(
+                    [self._name_postings.get(term) for term in terms[:-1]] + [self._union(self._name_postings, matches[-1][1])],
+                    scope
+                )
+                ranked += nsmallest(limit - len(ranked), in_name - exact, key=self._name_length)
+            if len(ranked) >= limit:
+                return ranked
+
+            result = _intersect([self._union(self._postings, expanded) for _, expanded, _ in matches], scope)
+
+            def score(product_id: int) -> float:
+                _, name_terms, description_terms = self._products[product_id]
+                total_score = 0.0
+                for term, _, idf in matches:
+                    if term in name_terms:
+                        weight = NAME_WEIGHT
+                    elif term in description_terms:
+                        weight = DESCRIPTION_WEIGHT
+                    elif any(t.startswith(term) for t in name_terms):
+                        weight = NAME_WEIGHT * PREFIX_FACTOR
+                    else:
+                        weight = DESCRIPTION_WEIGHT * PREFIX_FACTOR
+                    total_score += weight * idf
+                # Nomes mais curtos (mais específicos) vêm primeiro no empate
+                return total_score - 0.01 * len(name_terms)
+
+            return nlargest(limit, result, key=score)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"products": len(self._products), "terms": len(self._postings), "searches": self.searches}
+
+def _discard(index: dict, key, product_id: int) -> bool:
+    """Remove o produto do conjunto 'key' do índice; retorna True se o conjunto ficou vazio."""
+    products = index[key]
+    products.discard(product_id)
+    if not products:
+        del index[key]
+        return True
+    return False
+
+def _intersect(sets: list[Optional[set]], scope: Optional[set] = None) -> set:
+    """Interseção dos conjuntos, começando pelo menor; vazia se algum não existir."""
+    if scope is not None:
+        sets = sets + [scope]
+    if not all(sets):
+        return set()
+    sets = sorted(sets, key=len)
+    result = set(sets[0])
+    for other in sets[1:]:
+        result &= other
+        if not result:
+            break
+    return result
+
+def publish_products(rows: Iterable[tuple[int, int, Optional[str], Optional[str]]]):
+    """Envia aos outros workers os produtos (id, loja, nome, descrição) alterados neste processo."""
+    manager.notify(SEARCH_TOPIC, json.dumps([tuple(row) for row in rows]))
+
+async def _apply_published_products(message: str):
+    # Lotes de uma importação podem ser grandes: o índice é atualizado fora do event loop
+    await anyio.to_thread.run_sync(search_index.upsert_many, json.loads(message))
+
+# Instância global do índice de busca
+search_index = SearchIndex()
+metrics.register("product_search", search_index.stats)
+# Produtos criados e alterados em outros workers também entram no índice
+manager.add_notification_listener(SEARCH_TOPIC, _apply_published_products)
@@ -0,0 +1,92 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from passlib.context import CryptContext
+
+from . import metrics
+
+# --- Configuração de hashing de senhas ---
+# Custo do bcrypt: hashes com custo diferente são refeitos no próximo login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Processos dedicados ao hashing; não disputam o threadpool das requisições
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 1)))
+# Os processos do pool partem de um servidor limpo (forkserver) ou de um interpretador
+# novo (spawn), nunca de um fork do worker com event loop, threads e conexões abertas
+POOL_CONTEXT = multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+# Contexto único de hashing de senhas da aplicação
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# Funções executadas nos processos do pool (precisam ser de nível de módulo)
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify_and_update(password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed_password)
+
+class PasswordService:
+    """
+    Executa o bcrypt em um pool de processos com limite próprio de concorrência.
+    Requisições além do limite aguardam na fila sem ocupar threads do servidor.
+    """
+
+    def __init__(self, workers: int = PASSWORD_WORKERS):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.total_seconds = 0.0
+
+    async def _run(self, fn, *args):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=POOL_CONTEXT)
+            self._semaphore = asyncio.Semaphore(self.workers)
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self.total_seconds += time.perf_counter() - started
+            self._semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        """Gera o hash de uma senha."""
+        return await self._run(_hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+        """
+        Verifica a senha e, se o hash usar parâmetros antigos, retorna também um
+        novo hash com os parâmetros atuais (ou None se não precisar atualizar).
+        """
+        return await self._run(_verify_and_update, password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._semaphore = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_depth": self.waiting,
+            "running": self.running,
+            "completed": self.completed,
+            "avg_seconds": self.total_seconds / self.completed if self.completed else 0.0,
+        }
+
+# Instância global do serviço de senhas
+password_service = PasswordService()
+metrics.register("password_hashing", password_service.stats)
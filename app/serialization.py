@@ -0,0 +1,39 @@
+from functools import cache
+from typing import Any
+
+import pydantic_core
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from . import models, schemas
+
+# --- Serialização JSON ---
+# Montar um validador/serializador do Pydantic é caro; os adaptadores são criados
+# uma vez por tipo e reaproveitados. A serialização roda no pydantic-core (Rust),
+# direto para bytes, sem passar por dicts intermediários e json.dumps.
+
+@cache
+def adapter(schema: Any) -> TypeAdapter:
+    """TypeAdapter do tipo (ex.: schemas.Order, list[schemas.Product]), criado uma única vez."""
+    return TypeAdapter(schema)
+
+def dump_json(schema: Any, obj: Any) -> bytes:
+    """Valida 'obj' (ORM ou dados simples) contra o tipo e serializa em JSON numa única passagem."""
+    type_adapter = adapter(schema)
+    return type_adapter.dump_json(type_adapter.validate_python(obj, from_attributes=True))
+
+def dump_data(data: Any) -> bytes:
+    """Serializa dados já em formato JSON (dicts e listas), sem validação."""
+    return pydantic_core.to_json(data)
+
+def order_json(db_order: models.Order) -> str:
+    """
+    JSON do pedido (schemas.Order), gerado uma vez por alteração: o mesmo texto é
+    gravado no outbox, enviado aos painéis, mantido no quadro de pedidos e
+    devolvido na resposta HTTP. O pedido deve estar com itens e cliente carregados.
+    """
+    return dump_json(schemas.Order, db_order).decode()
+
+def json_body(body: bytes | str, status_code: int = 200) -> Response:
+    """Resposta com um JSON já serializado; evita a validação e serialização do response_model."""
+    return Response(content=body, status_code=status_code, media_type="application/json")
@@ -0,0 +1,114 @@
+import mimetypes
+import os
+import re
+import stat
+from typing import Optional
+
+import anyio.to_thread
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+# --- Política de cache ---
+# Arquivos endereçados pelo conteúdo (images.py): se o conteúdo mudar, muda o nome
+CONTENT_ADDRESSED = re.compile(r"^[0-9a-f]{40}_[a-z]+\.")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Demais arquivos (ex.: logos enviados antes do pipeline de imagens) são revalidados
+DEFAULT_CACHE_CONTROL = f"public, max-age={int(os.getenv('STATIC_MAX_AGE', '3600'))}"
+
+# --- Variantes pré-comprimidas (geradas por precompress_static.py) ---
+# Em ordem de preferência: (Content-Encoding, sufixo do arquivo)
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE_TYPES = frozenset({
+    "application/javascript", "application/json", "application/manifest+json",
+    "application/x-ndjson", "application/xml", "image/svg+xml",
+})
+
+def is_compressible(media_type: str) -> bool:
+    """Imagens rasterizadas (WebP, JPEG, PNG) já são comprimidas; texto e SVG não."""
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES
+
+def accepted_encodings(header: str) -> set[str]:
+    """Codificações aceitas no Accept-Encoding, ignorando as recusadas com q=0."""
+    encodings = set()
+    for part in header.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        quality = params.strip().removeprefix("q=")
+        try:
+            if params and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        if name:
+            encodings.add(name)
+    return encodings
+
+class StaticFileResponse(FileResponse):
+    # Com servidores que anunciam 'http.response.pathsend', o arquivo é enviado pelo
+    # próprio servidor (sendfile, sem cópia); nos demais, blocos maiores reduzem
+    # as idas ao threadpool por arquivo
+    chunk_size = 256 * 1024
+
+class MediaStaticFiles(StaticFiles):
+    """
+    StaticFiles com cabeçalhos de cache longos para arquivos endereçados pelo
+    conteúdo (Cache-Control immutable e ETag forte derivado do hash) e entrega
+    de variantes .br/.gz pré-comprimidas de arquivos de texto. Range, HEAD e
+    respostas 304 continuam a cargo do Starlette.
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        media_type = mimetypes.guess_type(path)[0]
+        if scope["method"] in ("GET", "HEAD") and media_type and is_compressible(media_type):
+            accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+            for encoding, suffix in PRECOMPRESSED:
+                if encoding not in accepted:
+                    continue
+                full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+                if stat_result and stat.S_ISREG(stat_result.st_mode):
+                    return self._file_response(full_path, stat_result, scope, path, media_type, encoding)
+        return await super().get_response(path, scope)
+
+    def file_response(
+        self,
+        full_path: str | os.PathLike,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        return self._file_response(full_path, stat_result, scope, os.fspath(full_path), status_code=status_code)
+
+    def _file_response(
+        self,
+        full_path: str | os.PathLike,
+        stat_result: os.stat_result,
+        scope: Scope,
+        path: str,
+        media_type: Optional[str] = None,
+        encoding: Optional[str] = None,
+        status_code: int = 200,
+    ) -> Response:
+        name = os.path.basename(path)
+        if media_type is None:
+            # Acesso direto a um '.br'/'.gz': entregue como binário, não como o tipo original
+            guessed, file_encoding = mimetypes.guess_type(name)
+            media_type = guessed if guessed and not file_encoding else "application/octet-stream"
+        headers = {"cache-control": DEFAULT_CACHE_CONTROL}
+        if CONTENT_ADDRESSED.match(name):
+            # O nome identifica o conteúdo: a ETag não depende da data do arquivo
+            variant = name.split(".", 1)[0]
+            headers["cache-control"] = IMMUTABLE_CACHE_CONTROL
+            headers["etag"] = f'"{variant}-{encoding}"' if encoding else f'"{variant}"'
+        if encoding:
+            headers["content-encoding"] = encoding
+        if is_compressible(media_type):
+            headers["vary"] = "Accept-Encoding"
+
+        response = StaticFileResponse(
+            full_path, status_code=status_code, headers=headers, media_type=media_type, stat_result=stat_result
+        )
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -1,26 +1,415 @@
-from fastapi import WebSocket
-from typing import Dict, List
+import asyncio
+import logging
+import os
+import uuid
+from collections import deque
+from fastapi import WebSocket, status
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Tamanho máximo da fila de saída de cada conexão. Um cliente lento que deixa a
+# fila encher é desconectado e deve se reconectar para recuperar o estado.
+SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "100"))
+
+# Quantidade de eventos recentes guardados em memória, por loja, para reenvio
+REPLAY_BUFFER_SIZE = int(os.getenv("WS_REPLAY_BUFFER_SIZE", "500"))
+
+# Função que entrega uma mensagem (JSON já serializado) às conexões locais de uma
+# loja, com o número de sequência do evento quando houver
+Deliver = Callable[[int, str, Optional[int]], Awaitable[None]]
+
+# Função chamada depois que o broker se reconecta: mensagens podem ter se perdido
+Resync = Callable[[], Awaitable[None]]
+
+# Função que recebe as notificações (tópico, mensagem) enviadas por outros workers
+Notify = Callable[[str, str], Awaitable[None]]
+
+# Lista de eventos (sequência, mensagem) para reenvio a um cliente reconectado
+Events = List[Tuple[int, str]]
+
+# Espera (em segundos) antes de reconectar ao broker; dobra a cada falha até o máximo
+BROKER_RECONNECT_MIN_DELAY = 0.5
+BROKER_RECONNECT_MAX_DELAY = 30.0
+
+# --- Backends de Pub/Sub ---
+# O ConnectionManager publica as mensagens em um broker e recebe de volta as que
+# devem ser entregues aos sockets conectados NESTE processo. Com vários workers,
+# um broker compartilhado garante que todos os painéis recebam cada pedido.
+
+class InProcessBroker:
+    """Broker em memória: entrega as mensagens apenas no próprio processo (um único worker)."""
 
-class ConnectionManager:
     def __init__(self):
-        # Dicionário para armazenar conexões ativas por ID de loja
-        self.active_connections: Dict[int, List[WebSocket]] = {}
+        self._deliver: Optional[Deliver] = None
+
+    async def start(self, deliver: Deliver, resync: Optional[Resync] = None, notify: Optional[Notify] = None):
+        self._deliver = deliver
+
+    async def stop(self):
+        self._deliver = None
+
+    async def publish(self, store_id: int, message: str, seq: Optional[int] = None):
+        if self._deliver is not None:
+            await self._deliver(store_id, message, seq)
+
+    async def notify(self, topic: str, message: str):
+        # Não há outros workers: o próprio processo já aplicou a alteração
+        pass
+
+class RedisBroker:
+    """
+    Broker entre processos via Pub/Sub de um servidor compatível com Redis.
+    Cada worker assina todos os canais de loja e repassa as mensagens apenas
+    aos seus próprios sockets. Se a conexão cair, a assinatura é refeita com
+    espera crescente; as mensagens publicadas nesse intervalo se perdem, então
+    'resync' é chamada após a reconexão para o processo recuperar o estado.
+    As notificações entre workers usam canais próprios e levam a origem, para
+    que o worker que as enviou não as receba de volta.
+    """
+    CHANNEL_PREFIX = "orders:store:"
+    NOTIFY_PREFIX = "notify:"
+
+    def __init__(self, url: Optional[str] = None, client=None):
+        """'client' permite usar um cliente redis.asyncio já criado no lugar de 'url'."""
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError as e:
+                raise RuntimeError("O pacote 'redis' é necessário para usar WS_BROKER_URL.") from e
+            client = redis.from_url(url, decode_responses=True)
+        self._redis = client
+        self._pubsub = None
+        self._task: Optional[asyncio.Task] = None
+        self._deliver: Optional[Deliver] = None
+        self._resync: Optional[Resync] = None
+        self._notify: Optional[Notify] = None
+        self.origin = uuid.uuid4().hex
+        self.reconnects = 0
+
+    async def start(self, deliver: Deliver, resync: Optional[Resync] = None, notify: Optional[Notify] = None):
+        self._deliver = deliver
+        self._resync = resync
+        self._notify = notify
+        # A primeira assinatura falha na inicialização: erro de configuração aparece logo
+        await self._subscribe()
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self._close_pubsub()
+        await self._redis.aclose()
+
+    async def publish(self, store_id: int, message: str, seq: Optional[int] = None):
+        # A sequência segue na primeira linha; o JSON serializado nunca contém quebras de linha
+        await self._redis.publish(f"{self.CHANNEL_PREFIX}{store_id}", f"{seq if seq is not None else ''}\n{message}")
+
+    async def notify(self, topic: str, message: str):
+        await self._redis.publish(f"{self.NOTIFY_PREFIX}{topic}", f"{self.origin}\n{message}")
+
+    async def _subscribe(self):
+        self._pubsub = self._redis.pubsub()
+        await self._pubsub.psubscribe(f"{self.CHANNEL_PREFIX}*", f"{self.NOTIFY_PREFIX}*")
+
+    async def _close_pubsub(self):
+        pubsub, self._pubsub = self._pubsub, None
+        if pubsub is not None:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+
+    async def _listen(self):
+        delay = BROKER_RECONNECT_MIN_DELAY
+        while True:
+            try:
+                if self._pubsub is None:
+                    await self._subscribe()
+                    self.reconnects += 1
+                    logger.warning("Reconectado ao broker de mensagens")
+                    delay = BROKER_RECONNECT_MIN_DELAY
+                    if self._resync is not None:
+                        await self._resync()
+                async for message in self._pubsub.listen():
+                    if message["type"] == "pmessage":
+                        await self._dispatch(message)
+                raise ConnectionError("assinatura encerrada pelo servidor")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Conexão com o broker de mensagens perdida; nova tentativa em %.1fs", delay)
+                await self._close_pubsub()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, BROKER_RECONNECT_MAX_DELAY)
+
+    async def _dispatch(self, message: dict):
+        try:
+            channel = message["channel"]
+            if channel.startswith(self.NOTIFY_PREFIX):
+                origin, data = message["data"].split("\n", 1)
+                if origin != self.origin and self._notify is not None:
+                    await self._notify(channel[len(self.NOTIFY_PREFIX):], data)
+                return
+            store_id = int(channel[len(self.CHANNEL_PREFIX):])
+            seq, data = message["data"].split("\n", 1)
+            await self._deliver(store_id, data, int(seq) if seq else None)
+        except Exception:
+            # Uma mensagem inválida não pode interromper a assinatura
+            logger.exception("Falha ao entregar mensagem do canal %s", message["channel"])
 
-    async def connect(self, websocket: WebSocket, store_id: int):
+def create_broker(url: Optional[str] = None):
+    """Cria o broker configurado em WS_BROKER_URL (Redis) ou, sem configuração, o broker em memória."""
+    url = url or os.getenv("WS_BROKER_URL")
+    if url:
+        return RedisBroker(url)
+    return InProcessBroker()
+
+class ReplayBuffer:
+    """
+    Guarda, por loja, os eventos mais recentes recebidos por este processo.
+    A sequência de cada loja é contínua (models.StoreEventSequence), então o
+    buffer sabe de onde está completo: o 'floor' da loja é a sequência a partir
+    da qual nenhum evento deixou de passar por aqui. Um salto na sequência
+    (evento perdido pelo broker, por exemplo) move o 'floor' para logo antes
+    do evento recebido; sem 'floor' conhecido, o reenvio vem do banco.
+    """
+
+    def __init__(self, size: int = REPLAY_BUFFER_SIZE):
+        self.size = size
+        self._events: Dict[int, Deque[Tuple[int, str]]] = {}
+        self._floors: Dict[int, int] = {}
+
+    def reset(self, floors: Optional[Dict[int, int]] = None):
+        """
+        Descarta os eventos guardados. 'floors' são as sequências atuais das lojas,
+        lidas depois que o broker já entrega a este processo os eventos seguintes.
+        """
+        self._events.clear()
+        self._floors = dict(floors or {})
+
+    def append(self, store_id: int, seq: int, message: str):
+        events = self._events.setdefault(store_id, deque())
+        last = events[-1][0] if events else self._floors.get(store_id)
+        if last is not None and seq <= last:
+            # Entrega repetida do mesmo evento (o despacho é "ao menos uma vez")
+            return
+        if last is None or seq != last + 1:
+            # Salto: os eventos anteriores a este não passaram por este processo
+            events.clear()
+            self._floors[store_id] = seq - 1
+        events.append((seq, message))
+        if len(events) > self.size:
+            evicted_seq, _ = events.popleft()
+            self._floors[store_id] = evicted_seq
+
+    def since(self, store_id: int, since: int) -> Optional[Events]:
+        """Retorna os eventos posteriores a 'since' ou None se o buffer não cobre esse intervalo."""
+        floor = self._floors.get(store_id)
+        if floor is None or since < floor:
+            return None
+        return [(seq, message) for seq, message in self._events.get(store_id, ()) if seq > since]
+
+class _Client:
+    """Conexão de um painel com sua fila de saída e a tarefa que escreve no socket."""
+
+    def __init__(self, websocket: WebSocket, since: Optional[int] = None):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self.writer: Optional[asyncio.Task] = None
+        # Sequência até a qual o próprio cliente informou ter todos os eventos ('since')
+        self.since = since
+        # Sequências já enviadas no reenvio da reconexão; o mesmo evento ainda pode
+        # chegar ao vivo pela fila e não deve ser enviado duas vezes
+        self.replayed: Set[int] = set()
+
+class ConnectionManager:
+    def __init__(self, broker=None):
+        # Conexões ativas por ID de loja, cada uma com sua fila de saída
+        self.active_connections: Dict[int, Dict[WebSocket, _Client]] = {}
+        self.broker = broker or create_broker()
+        self.replay_buffer = ReplayBuffer()
+        # Referências às tarefas de fechamento de conexões e de envio de notificações em andamento
+        self._pending: Set[asyncio.Task] = set()
+        # Funções chamadas a cada evento entregue a este processo (ex.: índices em memória)
+        self._listeners: List[Callable[[int, str, Optional[int]], None]] = []
+        # Funções que recuperam o estado local depois de uma reconexão do broker
+        self._resync_listeners: List[Resync] = []
+        # Notificações de outros workers por tópico, aplicadas em ordem por uma única tarefa
+        self._notification_listeners: Dict[str, List[Callable[[str], Awaitable[None]]]] = {}
+        self._notifications: Optional[asyncio.Queue] = None
+        self._notification_task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def add_listener(self, listener: Callable[[int, str, Optional[int]], None]):
+        """Registra uma função síncrona chamada para cada mensagem entregue a este processo."""
+        self._listeners.append(listener)
+
+    def add_resync_listener(self, listener: Resync):
+        """Registra uma corrotina chamada quando mensagens do broker podem ter se perdido."""
+        self._resync_listeners.append(listener)
+
+    def add_notification_listener(self, topic: str, listener: Callable[[str], Awaitable[None]]):
+        """Registra uma corrotina chamada para cada notificação do tópico enviada por outro worker."""
+        self._notification_listeners.setdefault(topic, []).append(listener)
+
+    async def start(self):
+        """Inicia o broker; chamado na inicialização da aplicação."""
+        self._loop = asyncio.get_running_loop()
+        self._notifications = asyncio.Queue()
+        self._notification_task = asyncio.create_task(self._apply_notifications())
+        await self.broker.start(self._send_local, self._resync, self._receive_notification)
+
+    async def stop(self):
+        self._loop = None
+        if self._notification_task is not None:
+            self._notification_task.cancel()
+            self._notification_task = None
+        await self.broker.stop()
+
+    def notify(self, topic: str, message: str):
+        """
+        Envia uma notificação aos outros workers (ex.: alterações em índices e caches
+        em memória), sem aguardar. Pode ser chamada de threads do threadpool; falhas
+        no envio são registradas no log.
+        """
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._send_notification, topic, message)
+        except RuntimeError:
+            # Event loop já encerrado
+            pass
+
+    def _send_notification(self, topic: str, message: str):
+        task = asyncio.create_task(self.broker.notify(topic, message))
+        self._pending.add(task)
+        task.add_done_callback(self._notification_sent)
+
+    def _notification_sent(self, task: asyncio.Task):
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Falha ao enviar notificação aos outros workers", exc_info=task.exception())
+
+    async def _receive_notification(self, topic: str, message: str):
+        # Não bloqueia a assinatura: as notificações são aplicadas pela tarefa própria
+        if self._notifications is not None and topic in self._notification_listeners:
+            self._notifications.put_nowait((topic, message))
+
+    async def _apply_notifications(self):
+        while True:
+            topic, message = await self._notifications.get()
+            for listener in self._notification_listeners.get(topic, ()):
+                try:
+                    await listener(message)
+                except Exception:
+                    logger.exception("Falha ao aplicar notificação do tópico %s", topic)
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        store_id: int,
+        since: Optional[int] = None,
+        fetch_missed: Optional[Callable[[int, int], Awaitable[Events]]] = None
+    ):
+        """
+        Registra a conexão e, se 'since' for informado, reenvia primeiro os eventos
+        perdidos: do buffer em memória ou, se ele não cobrir o intervalo, de
+        'fetch_missed' (armazenamento persistente). Eventos ao vivo que chegarem
+        durante o reenvio ficam na fila e são enviados em seguida, sem duplicatas.
+        """
         await websocket.accept()
-        if store_id not in self.active_connections:
-            self.active_connections[store_id] = []
-        self.active_connections[store_id].append(websocket)
+        client = _Client(websocket, since)
+        self.active_connections.setdefault(store_id, {})[websocket] = client
+        if since is not None:
+            missed = self.replay_buffer.since(store_id, since)
+            if missed is None and fetch_missed is not None:
+                missed = await fetch_missed(store_id, since)
+            for seq, message in missed or []:
+                await websocket.send_text(message)
+                client.replayed.add(seq)
+        client.writer = asyncio.create_task(self._write(store_id, client))
 
     def disconnect(self, websocket: WebSocket, store_id: int):
-        if store_id in self.active_connections:
-            self.active_connections[store_id].remove(websocket)
+        connections = self.active_connections.get(store_id)
+        if not connections:
+            return
+        client = connections.pop(websocket, None)
+        if client is not None and client.writer is not None:
+            client.writer.cancel()
+        if not connections:
+            del self.active_connections[store_id]
+
+    async def publish(self, store_id: int, message: str, seq: Optional[int] = None):
+        """Publica uma mensagem já serializada e aguarda o broker; falhas são propagadas."""
+        await self.broker.publish(store_id, message, seq)
+
+    async def _send_local(self, store_id: int, message: str, seq: Optional[int] = None):
+        if seq is not None:
+            self.replay_buffer.append(store_id, seq, message)
+        for listener in self._listeners:
+            try:
+                listener(store_id, message, seq)
+            except Exception:
+                logger.exception("Falha ao processar mensagem da loja %s", store_id)
+        # Apenas enfileira: cada conexão tem sua própria tarefa de escrita
+        for websocket, client in list(self.active_connections.get(store_id, {}).items()):
+            try:
+                client.queue.put_nowait((seq, message))
+            except asyncio.QueueFull:
+                # Cliente lento demais: é desconectado para não acumular memória
+                logger.warning("Fila de saída cheia; desconectando cliente da loja %s", store_id)
+                self.disconnect(websocket, store_id)
+                task = asyncio.create_task(self._close(websocket))
+                self._pending.add(task)
+                task.add_done_callback(self._pending.discard)
+
+    async def _resync(self):
+        """
+        Chamado após uma reconexão do broker. O buffer de reenvio deixa de ser
+        confiável e os painéis conectados podem ter perdido eventos: eles são
+        desconectados e, ao reconectar com '?since=', recebem o que falta do banco.
+        """
+        self.replay_buffer.reset()
+        for store_id, connections in list(self.active_connections.items()):
+            for websocket in list(connections):
+                self.disconnect(websocket, store_id)
+                task = asyncio.create_task(self._close(websocket, status.WS_1012_SERVICE_RESTART))
+                self._pending.add(task)
+                task.add_done_callback(self._pending.discard)
+        for listener in self._resync_listeners:
+            try:
+                await listener()
+            except Exception:
+                logger.exception("Falha ao recuperar o estado após reconexão do broker")
+
+    async def _write(self, store_id: int, client: _Client):
+        try:
+            while True:
+                seq, message = await client.queue.get()
+                if seq is not None and client.since is not None and seq <= client.since:
+                    continue
+                if client.replayed:
+                    if seq in client.replayed:
+                        client.replayed.discard(seq)
+                        continue
+                    if seq is not None and seq > max(client.replayed):
+                        # A entrega ao vivo já passou do reenvio: não há mais duplicatas
+                        client.replayed.clear()
+                await client.websocket.send_text(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Socket quebrado: remove a conexão sem afetar as demais
+            self.disconnect(client.websocket, store_id)
 
-    async def broadcast_to_store(self, store_id: int, data: dict):
-        if store_id in self.active_connections:
-            # Envia a mensagem para todas as conexões daquela loja
-            for connection in self.active_connections[store_id]:
-                await connection.send_json(data)
+    async def _close(self, websocket: WebSocket, code: int = status.WS_1013_TRY_AGAIN_LATER):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
 
 # Instância global do gerenciador
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager()
@@ -0,0 +1,112 @@
+# Mede a latência do event loop (o que um ping de WebSocket sentiria) enquanto
+# pedidos são gravados: pelo caminho assíncrono das rotas (async_crud com
+# AsyncSession) e por um caminho síncrono equivalente executado dentro de uma
+# corrotina, como as rotas 'async def' faziam antes com a Session síncrona.
+# Usa o banco configurado no .env e cria uma loja de teste com produtos.
+#
+#   python benchmark_orders_async.py [gravadores concorrentes] [pedidos por gravador]
+
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+# Adiciona o diretório raiz do projeto ao início do path do Python.
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, PROJECT_ROOT)
+
+from sqlalchemy import insert
+
+from app import async_crud, crud, models, schemas
+from app.database import AsyncSessionLocal, Base, SessionLocal, engine
+
+WRITERS = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+ORDERS_PER_WRITER = int(sys.argv[2]) if len(sys.argv) > 2 else 25
+ITEMS_PER_ORDER = 5
+# Intervalo entre pings; o atraso além dele é tempo em que o loop ficou bloqueado
+PING_INTERVAL = 0.005
+
+def seed() -> tuple[int, list[int]]:
+    """Cria uma loja com produtos; retorna (loja, produtos)."""
+    with SessionLocal() as db:
+        owner = models.User(email=f"bench-owner-{random.randint(0, 10**9)}@example.com", hashed_password="x", role=models.UserRole.OWNER)
+        db.add(owner)
+        db.flush()
+        store = models.Store(name="Loja de benchmark", description="Loja de teste", owner_id=owner.id)
+        db.add(store)
+        db.flush()
+        products = [models.Product(name=f"Produto {i}", description="Produto de teste", price=10.0, store_id=store.id) for i in range(20)]
+        db.add_all(products)
+        db.commit()
+        return store.id, [product.id for product in products]
+
+def sample_order(store_id: int, product_ids: list[int], writer: int, number: int) -> schemas.OrderCreate:
+    return schemas.OrderCreate(
+        store_id=store_id,
+        items=[{"product_id": product_id, "quantity": 1} for product_id in random.sample(product_ids, ITEMS_PER_ORDER)],
+        customer_details={"phone": f"bench-{store_id}-{writer}-{number}", "name": "Cliente", "address": "Rua A, 1"},
+        payment_method="pix",
+    )
+
+def create_order_sync(order: schemas.OrderCreate):
+    """
+    Gravação do pedido com a Session síncrona (cliente, pedido e itens). Não grava
+    o evento nem os agregados de vendas: faz menos trabalho que o caminho assíncrono.
+    """
+    with SessionLocal() as db:
+        products = crud.get_products_for_order(db, store_id=order.store_id, product_ids=[item.product_id for item in order.items])
+        order_items, total_price = crud.build_order_items(order, products)
+        guest_customer = crud.create_or_update_guest_user(db, guest_details=order.customer_details, commit=False)
+        db_order = models.Order(guest_customer=guest_customer, store_id=order.store_id, total_price=total_price, payment_method=order.payment_method)
+        db.add(db_order)
+        db.flush()
+        db.execute(insert(models.OrderItem), [dict(item, order_id=db_order.id) for item in order_items])
+        db.commit()
+
+async def create_order_async(order: schemas.OrderCreate):
+    async with AsyncSessionLocal() as db:
+        await async_crud.create_guest_order(db, order)
+
+async def ping(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PING_INTERVAL)
+        lags.append((time.perf_counter() - started - PING_INTERVAL) * 1000)
+
+async def run(label: str, store_id: int, product_ids: list[int], sync: bool):
+    async def writer(index: int):
+        for number in range(ORDERS_PER_WRITER):
+            order = sample_order(store_id, product_ids, index, number)
+            if sync:
+                # Chamada bloqueante dentro da corrotina: o loop para até o banco responder
+                create_order_sync(order)
+            else:
+                await create_order_async(order)
+            # Cede o loop entre pedidos, como entre duas requisições
+            await asyncio.sleep(0)
+
+    lags, stop = [], asyncio.Event()
+    pinger = asyncio.create_task(ping(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(writer(f"{label}-{index}") for index in range(WRITERS)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await pinger
+    lags.sort()
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+    print(f"{label:10} {WRITERS * ORDERS_PER_WRITER / elapsed:10,.0f} pedidos/s   atraso do ping: "
+          f"mediana {statistics.median(lags):7.1f} ms, p99 {p99:7.1f} ms, máx {lags[-1]:7.1f} ms ({len(lags)} pings)")
+
+async def main():
+    Base.metadata.create_all(bind=engine)
+    store_id, product_ids = seed()
+    print(f"{WRITERS} gravadores x {ORDERS_PER_WRITER} pedidos de {ITEMS_PER_ORDER} itens")
+    # Aquecimento dos pools de conexões
+    await create_order_async(sample_order(store_id, product_ids, "warmup", 0))
+    create_order_sync(sample_order(store_id, product_ids, "warmup", 1))
+    await run("síncrono", store_id, product_ids, sync=True)
+    await run("assíncrono", store_id, product_ids, sync=False)
+
+asyncio.run(main())
@@ -0,0 +1,95 @@
+# Compara, à medida que a tabela de pedidos cresce, a latência de uma página
+# profunda do histórico de uma loja (a última) com OFFSET e com cursor (keyset
+# em (created_at, id)), usando crud.get_store_orders como as rotas. Usa o banco
+# configurado no .env; os pedidos de teste são removidos ao final.
+#
+#   python benchmark_pagination.py [tamanhos, ex.: 10000,100000,500000]
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Adiciona o diretório raiz do projeto ao início do path do Python.
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, PROJECT_ROOT)
+
+from sqlalchemy import delete, insert, select
+
+from app import crud, models
+from app.database import Base, SessionLocal, engine
+
+SIZES = [int(size) for size in sys.argv[1].split(",")] if len(sys.argv) > 1 else [10_000, 100_000, 500_000]
+PAGE_SIZE = 50
+BATCH_SIZE = 10_000
+REPEAT = 5
+
+def create_store(db) -> tuple[int, int]:
+    """Cria uma loja e um cliente de teste; retorna (loja, cliente)."""
+    owner = models.User(email=f"bench-owner-{random.randint(0, 10**9)}@example.com", hashed_password="x", role=models.UserRole.OWNER)
+    db.add(owner)
+    db.flush()
+    store = models.Store(name="Loja de benchmark", description="Loja de teste", owner_id=owner.id)
+    guest = models.GuestUser(phone=f"bench-{owner.id}", name="Cliente", address="Rua A, 1")
+    db.add_all([store, guest])
+    db.commit()
+    return store.id, guest.id
+
+def grow(db, store_id: int, guest_id: int, current: int, target: int):
+    """Insere pedidos até a loja ter 'target', um por minuto a partir de 2020."""
+    start = datetime(2020, 1, 1)
+    for offset in range(current, target, BATCH_SIZE):
+        db.execute(insert(models.Order), [
+            {
+                "guest_customer_id": guest_id,
+                "store_id": store_id,
+                "created_at": start + timedelta(minutes=number),
+                "total_price": 10.0,
+                "status": models.OrderStatus.DELIVERED,
+                "payment_method": "pix",
+            }
+            for number in range(offset, min(offset + BATCH_SIZE, target))
+        ])
+        db.commit()
+
+def measure(function) -> float:
+    """Melhor tempo, em milissegundos."""
+    best = float("inf")
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+def main():
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        store_id, guest_id = create_store(db)
+        try:
+            print(f"{'pedidos':>10} {'OFFSET':>12} {'cursor':>12}   (última página de {PAGE_SIZE}, melhor de {REPEAT})")
+            current = 0
+            for size in SIZES:
+                grow(db, store_id, guest_id, current, size)
+                current = size
+                skip = size - PAGE_SIZE
+                # Chave do pedido anterior à última página, como viria no cursor
+                after = db.execute(
+                    select(models.Order.created_at, models.Order.id)
+                    .where(models.Order.store_id == store_id)
+                    .order_by(models.Order.created_at.desc(), models.Order.id.desc())
+                    .offset(skip - 1).limit(1)
+                ).one()
+                # As duas formas devem retornar a mesma página
+                assert [order.id for order in crud.get_store_orders(db, store_id, skip=skip, limit=PAGE_SIZE)] == \
+                    [order.id for order in crud.get_store_orders(db, store_id, limit=PAGE_SIZE, after=tuple(after))]
+                by_offset = measure(lambda: crud.get_store_orders(db, store_id, skip=skip, limit=PAGE_SIZE))
+                by_cursor = measure(lambda: crud.get_store_orders(db, store_id, limit=PAGE_SIZE, after=tuple(after)))
+                db.expunge_all()
+                print(f"{size:>10,} {by_offset:10,.1f}ms {by_cursor:10,.1f}ms")
+        finally:
+            db.rollback()
+            db.execute(delete(models.Order).where(models.Order.store_id == store_id))
+            db.commit()
+
+main()
@@ -0,0 +1,67 @@
+# Simula uma onda de logins (início de turno) e compara a verificação de senhas
+# no threadpool do servidor, como as rotas síncronas faziam, com o pool de
+# processos do PasswordService. Mede a vazão de logins (total e por núcleo) e a
+# latência de uma requisição comum no threadpool durante a onda.
+#
+#   BCRYPT_ROUNDS=12 python benchmark_password_pool.py [logins]
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# Adiciona o diretório raiz do projeto ao início do path do Python.
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, PROJECT_ROOT)
+
+import anyio.to_thread
+
+from app.security import BCRYPT_ROUNDS, PasswordService, pwd_context
+
+LOGINS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+PASSWORD = "senha-do-entregador"
+# Intervalo entre as requisições comuns que medem a disponibilidade do threadpool
+PROBE_INTERVAL = 0.01
+
+async def probe(latencies: list, stop: asyncio.Event):
+    """Uma requisição síncrona trivial: só espera por uma thread livre do threadpool."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await anyio.to_thread.run_sync(lambda: None)
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(PROBE_INTERVAL)
+
+async def run(label: str, verify, cores: int):
+    latencies, stop = [], asyncio.Event()
+    prober = asyncio.create_task(probe(latencies, stop))
+    started = time.perf_counter()
+    results = await asyncio.gather(*(verify() for _ in range(LOGINS)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await prober
+    assert all(valid for valid, _ in results)
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:18} {LOGINS / elapsed:8,.1f} logins/s ({LOGINS / elapsed / cores:6,.1f} por núcleo)   "
+          f"requisição comum: mediana {statistics.median(latencies):8.1f} ms, p99 {p99:8.1f} ms")
+
+async def main():
+    cores = os.cpu_count() or 1
+    hashed = pwd_context.hash(PASSWORD)
+    print(f"{LOGINS} logins simultâneos, bcrypt com custo {BCRYPT_ROUNDS}, {cores} núcleos")
+
+    await run("threadpool", lambda: anyio.to_thread.run_sync(pwd_context.verify_and_update, PASSWORD, hashed), cores)
+
+    service = PasswordService()
+    try:
+        # Aquecimento: inicia os processos do pool fora da medição
+        await asyncio.gather(*(service.verify_and_update(PASSWORD, hashed) for _ in range(service.workers)))
+        await run("pool de processos", lambda: service.verify_and_update(PASSWORD, hashed), cores)
+    finally:
+        service.shutdown()
+    print(f"Fila do pool ao final: {service.stats()}")
+
+# Os processos do pool (forkserver/spawn) importam este módulo: a execução fica protegida
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+# Compara a busca de produtos pelo índice invertido (app/search.py) com o
+# LIKE '%termo%' sobre nome e descrição, que nenhum índice B-tree atende. Os
+# produtos são sintéticos; o LIKE roda num SQLite em memória com a tabela de
+# produtos da aplicação (o MySQL também varre a tabela inteira nesse caso).
+# Mostra ainda o tempo e a memória da construção do índice.
+#
+#   python benchmark_search.py [produtos]
+
+import os
+import random
+import resource
+import sys
+import time
+
+# Adiciona o diretório raiz do projeto ao início do path do Python.
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, PROJECT_ROOT)
+
+from sqlalchemy import create_engine, insert, or_, select
+
+from app import models
+from app.search import SearchIndex
+
+PRODUCTS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+STORES = max(1, PRODUCTS // 200)
+BATCH_SIZE = 20_000
+REPEAT = 5
+
+KINDS = ["Pizza", "Hambúrguer", "Pastel", "Esfiha", "Açaí", "Suco", "Salada", "Lasanha", "Coxinha", "Sanduíche", "Torta", "Sorvete"]
+FLAVORS = ["Calabresa", "Marguerita", "Frango", "Quatro Queijos", "Portuguesa", "Carne", "Palmito", "Limão",
+           "Chocolate", "Morango", "Bacon", "Vegetariana", "Atum", "Milho", "Doce de Leite", "Brócolis"]
+EXTRAS = ["Grande", "Média", "Pequena", "Artesanal", "Especial", "Tradicional", "da Casa", "Família", "Light"]
+INGREDIENTS = ["molho de tomate", "queijo", "orégano", "cebola", "azeitonas", "catupiry", "pimentões", "manjericão",
+               "pão", "alface", "tomates", "maionese", "batatas", "ovos", "presunto", "massa fina", "borda recheada"]
+
+QUERIES = ["pizza", "pizza calabresa", "hamburguer artesanal", "limao", "calab", "pasteis de carne", "sanduiche frango bac"]
+
+def sample_products():
+    """Gera (id, loja, nome, descrição) de forma determinística."""
+    rng = random.Random(42)
+    for product_id in range(1, PRODUCTS + 1):
+        name = f"{rng.choice(KINDS)} {rng.choice(FLAVORS)} {rng.choice(EXTRAS)}"
+        description = "Feito com " + ", ".join(rng.sample(INGREDIENTS, 4))
+        yield product_id, rng.randrange(1, STORES + 1), name, description
+
+def batches(rows, size: int):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def measure(function) -> tuple[float, object]:
+    """Melhor tempo em milissegundos e o último resultado."""
+    best, result = float("inf"), None
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+def like_query(query: str):
+    """Busca por LIKE: todos os termos em nome ou descrição, sem ranking nem acentos."""
+    conditions = []
+    for term in query.split():
+        pattern = f"%{term}%"
+        conditions.append(or_(models.Product.name.like(pattern), models.Product.description.like(pattern)))
+    return select(models.Product.id).where(*conditions)
+
+def main():
+    index = SearchIndex()
+    memory_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    for batch in batches(sample_products(), BATCH_SIZE):
+        index.add_many(batch)
+    build_seconds = time.perf_counter() - started
+    memory_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    stats = index.stats()
+    print(f"Índice: {stats['products']:,} produtos, {stats['terms']:,} termos, construído em {build_seconds:,.1f}s, "
+          f"~{(memory_after - memory_before) / 1024:,.0f} MB")
+
+    engine = create_engine("sqlite://")
+    models.Product.__table__.create(engine)
+    with engine.begin() as connection:
+        for batch in batches(sample_products(), BATCH_SIZE):
+            connection.execute(insert(models.Product), [
+                {"id": product_id, "store_id": store_id, "name": name, "description": description, "price": 10.0}
+                for product_id, store_id, name, description in batch
+            ])
+
+    print(f"\n{'busca':24} {'índice':>10} {'loja':>10} {'LIKE':>12} {'resultados LIKE':>16}")
+    with engine.connect() as connection:
+        for query in QUERIES:
+            by_index, _ = measure(lambda: index.search(query, limit=20))
+            in_store, _ = measure(lambda: index.search(query, store_id=1, limit=20))
+            by_like, rows = measure(lambda: connection.execute(like_query(query)).all())
+            print(f"{query:24} {by_index:8,.2f}ms {in_store:8,.2f}ms {by_like:10,.1f}ms {len(rows):16,}")
+
+main()
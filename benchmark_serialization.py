@@ -0,0 +1,77 @@
+# Micro-benchmarks da serialização dos principais schemas a partir de objetos ORM
+# (sem banco): compara json.dumps sobre model_dump, model_dump_json e os adaptadores
+# em cache de app/serialization.py. Mostra também o custo de criar um TypeAdapter
+# a cada chamada, que é o que o cache evita.
+#
+#   python benchmark_serialization.py [itens por lista]
+
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timezone
+
+# Adiciona o diretório raiz do projeto ao início do path do Python.
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, PROJECT_ROOT)
+
+from pydantic import TypeAdapter
+
+from app import models, schemas, serialization
+
+ITEMS = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+def sample_objects() -> dict:
+    """Objetos ORM transitórios, com os relacionamentos já preenchidos."""
+    products = [
+        models.Product(id=i, store_id=1, name=f"Pizza {i}", description="Molho de tomate, queijo e orégano",
+                       price=39.9, image_url=f"/static/images/products/{i:040x}_full.webp")
+        for i in range(ITEMS)
+    ]
+    store = models.Store(id=1, name="Pizzaria", description="Forno a lenha", owner_id=1,
+                         logo_url=f"/static/store_logos/{1:040x}_full.webp", products=products)
+    order = models.Order(
+        id=1, store_id=1, created_at=datetime.now(timezone.utc), total_price=ITEMS * 39.9,
+        status=models.OrderStatus.REQUESTED, payment_method="pix", customer_user=None,
+        guest_customer=models.GuestUser(id=1, phone="11999999999", name="Cliente", address="Rua A, 1"),
+        items=[models.OrderItem(id=i, product=product, quantity=1, price_at_purchase=39.9) for i, product in enumerate(products)],
+    )
+    user = models.User(id=1, email="dono@example.com", is_active=True, role=models.UserRole.OWNER, stores=[store])
+    return {
+        "Product (lista)": (list[schemas.Product], products),
+        "Store": (schemas.Store, store),
+        "Order": (schemas.Order, order),
+        "UserDetail": (schemas.UserDetail, user),
+    }
+
+def measure(function, number: int) -> float:
+    """Melhor tempo por chamada, em microssegundos."""
+    return min(timeit.repeat(function, number=number, repeat=5)) / number * 1e6
+
+def main():
+    print(f"{'schema':18} {'json.dumps':>12} {'dump_json':>12} {'adaptador':>12} {'sem cache':>12}   (µs por chamada, {ITEMS} itens)")
+    for label, (schema, obj) in sample_objects().items():
+        uncached = lambda: TypeAdapter(schema).dump_json(TypeAdapter(schema).validate_python(obj, from_attributes=True))
+        type_adapter = TypeAdapter(schema)
+        results = [
+            # Caminho anterior do cache de cardápios: dicts intermediários + json.dumps
+            measure(lambda: json.dumps(type_adapter.dump_python(type_adapter.validate_python(obj, from_attributes=True), mode="json"),
+                                       ensure_ascii=False, separators=(",", ":")).encode(), 200),
+            measure(lambda: type_adapter.dump_json(type_adapter.validate_python(obj, from_attributes=True)), 200),
+            measure(lambda: serialization.dump_json(schema, obj), 200),
+            measure(uncached, 5),
+        ]
+        print(f"{label:18} " + " ".join(f"{value:12,.1f}" for value in results))
+
+    # Criação/alteração de pedido: antes o JSON era gerado para o evento e de novo para a
+    # resposta (model_validate na rota + serialização do response_model); agora uma vez só
+    order = sample_objects()["Order"][1]
+    response_adapter = TypeAdapter(schemas.Order)
+    before = measure(lambda: (
+        schemas.Order.model_validate(order).model_dump_json(),
+        response_adapter.dump_json(response_adapter.validate_python(schemas.Order.model_validate(order))),
+    ), 200)
+    after = measure(lambda: serialization.json_body(serialization.order_json(order)), 200)
+    print(f"\nResposta + evento do pedido: {before:,.1f} µs antes, {after:,.1f} µs depois")
+
+main()
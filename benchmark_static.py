@@ -0,0 +1,84 @@
+# Compara o StaticFiles padrão com o MediaStaticFiles servindo os mesmos arquivos:
+# vazão de GETs completos e o custo de renderizar um cardápio várias vezes com um
+# cliente que respeita Cache-Control e ETag (como um navegador).
+#
+#   python benchmark_static.py [imagens] [renderizações]
+
+import asyncio
+import gzip
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.staticfiles import StaticFiles
+
+# Adiciona o diretório raiz do projeto ao início do path do Python.
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, PROJECT_ROOT)
+
+from app.static_files import MediaStaticFiles
+
+IMAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+RENDERS = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+async def render_menus(client: httpx.AsyncClient, prefix: str, names: list[str]) -> tuple[int, int]:
+    """Renderiza o cardápio RENDERS vezes; retorna (requisições feitas, bytes recebidos)."""
+    cache = {}  # url -> (etag, imutável)
+    requests, received = 0, 0
+    for _ in range(RENDERS):
+        for name in names:
+            url = f"{prefix}/{name}"
+            etag, immutable = cache.get(url, (None, False))
+            if immutable:
+                continue
+            headers = {"if-none-match": etag} if etag else {}
+            response = await client.get(url, headers=headers)
+            requests += 1
+            received += len(response.content)
+            if response.status_code == 200:
+                cache[url] = (response.headers.get("etag"), "immutable" in response.headers.get("cache-control", ""))
+    return requests, received
+
+async def main():
+    with tempfile.TemporaryDirectory() as directory:
+        names = []
+        for index in range(IMAGES):
+            name = f"{index:040x}_card.webp"
+            with open(os.path.join(directory, name), "wb") as f:
+                f.write(os.urandom(30 * 1024))
+            names.append(name)
+        with open(os.path.join(directory, "menu.css"), "wb") as f:
+            f.write(b".product { display: flex; margin: 0 auto; }\n" * 4000)
+        with open(os.path.join(directory, "menu.css"), "rb") as f, open(os.path.join(directory, "menu.css.gz"), "wb") as gz:
+            gz.write(gzip.compress(f.read()))
+
+        app = Starlette(routes=[
+            Mount("/plain", StaticFiles(directory=directory)),
+            Mount("/media", MediaStaticFiles(directory=directory)),
+        ])
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            # Aquecimento (threadpool, cache de páginas do sistema)
+            for name in names:
+                await client.get(f"/plain/{name}")
+            for prefix in ("/plain", "/media"):
+                started = time.perf_counter()
+                for name in names * 10:
+                    await client.get(f"{prefix}/{name}")
+                elapsed = time.perf_counter() - started
+                print(f"{prefix:7} GET completo: {len(names) * 10 / elapsed:,.0f} req/s")
+
+                started = time.perf_counter()
+                requests, received = await render_menus(client, prefix, names)
+                elapsed = time.perf_counter() - started
+                print(f"{prefix:7} {RENDERS} cardápios: {requests} requisições, {received / 1024:,.0f} KB, {elapsed * 1000:,.0f} ms")
+
+                css = await client.get(f"{prefix}/menu.css", headers={"accept-encoding": "gzip"})
+                print(f"{prefix:7} menu.css: {int(css.headers['content-length']) / 1024:,.0f} KB transferidos "
+                      f"(content-encoding: {css.headers.get('content-encoding', 'nenhum')})")
+
+asyncio.run(main())
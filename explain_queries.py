@@ -0,0 +1,173 @@
+# Ferramenta de análise de índices: executa as consultas de leitura de app/crud.py,
+# roda EXPLAIN em cada SQL gerado e aponta varreduras completas de tabela.
+# Também compara os índices declarados em app/models.py com os existentes no banco.
+#
+# Uso:
+#   python explain_queries.py                  # analisa o banco configurado no .env
+#   python explain_queries.py --seed 10000     # antes, popula o banco com N pedidos de teste
+#   python explain_queries.py --sync-indexes   # cria/remove índices para igualar aos modelos
+
+import argparse
+import itertools
+import os
+import random
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, PROJECT_ROOT)
+
+from sqlalchemy import event, inspect, insert, select
+
+from app.database import Base, SessionLocal, engine
+from app import async_crud, crud, models, pagination
+
+def seed(db, orders: int):
+    """Popula o banco com dados sintéticos proporcionais ao número de pedidos."""
+    stores = max(1, orders // 1000)
+    products_per_store = 50
+    owner = models.User(email=f"seed-owner-{random.randint(0, 10**9)}@example.com", hashed_password="x", role=models.UserRole.OWNER)
+    db.add(owner)
+    db.flush()
+    db.execute(insert(models.Store), [
+        {"name": f"Loja {i}", "description": "Loja de teste", "owner_id": owner.id} for i in range(stores)
+    ])
+    store_ids = db.scalars(select(models.Store.id).where(models.Store.owner_id == owner.id)).all()
+    db.execute(insert(models.Product), [
+        {"name": f"Produto {i}", "description": "Produto de teste", "price": 10.0, "store_id": store_id}
+        for store_id in store_ids for i in range(products_per_store)
+    ])
+    db.execute(insert(models.GuestUser), [
+        {"phone": f"seed-{owner.id}-{i}", "name": "Cliente", "address": "Rua"} for i in range(max(1, orders // 10))
+    ])
+    guest_ids = db.scalars(select(models.GuestUser.id).where(models.GuestUser.phone.like(f"seed-{owner.id}-%"))).all()
+    statuses = list(models.OrderStatus)
+    db.execute(insert(models.Order), [
+        {
+            "guest_customer_id": random.choice(guest_ids),
+            "store_id": random.choice(store_ids),
+            "total_price": 10.0,
+            "status": random.choice(statuses),
+            "payment_method": "pix",
+        }
+        for _ in range(orders)
+    ])
+    db.commit()
+    print(f"Banco populado: {stores} lojas, {stores * products_per_store} produtos, {orders} pedidos.")
+
+def sample_calls(db):
+    """Chamadas de leitura de crud.py com argumentos reais do banco."""
+    user = db.query(models.User).first()
+    guest = db.query(models.GuestUser).first()
+    store = db.query(models.Store).first()
+    product = db.query(models.Product).first()
+    order = db.query(models.Order).order_by(models.Order.id.desc()).first()
+    if not all([user, guest, store, product, order]):
+        raise SystemExit("O banco precisa ter usuários, lojas, produtos e pedidos. Use --seed.")
+    order_cursor = pagination.order_key(order)
+    return {
+        "get_user_by_email": lambda: crud.get_user_by_email(db, email=user.email),
+        "get_user_by_id": lambda: crud.get_user_by_id(db, user_id=user.id),
+        "get_users": lambda: crud.get_users(db, limit=20),
+        "get_users (cursor)": lambda: crud.get_users(db, limit=20, after_id=user.id),
+        "get_guest_user_by_phone": lambda: crud.get_guest_user_by_phone(db, phone=guest.phone),
+        "get_store": lambda: crud.get_store(db, store_id=store.id),
+        "get_stores": lambda: crud.get_stores(db, limit=20),
+        "get_stores (cursor)": lambda: crud.get_stores(db, limit=20, after_id=store.id),
+        "get_stores_by_owner": lambda: crud.get_stores_by_owner(db, owner_id=store.owner_id, limit=20),
+        "get_product": lambda: crud.get_product(db, product_id=product.id),
+        "get_products_by_store": lambda: crud.get_products_by_store(db, store_id=store.id, limit=20),
+        "get_products_for_order": lambda: crud.get_products_for_order(db, store_id=product.store_id, product_ids=[product.id]),
+        "get_order": lambda: crud.get_order(db, order_id=order.id),
+        "get_order_version": lambda: crud.get_order_version(db, order_id=order.id),
+        "get_store_orders_version": lambda: crud.get_store_orders_version(db, store_id=order.store_id),
+        "iter_store_orders (2 lotes)": lambda: list(itertools.islice(crud.iter_store_orders(db, store_id=order.store_id, batch_size=20), 2)),
+        "get_user_orders": lambda: crud.get_user_orders(db, user_id=user.id),
+        "get_store_orders": lambda: crud.get_store_orders(db, store_id=order.store_id, limit=20),
+        "get_store_orders (cursor)": lambda: crud.get_store_orders(db, store_id=order.store_id, limit=20, after=order_cursor),
+        # Consulta assíncrona da inicialização (quadro de pedidos), executada aqui na sessão síncrona
+        "get_open_orders": lambda: db.scalars(async_crud.open_orders_statement()).all(),
+    }
+
+def explain_all(db) -> int:
+    """Executa cada chamada, roda EXPLAIN nos SELECTs gerados e retorna o número de alertas."""
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    warnings = 0
+    for name, call in sample_calls(db).items():
+        captured.clear()
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            call()
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+        db.expunge_all()
+
+        print(f"\n== {name} ({len(captured)} consulta(s))")
+        for statement, parameters in captured:
+            rows = db.connection().exec_driver_sql(f"EXPLAIN {statement}", parameters).mappings().all()
+            for row in rows:
+                full_scan = row.get("type") == "ALL"
+                warnings += full_scan
+                flag = "  <-- VARREDURA COMPLETA" if full_scan else ""
+                print(f"   {row.get('table')}: type={row.get('type')} key={row.get('key')} rows={row.get('rows')}{flag}")
+    return warnings
+
+def compare_indexes(apply: bool):
+    """Compara os índices declarados nos modelos com os existentes no banco."""
+    inspector = inspect(engine)
+    print("\n== Índices")
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {index["name"]: index for index in inspector.get_indexes(table.name)}
+            # O InnoDB cria índices próprios para as chaves estrangeiras. Eles só são
+            # mantidos se nenhum índice declarado (ou a chave primária) começar pelas
+            # mesmas colunas; caso contrário, são redundantes.
+            foreign_keys = [fk["constrained_columns"] for fk in inspector.get_foreign_keys(table.name)]
+            declared = {index.name: index for index in table.indexes}
+            prefixes = [[column.name for column in index.columns] for index in declared.values()]
+            prefixes.append([column.name for column in table.primary_key.columns])
+            for name, index in declared.items():
+                if name not in existing:
+                    print(f"   FALTANDO  {table.name}.{name}")
+                    if apply:
+                        index.create(conn)
+            unused = [
+                name for name, index in existing.items()
+                if name not in declared and (
+                    index["column_names"] not in foreign_keys
+                    or any(columns[:len(index["column_names"])] == index["column_names"] for columns in prefixes)
+                )
+            ]
+            for name in sorted(unused):
+                print(f"   SEM USO   {table.name}.{name}")
+                if apply:
+                    # Os índices declarados já foram criados: a chave estrangeira continua atendida
+                    conn.exec_driver_sql(f"DROP INDEX `{name}` ON `{table.name}`")
+
+def main():
+    parser = argparse.ArgumentParser(description="Analisa com EXPLAIN as consultas de app/crud.py.")
+    parser.add_argument("--seed", type=int, default=0, help="popula o banco com N pedidos de teste")
+    parser.add_argument("--sync-indexes", action="store_true", help="cria/remove índices para igualar aos modelos")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if args.seed:
+            seed(db, args.seed)
+        compare_indexes(apply=args.sync_indexes)
+        warnings = explain_all(db)
+    finally:
+        db.close()
+
+    print(f"\n{warnings} varredura(s) completa(s) encontrada(s).")
+    sys.exit(1 if warnings else 0)
+
+if __name__ == "__main__":
+    main()
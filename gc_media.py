@@ -0,0 +1,26 @@
+# Remove os arquivos de mídia (imagens de produtos e logos de lojas) que nenhum
+# registro referencia mais: imagens substituídas e de produtos/lojas apagados.
+# Pode ser agendado (ex.: cron diário). Use --dry-run para apenas listar o total.
+
+import os
+import sys
+
+# Adiciona o diretório raiz do projeto ao início do path do Python.
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, PROJECT_ROOT)
+os.chdir(PROJECT_ROOT)
+
+from app.database import SessionLocal
+from app import crud, images
+
+dry_run = "--dry-run" in sys.argv
+
+db = SessionLocal()
+try:
+    referenced = crud.get_media_urls(db)
+finally:
+    db.close()
+
+removed, freed = images.collect_garbage(referenced, dry_run=dry_run)
+action = "Seriam removidos" if dry_run else "Removidos"
+print(f"{action} {removed} arquivos ({freed / (1024 * 1024):.1f} MB).")
@@ -0,0 +1,40 @@
+# Migra um banco criado antes das sequências de eventos por loja: adiciona a
+# coluna order_events.seq, cria a tabela store_event_sequences e as preenche
+# a partir dos eventos existentes. Execute UMA VEZ, com a API parada.
+# As sequências antigas passam a ser o id do evento, então os cursores '?since='
+# que os painéis já guardaram continuam válidos.
+
+import os
+import sys
+
+# Adiciona o diretório raiz do projeto ao início do path do Python.
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, PROJECT_ROOT)
+
+from sqlalchemy import inspect, text
+
+from app.database import Base, engine
+from app import models
+
+columns = {column["name"] for column in inspect(engine).get_columns("order_events")}
+if "seq" in columns:
+    print("A coluna order_events.seq já existe; nada a migrar.")
+    sys.exit(0)
+
+print("Adicionando a sequência por loja aos eventos de pedidos...")
+
+with engine.begin() as conn:
+    conn.execute(text("ALTER TABLE order_events ADD COLUMN seq INTEGER NULL"))
+    conn.execute(text("UPDATE order_events SET seq = id"))
+    conn.execute(text("ALTER TABLE order_events MODIFY seq INTEGER NOT NULL"))
+    conn.execute(text("CREATE UNIQUE INDEX ix_order_events_store_seq ON order_events (store_id, seq)"))
+
+Base.metadata.create_all(bind=engine)
+
+with engine.begin() as conn:
+    conn.execute(text(
+        "INSERT INTO store_event_sequences (store_id, seq) "
+        "SELECT store_id, MAX(seq) FROM order_events GROUP BY store_id"
+    ))
+
+print("Sequências de eventos criadas com sucesso!")
@@ -0,0 +1,56 @@
+# Gera variantes pré-comprimidas (.br e .gz) dos arquivos de texto em static/,
+# entregues pelo MediaStaticFiles conforme o Accept-Encoding do cliente.
+# Execute após publicar novos arquivos estáticos; arquivos já atualizados são ignorados.
+
+import gzip
+import mimetypes
+import os
+import sys
+
+# Adiciona o diretório raiz do projeto ao início do path do Python.
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, PROJECT_ROOT)
+
+from app.static_files import PRECOMPRESSED, is_compressible
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+    print("Pacote 'brotli' não instalado: apenas as variantes .gz serão geradas.")
+
+# Arquivos pequenos não compensam a variante extra
+MIN_SIZE = 1024
+
+COMPRESSORS = {
+    "gzip": lambda data: gzip.compress(data, compresslevel=9, mtime=0),
+    "br": (lambda data: brotli.compress(data, quality=11)) if brotli else None,
+}
+
+created = 0
+for root, _, files in os.walk(os.path.join(PROJECT_ROOT, "static")):
+    for name in files:
+        path = os.path.join(root, name)
+        media_type, encoding = mimetypes.guess_type(name)
+        if encoding or not media_type or not is_compressible(media_type) or os.path.getsize(path) < MIN_SIZE:
+            continue
+        mtime = os.path.getmtime(path)
+        data = None
+        for encoding, suffix in PRECOMPRESSED:
+            compress = COMPRESSORS[encoding]
+            target = path + suffix
+            if compress is None or (os.path.exists(target) and os.path.getmtime(target) >= mtime):
+                continue
+            if data is None:
+                with open(path, "rb") as f:
+                    data = f.read()
+            compressed = compress(data)
+            # Só mantém a variante se ela for menor que o original
+            if len(compressed) >= len(data):
+                continue
+            with open(target + ".tmp", "wb") as f:
+                f.write(compressed)
+            os.replace(target + ".tmp", target)
+            created += 1
+
+print(f"{created} variantes pré-comprimidas geradas.")
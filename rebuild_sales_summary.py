@@ -0,0 +1,25 @@
+# Recalcula os agregados de vendas (store_daily_sales / product_daily_sales) a
+# partir dos pedidos existentes. Execute UMA VEZ após criar as novas tabelas em um
+# banco que já tinha pedidos; depois disso os agregados são mantidos pela API.
+
+import os
+import sys
+
+# Adiciona o diretório raiz do projeto ao início do path do Python.
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, PROJECT_ROOT)
+
+from app.database import Base, SessionLocal, engine
+from app import crud
+
+Base.metadata.create_all(bind=engine)
+
+print("Recalculando os agregados de vendas...")
+
+db = SessionLocal()
+try:
+    crud.rebuild_sales_summary(db)
+finally:
+    db.close()
+
+print("Agregados de vendas recalculados com sucesso!")
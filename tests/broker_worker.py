@@ -0,0 +1,72 @@
+"""
+Worker usado por tests/test_websocket_processes.py: um processo com o seu próprio
+ConnectionManager, criado a partir de WS_BROKER_URL como em cada worker do uvicorn.
+Lê comandos da entrada padrão e escreve na saída o que os seus sockets e
+listeners recebem, uma linha por evento.
+
+Comandos:
+  connect <loja>                        conecta um painel da loja
+  publish <loja> <sequência> <mensagem>
+  notify <tópico> <mensagem>
+
+Saída: 'ready', 'ok' (após cada comando), 'message <loja> <mensagem>' e
+'notify <tópico> <mensagem>'. Os tópicos escutados são os argumentos do processo.
+"""
+import asyncio
+import os
+import sys
+
+# Permite importar o pacote 'app' a partir da raiz do projeto
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.websocket import ConnectionManager
+
+def emit(line: str):
+    print(line, flush=True)
+
+class PrintingWebSocket:
+    """Painel que escreve na saída padrão cada mensagem recebida."""
+
+    def __init__(self, store_id: int):
+        self.store_id = store_id
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        emit(f"message {self.store_id} {message}")
+
+    async def close(self, code: int):
+        emit(f"closed {self.store_id} {code}")
+
+def notification_listener(topic: str):
+    async def listener(message: str):
+        emit(f"notify {topic} {message}")
+    return listener
+
+async def main(topics: list[str]):
+    manager = ConnectionManager()
+    for topic in topics:
+        manager.add_notification_listener(topic, notification_listener(topic))
+    await manager.start()
+    emit("ready")
+    loop = asyncio.get_running_loop()
+    try:
+        while line := await loop.run_in_executor(None, sys.stdin.readline):
+            command, _, args = line.rstrip("\n").partition(" ")
+            if command == "connect":
+                await manager.connect(PrintingWebSocket(int(args)), store_id=int(args))
+            elif command == "publish":
+                store_id, seq, message = args.split(" ", 2)
+                await manager.publish(int(store_id), message, seq=int(seq))
+            elif command == "notify":
+                topic, message = args.split(" ", 1)
+                manager.notify(topic, message)
+            emit("ok")
+    finally:
+        await manager.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import sys
+
+import fakeredis
+import pytest
+
+# Permite importar o pacote 'app' a partir da raiz do projeto
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+# app/database.py exige a configuração do MySQL na importação; os testes usam SQLite
+for name in ("DB_USER", "DB_PASSWORD", "DB_HOST", "DB_NAME"):
+    os.environ.setdefault(name, "test")
+
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.websocket import ConnectionManager, RedisBroker
+
+class SQLiteUpsert(sqlite.Insert):
+    """INSERT ... ON DUPLICATE KEY UPDATE do MySQL escrito como o upsert do SQLite."""
+    inherit_cache = True
+
+    @property
+    def inserted(self):
+        return self.excluded
+
+    def on_duplicate_key_update(self, **values):
+        keys = [column.name for column in self.table.primary_key.columns]
+        return self.on_conflict_do_update(index_elements=keys, set_=values)
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """Banco SQLite com as tabelas da aplicação: (sessões síncronas, sessões assíncronas, engine assíncrona)."""
+    path = tmp_path / "test.db"
+    engine = create_engine(f"sqlite:///{path}")
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    models.Base.metadata.create_all(engine)
+    monkeypatch.setattr(crud, "mysql_insert", SQLiteUpsert)
+    yield (
+        sessionmaker(bind=engine, autoflush=False, expire_on_commit=False),
+        async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False),
+        async_engine,
+    )
+    engine.dispose()
+
+@pytest.fixture
+async def workers():
+    """Cria gerenciadores (um por worker) ligados ao mesmo servidor Redis."""
+    server = fakeredis.FakeServer()
+    managers = []
+
+    async def start(client=None) -> ConnectionManager:
+        client = client or fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+        manager = ConnectionManager(RedisBroker(client=client))
+        await manager.start()
+        managers.append(manager)
+        return manager
+
+    start.server = server
+    yield start
+    for manager in managers:
+        await manager.stop()
+
+@pytest.fixture
+def wait_for():
+    """Aguarda (com limite de tempo) até a condição ser verdadeira."""
+    async def wait(condition, timeout: float = 2.0):
+        async def poll():
+            while not condition():
+                await asyncio.sleep(0.01)
+        await asyncio.wait_for(poll(), timeout)
+    return wait
@@ -0,0 +1,69 @@
+import io
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+
+from app import images
+from app.images import VARIANTS, ImageService, _content_hasher, variant_path
+
+@pytest.fixture
+def service():
+    service = ImageService(workers=1)
+    yield service
+    service.shutdown()
+
+def upload(data: bytes) -> UploadFile:
+    return UploadFile(io.BytesIO(data), filename="imagem")
+
+def png(size=(800, 600)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "red").save(buffer, "PNG")
+    return buffer.getvalue()
+
+def test_save_renders_every_variant(service, tmp_path):
+    url = service.save(upload(png()), str(tmp_path))
+
+    base = url[1:].removesuffix("_full.webp")
+    for variant, size in VARIANTS.items():
+        with Image.open(variant_path(base, variant)) as image:
+            assert image.format == "WEBP"
+            assert max(image.size) == min(size, 800)
+    # O mesmo conteúdo reaproveita as variantes já gravadas
+    assert service.save(upload(png()), str(tmp_path)) == url
+    assert service.stats()["deduplicated"] == 1
+
+def test_undecodable_upload_is_a_client_error(service, tmp_path):
+    with pytest.raises(HTTPException) as error:
+        service.save(upload(b"not an image"), str(tmp_path))
+    assert error.value.status_code == 400
+    assert list(tmp_path.iterdir()) == []
+
+def test_server_failure_is_not_reported_as_invalid_image(service, tmp_path):
+    data = png()
+    hasher = _content_hasher()
+    hasher.update(data)
+    # Um diretório no lugar de uma variante: a gravação falha no processo do pool
+    Path(variant_path(f"{tmp_path}/{hasher.hexdigest()}", "card")).mkdir()
+    with pytest.raises(IsADirectoryError):
+        service.save(upload(data), str(tmp_path))
+    assert service.stats()["failed"] == 1
+
+def test_oversized_upload_is_rejected_and_spool_removed(service, tmp_path, monkeypatch):
+    monkeypatch.setattr(images, "MAX_UPLOAD_BYTES", 1024)
+    spooled = []
+    original = tempfile.NamedTemporaryFile
+    def named_temporary_file(*args, **kwargs):
+        spool = original(*args, **kwargs)
+        spooled.append(spool.name)
+        return spool
+    monkeypatch.setattr(images.tempfile, "NamedTemporaryFile", named_temporary_file)
+
+    with pytest.raises(HTTPException) as error:
+        service.save(upload(b"x" * 4096), str(tmp_path))
+    assert error.value.status_code == 413
+    # O arquivo temporário do upload não fica para trás
+    assert spooled and not os.path.exists(spooled[0])
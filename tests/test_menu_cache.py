@@ -0,0 +1,56 @@
+from app import models
+from app.menu_cache import MenuCache
+
+def sample_store(price: float = 39.9) -> models.Store:
+    product = models.Product(id=1, store_id=1, name="Pizza", description="Queijo", price=price)
+    return models.Store(id=1, name="Pizzaria", description="Forno a lenha", owner_id=1, products=[product])
+
+def test_build_is_cached_when_store_did_not_change():
+    cache = MenuCache()
+    generation = cache.generation(1)
+    cache.build(sample_store(), generation)
+
+    assert cache.get(1) is not None
+
+def test_build_read_before_a_change_is_not_cached():
+    cache = MenuCache()
+    generation = cache.generation(1)
+    stale = sample_store(price=39.9)
+    # Outro pedido altera o produto entre a leitura do banco e a montagem do snapshot
+    cache.upsert_product(models.Product(id=1, store_id=1, name="Pizza", description="Queijo", price=45.0))
+
+    snapshot = cache.build(stale, generation)
+
+    assert snapshot.products[1]["price"] == 39.9
+    assert cache.get(1) is None
+    assert cache.stats()["discarded"] == 1
+
+def test_invalidate_and_clear_discard_builds_in_progress():
+    cache = MenuCache()
+    generation = cache.generation(1)
+    cache.invalidate(1)
+    cache.build(sample_store(), generation)
+    assert cache.get(1) is None
+
+    generation = cache.generation(1)
+    cache.clear()
+    cache.build(sample_store(), generation)
+    assert cache.get(1) is None
+
+def test_updates_replace_the_snapshot_instead_of_changing_it():
+    cache = MenuCache()
+    cache.build(sample_store(), cache.generation(1))
+    before = cache.get(1)
+    body, etag = before.store_body, before.store_etag
+
+    cache.upsert_product(models.Product(id=1, store_id=1, name="Pizza", description="Queijo", price=45.0))
+    cache.update_store(models.Store(id=1, name="Pizzaria Nova", description="Forno a lenha", owner_id=1))
+
+    # Quem já leu o snapshot continua com corpo e ETag do mesmo estado
+    assert (before.store_body, before.store_etag) == (body, etag)
+    after = cache.get(1)
+    assert after is not before
+    assert after.store_etag != etag
+    assert after.products[1]["price"] == 45.0
+    assert after.store["name"] == "Pizzaria Nova"
+    assert after.expires_at == before.expires_at
@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import event
+
+from app import async_crud, models, schemas
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def store(database):
+    """Loja com 20 produtos."""
+    SessionLocal, _, _ = database
+    with SessionLocal() as db:
+        owner = models.User(email="owner@example.com", hashed_password="x", role=models.UserRole.OWNER)
+        db.add(owner)
+        db.flush()
+        db_store = models.Store(name="Loja", description="Teste", owner_id=owner.id)
+        db.add(db_store)
+        db.flush()
+        products = [
+            models.Product(name=f"Produto {i}", description="Teste", price=10 + i, store_id=db_store.id)
+            for i in range(20)
+        ]
+        db.add_all(products)
+        db.commit()
+        return db_store.id, [product.id for product in products]
+
+async def count_order_queries(database, store_id: int, product_ids: list[int], phone: str) -> int:
+    _, AsyncSessionLocal, async_engine = database
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    order = schemas.OrderCreate(
+        store_id=store_id,
+        items=[{"product_id": product_id, "quantity": 2} for product_id in product_ids],
+        customer_details={"phone": phone, "name": "Cliente", "address": "Rua A, 1"},
+        payment_method="pix",
+    )
+    async with AsyncSessionLocal() as db:
+        # Abre a conexão antes de contar: só as consultas do pedido entram na conta
+        await db.connection()
+        event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+        try:
+            db_order, _ = await async_crud.create_guest_order(db, order)
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+    assert len(db_order.items) == len(product_ids)
+    return len(statements)
+
+async def test_create_guest_order_query_count_does_not_grow_with_cart(database, store):
+    store_id, product_ids = store
+
+    single = await count_order_queries(database, store_id, product_ids[:1], phone="11111111")
+    full = await count_order_queries(database, store_id, product_ids, phone="22222222")
+
+    assert single == full
@@ -0,0 +1,45 @@
+import asyncio
+import json
+
+import pytest
+
+from app.order_tracker import OrderTracker
+
+pytestmark = pytest.mark.anyio
+
+def event(status: str) -> str:
+    return json.dumps({"id": 1, "status": status})
+
+async def test_events_older_than_the_snapshot_are_dropped():
+    tracker = OrderTracker()
+    subscription = tracker.subscribe(1)
+    # Evento anterior ao snapshot chega entre a assinatura e a leitura do banco
+    tracker.on_message(1, event("REQUESTED"), 3)
+    tracker.start_at(subscription, 5)
+    stream = tracker.stream(1, subscription, event("OUT_FOR_DELIVERY"), "OUT_FOR_DELIVERY", 5)
+
+    snapshot = await stream.__anext__()
+    assert snapshot.startswith("id: 5\n")
+
+    # Despacho atrasado de outro worker: status anterior ao do snapshot
+    tracker.on_message(1, event("ACCEPTED"), 4)
+    tracker.on_message(1, event("DELIVERED"), 6)
+
+    frame = await asyncio.wait_for(stream.__anext__(), 1)
+    assert frame == f"id: 6\nevent: status\ndata: {event('DELIVERED')}\n\n"
+    # Status final: o fluxo termina e a assinatura é removida
+    with pytest.raises(StopAsyncIteration):
+        await stream.__anext__()
+    assert tracker.stats()["connections"] == 0
+
+async def test_newer_event_received_before_start_at_is_kept():
+    tracker = OrderTracker()
+    subscription = tracker.subscribe(1)
+    tracker.on_message(1, event("ACCEPTED"), 6)
+    tracker.start_at(subscription, 5)
+    stream = tracker.stream(1, subscription, event("REQUESTED"), "REQUESTED", 5)
+
+    await stream.__anext__()
+    frame = await asyncio.wait_for(stream.__anext__(), 1)
+    assert frame.startswith("id: 6\n")
+    await stream.aclose()
@@ -0,0 +1,38 @@
+import pytest
+
+from app import crud, models, principal_cache as principal_cache_module
+from app.principal_cache import PRINCIPAL_TOPIC, PrincipalCache, invalidation_listener
+
+pytestmark = pytest.mark.anyio
+
+async def test_role_change_evicts_cached_principal_on_other_workers(database, workers, wait_for, monkeypatch):
+    SessionLocal, _, _ = database
+    first, second = await workers(), await workers()
+    # O primeiro worker grava a alteração; o segundo tem o usuário em cache
+    monkeypatch.setattr(principal_cache_module, "manager", first)
+    remote_cache = PrincipalCache()
+    second.add_notification_listener(PRINCIPAL_TOPIC, invalidation_listener(remote_cache))
+
+    with SessionLocal() as db:
+        user = models.User(email="dono@example.com", hashed_password="x", role=models.UserRole.OWNER)
+        db.add(user)
+        db.commit()
+        remote_cache.set(user)
+        assert remote_cache.get("dono@example.com").role == models.UserRole.OWNER
+
+        crud.update_user_role(db, user, models.UserRole.CUSTOMER)
+
+    await wait_for(lambda: remote_cache.stats()["size"] == 0)
+    assert remote_cache.get("dono@example.com") is None
+
+def test_set_is_skipped_when_invalidated_during_the_read():
+    cache = PrincipalCache()
+    user = models.User(id=1, email="dono@example.com", role=models.UserRole.ADMIN, is_active=True)
+    generation = cache.generation()
+    # O usuário é alterado (em qualquer worker) enquanto a requisição lê o banco
+    cache.invalidate("dono@example.com")
+
+    principal = cache.set(user, generation)
+
+    assert principal.role == models.UserRole.ADMIN
+    assert cache.get("dono@example.com") is None
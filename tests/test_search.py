@@ -0,0 +1,26 @@
+from app.search import SearchIndex
+
+def test_upsert_many_keeps_vocabulary_consistent():
+    index = SearchIndex()
+    # O termo 'calabresa' entra com o produto 1 e sai quando o produto 1 é alterado no mesmo lote
+    index.upsert_many([
+        (1, 1, "Pizza Calabresa", None),
+        (2, 1, "Pizza Marguerita", None),
+        (1, 1, "Pizza Portuguesa", None),
+    ])
+
+    assert index.search("calab") == []
+    assert index.search("port") == [1]
+    assert sorted(index.search("pizza")) == [1, 2]
+
+def test_upsert_during_rebuild_wins_over_rows_read_from_database():
+    index = SearchIndex()
+    index.begin_rebuild()
+    index.upsert_many([(1, 1, "Pizza Nova", None)])
+    # Linha lida do banco antes da alteração
+    index.add_many([(1, 1, "Pizza Antiga", None), (2, 1, "Pastel", None)])
+    index.end_rebuild()
+
+    assert index.search("nova") == [1]
+    assert index.search("antiga") == []
+    assert index.search("pastel") == [2]
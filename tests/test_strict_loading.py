@@ -0,0 +1,118 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import deps, loaders, models
+from app.database import get_async_db, get_db
+from app.menu_cache import menu_cache
+from app.routers import orders, products, stores
+
+@pytest.fixture
+def strict_loading():
+    """Modo estrito (DB_STRICT_LOADING=1) só durante o teste: qualquer carregamento lazy falha."""
+    loaders.enable_strict_loading()
+    yield
+    event.remove(Session, "do_orm_execute", loaders._raise_on_lazy_load)
+
+@pytest.fixture
+def seeded(database):
+    """Loja com produtos, um pedido de convidado e um pedido de usuário registrado."""
+    SessionLocal, _, _ = database
+    with SessionLocal() as db:
+        owner = models.User(email="owner@example.com", hashed_password="x", role=models.UserRole.OWNER)
+        guest = models.GuestUser(phone="11999999999", name="Cliente", address="Rua A, 1")
+        db.add_all([owner, guest])
+        db.flush()
+        db_store = models.Store(name="Loja", description="Teste", owner_id=owner.id)
+        db.add(db_store)
+        db.flush()
+        db_products = [
+            models.Product(name=f"Produto {i}", description="Teste", price=10 + i, store_id=db_store.id)
+            for i in range(3)
+        ]
+        db.add_all(db_products)
+        db.flush()
+        db_orders = [
+            models.Order(
+                store_id=db_store.id, total_price=20, payment_method="pix", customer_user_id=customer_id, guest_customer_id=guest_id,
+                items=[models.OrderItem(product_id=product.id, quantity=2, price_at_purchase=product.price) for product in db_products],
+            )
+            for customer_id, guest_id in ((None, guest.id), (owner.id, None))
+        ]
+        db.add_all(db_orders)
+        db.commit()
+        return owner.id, db_store.id, db_orders[0].id
+
+@pytest.fixture
+def client(database, seeded, strict_loading):
+    SessionLocal, AsyncSessionLocal, _ = database
+    owner_id, _, _ = seeded
+
+    def override_get_db():
+        with SessionLocal() as db:
+            yield db
+
+    async def override_get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    def override_current_user():
+        with SessionLocal() as db:
+            return db.get(models.User, owner_id)
+
+    app = FastAPI()
+    for router in (orders.router, stores.router, products.router):
+        app.include_router(router)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[deps.get_current_active_user] = override_current_user
+    # Os snapshots do cardápio são montados a partir do banco deste teste
+    menu_cache.clear()
+    yield TestClient(app)
+    menu_cache.clear()
+
+@pytest.mark.parametrize("query", [
+    "",
+    "?fields=id,status,total_price",
+    "?fields=id,items",
+    "?expand=items",
+    "?expand=items.product,guest_customer",
+    "?fields=id,customer_user&expand=customer_user",
+])
+def test_store_orders_serialize_without_lazy_loads(client, seeded, query):
+    _, store_id, _ = seeded
+
+    response = client.get(f"/orders/store/{store_id}{query}")
+
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+@pytest.mark.parametrize("query", [
+    "",
+    "?fields=id,name",
+    "?fields=id,logo_url",
+    "?expand=products",
+    "?fields=name,products&expand=products",
+])
+def test_stores_serialize_without_lazy_loads(client, query):
+    response = client.get(f"/stores/{query}")
+
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+
+def test_order_and_store_details_serialize_without_lazy_loads(client, seeded):
+    _, store_id, order_id = seeded
+
+    responses = [
+        client.get(f"/orders/track/{order_id}", params={"phone": "11999999999"}),
+        client.get("/orders/me"),
+        client.get(f"/stores/{store_id}"),
+        client.get(f"/products/stores/{store_id}"),
+        client.get(f"/products/stores/{store_id}", params={"limit": 1}),
+    ]
+
+    assert [response.status_code for response in responses] == [200] * len(responses)
+    assert len(responses[0].json()["items"]) == 3
+    assert len(responses[3].json()) == 3
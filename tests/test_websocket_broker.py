@@ -0,0 +1,115 @@
+"""
+Testes do broker dentro de um único processo: os "workers" são ConnectionManagers
+no mesmo event loop, ligados a um servidor fakeredis em memória. Eles substituem
+processos separados para cobrir reconexão e ressincronização, que dependem de
+simular a queda da assinatura. A entrega entre processos reais, com um servidor
+Redis de verdade, é coberta por tests/test_websocket_processes.py.
+"""
+import asyncio
+
+import fakeredis
+import pytest
+import redis
+
+from app import websocket
+
+pytestmark = pytest.mark.anyio
+
+class FakeWebSocket:
+    def __init__(self):
+        self.messages = []
+        self.closed_with = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        self.messages.append(message)
+
+    async def close(self, code: int):
+        self.closed_with = code
+
+class DroppingPubSub:
+    """Assinatura que perde a conexão quando 'drop' é acionado, como uma queda do Redis."""
+
+    def __init__(self, pubsub, drop: asyncio.Event):
+        self._pubsub = pubsub
+        self._drop = drop
+
+    def __getattr__(self, name):
+        return getattr(self._pubsub, name)
+
+    async def listen(self):
+        await self._drop.wait()
+        raise redis.ConnectionError("Connection closed by server.")
+        yield
+
+async def test_message_reaches_sockets_on_every_worker(workers, wait_for):
+    first, second = await workers(), await workers()
+    local, remote, other_store = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    await first.connect(local, store_id=1)
+    await second.connect(remote, store_id=1)
+    await second.connect(other_store, store_id=2)
+
+    await first.publish(1, '{"id": 10}', seq=1)
+
+    await wait_for(lambda: local.messages and remote.messages)
+    assert local.messages == ['{"id": 10}']
+    assert remote.messages == ['{"id": 10}']
+    assert other_store.messages == []
+    # O evento também alimenta o buffer de reenvio do outro worker
+    assert second.replay_buffer.since(1, 0) == [(1, '{"id": 10}')]
+
+async def test_reconnects_and_resyncs_after_connection_loss(workers, wait_for, monkeypatch):
+    monkeypatch.setattr(websocket, "BROKER_RECONNECT_MIN_DELAY", 0.01)
+    client = fakeredis.aioredis.FakeRedis(server=workers.server, decode_responses=True)
+    drop = asyncio.Event()
+    subscriptions = []
+    def pubsub():
+        # Só a primeira assinatura cai; a reconexão usa uma assinatura normal
+        subscription = client.__class__.pubsub(client)
+        subscriptions.append(subscription)
+        return DroppingPubSub(subscription, drop) if len(subscriptions) == 1 else subscription
+    client.pubsub = pubsub
+
+    first, second = await workers(), await workers(client)
+    resyncs = []
+    async def on_resync():
+        resyncs.append(True)
+    second.add_resync_listener(on_resync)
+    dashboard = FakeWebSocket()
+    await second.connect(dashboard, store_id=1)
+    await first.publish(1, '{"id": 10}', seq=1)
+
+    drop.set()
+    await wait_for(lambda: second.broker.reconnects == 1)
+
+    # Painéis do worker são desconectados para recuperar os eventos pelo banco
+    assert resyncs == [True]
+    await wait_for(lambda: dashboard.closed_with is not None)
+    assert dashboard.closed_with == websocket.status.WS_1012_SERVICE_RESTART
+    assert second.active_connections == {}
+    assert second.replay_buffer.since(1, 0) is None
+
+    # Depois da reconexão, as mensagens voltam a ser entregues
+    reconnected = FakeWebSocket()
+    await second.connect(reconnected, store_id=1)
+    await first.publish(1, '{"id": 11}', seq=2)
+    await wait_for(lambda: reconnected.messages)
+    assert reconnected.messages == ['{"id": 11}']
+
+async def test_notifications_reach_only_the_other_workers(workers, wait_for):
+    first, second = await workers(), await workers()
+    received = {"first": [], "second": []}
+    for name, manager in (("first", first), ("second", second)):
+        async def listener(message: str, name=name):
+            received[name].append(message)
+        manager.add_notification_listener("search", listener)
+
+    first.notify("search", "[[1, 1, \"Pizza\", null]]")
+    first.notify("menu", "1")
+
+    await wait_for(lambda: received["second"])
+    assert received["second"] == ['[[1, 1, "Pizza", null]]']
+    # Quem envia já aplicou a alteração localmente
+    assert received["first"] == []
@@ -0,0 +1,110 @@
+"""
+Entrega entre processos reais: cada worker (tests/broker_worker.py) é um processo
+Python separado, com o ConnectionManager criado a partir de WS_BROKER_URL como em
+cada worker do uvicorn, ligado a um servidor Redis de verdade. A aplicação completa
+não é iniciada (ela exige o MySQL); o caminho exercitado é o do broker.
+
+Usa o Redis de TEST_REDIS_URL (padrão: redis://localhost:6379/15) e é ignorado
+quando ele não está acessível.
+"""
+import os
+import queue
+import subprocess
+import sys
+import threading
+
+import pytest
+import redis
+
+REDIS_URL = os.getenv("TEST_REDIS_URL", "redis://localhost:6379/15")
+WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "broker_worker.py")
+
+class Worker:
+    """Processo worker controlado pela entrada padrão; as linhas da saída são lidas por uma thread."""
+
+    def __init__(self, redis_url: str, topics: tuple[str, ...]):
+        self.process = subprocess.Popen(
+            [sys.executable, WORKER, *topics],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            env={**os.environ, "WS_BROKER_URL": redis_url},
+        )
+        self.lines: list[str] = []
+        self._output: queue.Queue = queue.Queue()
+        threading.Thread(target=self._read, daemon=True).start()
+        self.expect("ready")
+
+    def _read(self):
+        for line in self.process.stdout:
+            self._output.put(line.rstrip("\n"))
+
+    def send(self, command: str):
+        self.process.stdin.write(command + "\n")
+        self.process.stdin.flush()
+        self.expect("ok")
+
+    def expect(self, expected: str, timeout: float = 10.0):
+        """Aguarda a linha 'expected'; as linhas lidas ficam em 'lines'."""
+        while expected not in self.lines:
+            try:
+                self.lines.append(self._output.get(timeout=timeout))
+            except queue.Empty:
+                raise AssertionError(f"'{expected}' não recebido; saída: {self.lines}") from None
+
+    def stop(self):
+        self.process.stdin.close()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+@pytest.fixture(scope="module")
+def redis_url():
+    client = redis.Redis.from_url(REDIS_URL, socket_connect_timeout=0.5)
+    try:
+        client.ping()
+    except redis.ConnectionError:
+        pytest.skip(f"Redis indisponível em {REDIS_URL} (defina TEST_REDIS_URL)")
+    finally:
+        client.close()
+    return REDIS_URL
+
+@pytest.fixture
+def workers(redis_url):
+    """Inicia processos worker ligados ao mesmo Redis."""
+    started = []
+
+    def start(*topics: str) -> Worker:
+        worker = Worker(redis_url, topics)
+        started.append(worker)
+        return worker
+
+    yield start
+    for worker in started:
+        worker.stop()
+
+def test_message_published_in_one_process_reaches_the_other(workers):
+    first, second = workers(), workers()
+    first.send("connect 1")
+    second.send("connect 1")
+    second.send("connect 2")
+
+    first.send('publish 1 1 {"id": 10}')
+
+    first.expect('message 1 {"id": 10}')
+    second.expect('message 1 {"id": 10}')
+    assert not any(line.startswith("message 2 ") for line in second.lines)
+
+def test_notification_reaches_only_the_other_process(workers):
+    first, second = workers("menu"), workers("menu")
+    first.send("connect 1")
+
+    first.send("notify menu 7")
+    second.expect("notify menu 7")
+
+    # A assinatura entrega na ordem de publicação: a notificação teria chegado antes
+    first.send('publish 1 1 {"id": 10}')
+    first.expect('message 1 {"id": 10}')
+    assert "notify menu 7" not in first.lines